@@ -0,0 +1,156 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+
+
+class ActorIndex:
+    """
+    Sorted prefix index over the actors' full names ("FIRST LAST").
+
+    - `_names` is a sorted list of case-folded full names, `_actor_ids` is the array parallel to it.
+    - `_films` maps every actor id to the sorted array of its film ids.
+    - A prefix lookup is two binary searches over `_names`, like Actor LIKE 'prefix%' but case-insensitive.
+
+    refresh() applies only the actors / film_actor rows changed since the last load (last_update),
+    so the index doesn't have to be rebuilt from scratch when the cast changes.
+    """
+
+    def __init__(self, pool: ConnectionPool = read_pool) -> None:
+        self.pool = pool
+        self._names = []
+        self._actor_ids = array("I")
+        self._films = {}     # actor_id -> array of film ids
+        self._name_of = {}   # actor_id -> case-folded name, to find the old entry on refresh
+        self._watermark = None
+        self._loaded_at = 0.0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _full_name(first_name: str, last_name: str) -> str:
+        return f"{first_name} {last_name}".casefold()
+
+    def build(self) -> None:
+        """Loads every actor and every film_actor link and rebuilds the index."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT actor_id, first_name, last_name, last_update FROM actor;")
+                actors = cursor.fetchall()
+                cursor.execute("SELECT actor_id, film_id, last_update FROM film_actor ORDER BY actor_id, film_id;")
+                links = cursor.fetchall()
+
+        entries = sorted((self._full_name(first, last), actor_id) for actor_id, first, last, _ in actors)
+        films = {}
+        for actor_id, film_id, _ in links:
+            films.setdefault(actor_id, array("I")).append(film_id)
+        updates = [row[3] for row in actors] + [row[2] for row in links]
+
+        with self._lock:
+            self._names = [name for name, _ in entries]
+            self._actor_ids = array("I", (actor_id for _, actor_id in entries))
+            self._name_of = {actor_id: name for name, actor_id in entries}
+            self._films = films
+            self._watermark = max(updates) if updates else None
+            self._loaded_at = time.monotonic()
+
+    def _remove(self, actor_id: int) -> None:
+        name = self._name_of.pop(actor_id, None)
+        if name is None:
+            return
+        pos = bisect_left(self._names, name)
+        while self._actor_ids[pos] != actor_id: #same names are next to each other
+            pos += 1
+        del self._names[pos]
+        del self._actor_ids[pos]
+
+    def _insert(self, actor_id: int, name: str) -> None:
+        pos = bisect_left(self._names, name)
+        self._names.insert(pos, name)
+        self._actor_ids.insert(pos, actor_id)
+        self._name_of[actor_id] = name
+
+    def refresh(self) -> int:
+        """
+        Incremental update: re-reads the actors and the film lists of the actors
+        whose actor or film_actor rows have last_update at or after the previous load,
+        and drops the actors which no longer exist.
+
+        Returns the number of re-read actors.
+        """
+        if self._watermark is None:
+            self.build()
+            return len(self._name_of)
+
+        since = {"since": self._watermark}
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT actor_id, first_name, last_name, last_update FROM actor WHERE last_update >= %(since)s;", since)
+                actors = cursor.fetchall()
+                cursor.execute("SELECT DISTINCT actor_id, last_update FROM film_actor WHERE last_update >= %(since)s;", since)
+                changed_links = cursor.fetchall()
+                cursor.execute("SELECT actor_id FROM actor;")
+                existing = {row[0] for row in cursor.fetchall()}
+                changed = ({row[0] for row in actors} | {row[0] for row in changed_links}) & existing
+
+                links = ()
+                if changed:
+                    cursor.execute("SELECT actor_id, film_id FROM film_actor WHERE actor_id IN %(ids)s ORDER BY actor_id, film_id;",
+                                   {"ids": tuple(changed)})
+                    links = cursor.fetchall()
+
+        updates = [row[3] for row in actors] + [row[1] for row in changed_links]
+        with self._lock:
+            for actor_id in [actor_id for actor_id in self._name_of if actor_id not in existing]:
+                self._remove(actor_id)
+                self._films.pop(actor_id, None)
+
+            for actor_id, first, last, _ in actors:
+                self._remove(actor_id)
+                self._insert(actor_id, self._full_name(first, last))
+
+            for actor_id in changed:
+                self._films[actor_id] = array("I")
+            for actor_id, film_id in links:
+                self._films[actor_id].append(film_id)
+
+            if updates:
+                self._watermark = max(updates + [self._watermark])
+            self._loaded_at = time.monotonic()
+        return len(changed)
+
+    def refresh_if_stale(self, interval: float = config.ACTOR_INDEX_REFRESH_INTERVAL) -> None:
+        """Builds the index on the first use and refreshes it when it is older than `interval` seconds."""
+        with self._lock:
+            if self._watermark is not None and time.monotonic() - self._loaded_at < interval:
+                return
+            self.refresh()
+
+    def actors_with_prefix(self, prefix: str) -> list[int]:
+        """Ids of the actors whose full name starts with `prefix` (case-insensitive)."""
+        self.refresh_if_stale()
+        prefix = prefix.casefold()
+        with self._lock:
+            start = bisect_left(self._names, prefix)
+            stop = bisect_left(self._names, prefix + "\U0010ffff", lo=start)
+            return list(self._actor_ids[start:stop])
+
+    def films_for_prefix(self, prefix: str) -> tuple[list[int], list[int]]:
+        """(actor ids, their film ids) for the actors whose full name starts with `prefix`."""
+        actor_ids = self.actors_with_prefix(prefix)
+        with self._lock:
+            film_ids = sorted({film_id for actor_id in actor_ids for film_id in self._films.get(actor_id, ())})
+        return actor_ids, film_ids
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "actors": len(self._names),
+                "links": sum(len(films) for films in self._films.values()),
+                "watermark": self._watermark,
+            }
+
+
+actor_index = ActorIndex()
@@ -3,6 +3,8 @@ import time
 
 from colorama import Fore
 
+from Render import renderer
+
 
 def animation_spinner(text:str,
                       time_of_loading: int=6,
@@ -26,6 +28,9 @@ def animation_spinner(text:str,
     spinner = ['|', '/', '-', '\\']
     print()
     print(Fore.GREEN + text, end=' ', flush=False)
+    if not renderer.animated: #instant/plain render modes don't wait for the show
+        print()
+        return
     for _ in range(time_of_loading):
         for symbol in spinner:
             sys.stdout.write(Fore.GREEN + symbol)
@@ -54,6 +59,9 @@ def loading(text:str,
            None
     """
     print()
+    if not renderer.animated: #instant/plain render modes don't wait for the show
+        print(Fore.GREEN + text)
+        return
     for i in range(time_of_loading):
         print(Fore.GREEN + f"{text}{'.' * i}", end='\r', flush=True)
         time.sleep(delay)
@@ -0,0 +1,383 @@
+#============================================================================================================================#
+#                       Benchmarks of every search path on synthetic Sakila-shaped catalogs (1k - 1M films)                  #
+#                                                                                                                            #
+#   python Benchmark.py load --films 100000             - generates the catalog (always the same for the same seed)          #
+#                                                         and loads it into f"{BENCH_DATABASE}_100000", builds film_summary  #
+#   python Benchmark.py run --films 100000              - runs every search path headlessly, prints p50/p95/p99, rows/s      #
+#                                                         and peak memory, saves the results into BENCH_RESULTS_DIR          #
+#   python Benchmark.py compare old.json new.json       - what got faster / slower between two saved runs                    #
+#============================================================================================================================#
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Iterator
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool
+from CatalogMetadata import CatalogMetadata
+from TitleIndex import TitleIndex
+from ActorIndex import ActorIndex
+from ColumnarCatalog import ColumnarCatalog
+from SearchEngine import SearchEngine
+from FilmSummary import build_film_summary
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+GENRES = ["Action", "Animation", "Children", "Classics", "Comedy", "Documentary", "Drama", "Family",
+          "Foreign", "Games", "Horror", "Music", "New", "Sci-Fi", "Sports", "Travel"]
+LANGUAGES = ["English", "Italian", "Japanese", "Mandarin", "French", "German"]
+RATINGS = ["G", "PG", "PG-13", "R", "NC-17"]
+SYLLABLES = ["A", "AN", "BER", "CA", "DI", "DO", "EL", "EN", "FA", "GO", "HA", "IN", "JO", "KA", "LA", "LI",
+             "MA", "MO", "NA", "NE", "OR", "PA", "RA", "RI", "SA", "SO", "TA", "TE", "TO", "UL", "VA", "ZE"]
+FIRST_YEAR, LAST_YEAR = 1990, 2024
+LOAD_CHUNK = 10000   # rows per executemany
+PEAK_ITERATIONS = 5  # iterations of every path repeated under tracemalloc
+
+SCHEMA = [
+    """CREATE TABLE language (
+        language_id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+        name CHAR(20) NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    );""",
+    """CREATE TABLE category (
+        category_id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+        name VARCHAR(25) NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    );""",
+    """CREATE TABLE actor (
+        actor_id INT UNSIGNED NOT NULL PRIMARY KEY,
+        first_name VARCHAR(45) NOT NULL,
+        last_name VARCHAR(45) NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_actor_last_name (last_name)
+    );""",
+    """CREATE TABLE film (
+        film_id INT UNSIGNED NOT NULL PRIMARY KEY,
+        title VARCHAR(128) NOT NULL,
+        description TEXT,
+        release_year YEAR,
+        language_id TINYINT UNSIGNED NOT NULL,
+        length SMALLINT UNSIGNED,
+        rating ENUM('G','PG','PG-13','R','NC-17') DEFAULT 'G',
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        KEY idx_title (title),
+        KEY idx_fk_language_id (language_id)
+    );""",
+    """CREATE TABLE film_actor (
+        actor_id INT UNSIGNED NOT NULL,
+        film_id INT UNSIGNED NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (actor_id, film_id),
+        KEY idx_fk_film_id (film_id)
+    );""",
+    """CREATE TABLE film_category (
+        film_id INT UNSIGNED NOT NULL,
+        category_id TINYINT UNSIGNED NOT NULL,
+        last_update TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (film_id, category_id),
+        KEY fk_film_category_category (category_id)
+    );""",
+]
+
+
+#===================SYNTHETIC CATALOG========================================
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+class SyntheticCatalog:
+    """
+    A deterministic Sakila-shaped catalog: the same `films` and `seed` always give the same rows.
+
+    Like Sakila there is about one actor per 5 films, every film has 1 - 10 actors and one category,
+    but the release years are spread over FIRST_YEAR..LAST_YEAR so the year searches have something to filter.
+    The rows are generated lazily, so 1M films never have to be in memory at once.
+    """
+
+    def __init__(self, films: int, seed: int = 42) -> None:
+        self.films = films
+        self.seed = seed
+        self.actors = max(200, films // 5)
+        rng = random.Random(seed)
+        self.vocabulary = sorted({_word(rng) for _ in range(2000)})
+
+    def _rng(self, part: str) -> random.Random:
+        return random.Random(f"{self.seed}-{part}") #every table has its own stream, independent of the others
+
+    def language_rows(self) -> Iterator[tuple]:
+        yield from enumerate(LANGUAGES, start=1)
+
+    def category_rows(self) -> Iterator[tuple]:
+        yield from enumerate(GENRES, start=1)
+
+    def actor_rows(self) -> Iterator[tuple]:
+        rng = self._rng("actor")
+        for actor_id in range(1, self.actors + 1):
+            yield actor_id, rng.choice(self.vocabulary), rng.choice(self.vocabulary)
+
+    def film_rows(self) -> Iterator[tuple]:
+        rng = self._rng("film")
+        for film_id in range(1, self.films + 1):
+            title = f"{rng.choice(self.vocabulary)} {rng.choice(self.vocabulary)}"
+            description = " ".join(rng.choice(self.vocabulary).capitalize() for _ in range(8))
+            yield (film_id, title, description, rng.randint(FIRST_YEAR, LAST_YEAR),
+                   rng.randint(1, len(LANGUAGES)), rng.randint(46, 185), rng.choice(RATINGS))
+
+    def film_actor_rows(self) -> Iterator[tuple]:
+        rng = self._rng("film_actor")
+        for film_id in range(1, self.films + 1):
+            for actor_id in sorted(rng.sample(range(1, self.actors + 1), rng.randint(1, 10))):
+                yield actor_id, film_id
+
+    def film_category_rows(self) -> Iterator[tuple]:
+        rng = self._rng("film_category")
+        for film_id in range(1, self.films + 1):
+            yield film_id, rng.randint(1, len(GENRES))
+
+
+TABLES = [
+    ("language", "INSERT INTO language (language_id, name) VALUES (%s, %s)", "language_rows"),
+    ("category", "INSERT INTO category (category_id, name) VALUES (%s, %s)", "category_rows"),
+    ("actor", "INSERT INTO actor (actor_id, first_name, last_name) VALUES (%s, %s, %s)", "actor_rows"),
+    ("film", "INSERT INTO film (film_id, title, description, release_year, language_id, length, rating) "
+             "VALUES (%s, %s, %s, %s, %s, %s, %s)", "film_rows"),
+    ("film_actor", "INSERT INTO film_actor (actor_id, film_id) VALUES (%s, %s)", "film_actor_rows"),
+    ("film_category", "INSERT INTO film_category (film_id, category_id) VALUES (%s, %s)", "film_category_rows"),
+]
+
+
+def bench_database(films: int) -> str:
+    return f"{config.BENCH_DATABASE}_{films}"
+
+
+def bench_pool(films: int) -> ConnectionPool:
+    return ConnectionPool({**config.DB_CONFIG_WRITE, "database": bench_database(films)})
+
+
+def load_catalog(films: int, seed: int = 42) -> None:
+    """(Re)creates the benchmark database of this size, loads the synthetic catalog and builds film_summary."""
+    catalog = SyntheticCatalog(films, seed)
+    database = bench_database(films)
+    server = ConnectionPool(config.DB_CONFIG_WRITE)
+    with server.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {database};")
+            cursor.execute(f"CREATE DATABASE {database};")
+    server.close_all()
+
+    pool = bench_pool(films)
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            for table, insert, rows_of in TABLES:
+                start = time.perf_counter()
+                count = 0
+                chunk = []
+                for row in getattr(catalog, rows_of)():
+                    chunk.append(row)
+                    if len(chunk) == LOAD_CHUNK:
+                        cursor.executemany(insert, chunk)
+                        conn.commit()
+                        count += len(chunk)
+                        chunk = []
+                if chunk:
+                    cursor.executemany(insert, chunk)
+                    conn.commit()
+                    count += len(chunk)
+                print(Fore.CYAN + f"{table:<14} {count:>9} rows in {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    rows = build_film_summary(pool)
+    print(Fore.CYAN + f"{config.FILM_SUMMARY_TABLE:<14} {rows:>9} rows in {time.perf_counter() - start:.2f} s")
+    pool.close_all()
+    print(Fore.GREEN + f"{database} is ready ({films} films, seed {seed})")
+
+
+#===================SEARCH PATHS========================================
+def search_paths(engine: SearchEngine, catalog: SyntheticCatalog) -> dict[str, Callable[[random.Random], int]]:
+    """
+    One callable per search path of the menus. Each gets the benchmark's random generator,
+    picks its own (deterministic) search value, runs the search and returns the number of rows.
+    The catalog metadata is invalidated before its calls, so the query itself is measured, not the cache.
+    """
+    def title(rng: random.Random) -> int:
+        word = rng.choice(catalog.vocabulary)
+        start = rng.randint(0, max(0, len(word) - 3))
+        return len(engine.search_title(word[start:start + rng.randint(3, 5)]))
+
+    def year_range(rng: random.Random) -> int:
+        year = rng.randint(FIRST_YEAR, LAST_YEAR - 2)
+        return len(engine.search_year_range(year, year + 2))
+
+    def genres(rng: random.Random) -> int:
+        engine.metadata.invalidate()
+        return len(engine.genres())
+
+    def year_bounds(rng: random.Random) -> int:
+        engine.metadata.invalidate()
+        engine.year_bounds()
+        return 2
+
+    return {
+        "where_search_title": title,
+        "where_search_specific_year": lambda rng: len(engine.search_year(rng.randint(FIRST_YEAR, LAST_YEAR))),
+        "where_search_range_year": year_range,
+        "where_genre": lambda rng: len(engine.search_genre(rng.choice(GENRES))),
+        "where_genre_year": lambda rng: len(engine.search_genre_year(rng.choice(GENRES), rng.randint(FIRST_YEAR, LAST_YEAR))),
+        "where_like_actor": lambda rng: len(engine.search_actor(rng.choice(catalog.vocabulary)[:rng.randint(2, 3)])),
+        "show_all_genres": genres,
+        "min_year/max_year": year_bounds,
+    }
+
+
+def _percentile(sorted_values: list[float], percent: int) -> float:
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method="inclusive")[percent - 1]
+
+
+def measure(path: Callable[[random.Random], int], iterations: int, seed: int) -> dict:
+    """Latency percentiles and rows/s of `iterations` calls, then the peak Python memory of a few more."""
+    rng = random.Random(seed)
+    latencies = []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows += path(rng)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        for _ in range(min(iterations, PEAK_ITERATIONS)):
+            path(rng)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "iterations": iterations,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": total / iterations * 1000,
+        "rows": rows,
+        "rows_per_second": rows / total if total else 0.0,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_benchmarks(films: int, iterations: int = 50, seed: int = 42) -> dict:
+    """Runs every search path against the loaded catalog of this size. The indexes are built first and timed separately."""
+    pool = bench_pool(films)
+    catalog = SyntheticCatalog(films, seed)
+    engine = SearchEngine(pool=pool,
+                          titles=TitleIndex(pool),
+                          actors=ActorIndex(pool),
+                          metadata=CatalogMetadata(pool),
+                          columns=ColumnarCatalog(pool),
+                          columnar=config.COLUMNAR_CATALOG != "0")
+    results = {"created": datetime.now().isoformat(timespec="seconds"),
+               "films": films, "seed": seed, "database": bench_database(films),
+               "python": platform.python_version(),
+               "settings": {"TITLE_INDEX": config.TITLE_INDEX, "ACTOR_INDEX": config.ACTOR_INDEX,
+                            "COLUMNAR_CATALOG": engine.use_columnar},
+               "builds": {}, "paths": {}}
+    try:
+        for name, build in (("title_index", engine.titles.build), ("actor_index", engine.actors.build),
+                            ("columnar_catalog", engine.columns.build)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            build()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results["builds"][name] = {"seconds": elapsed, "peak_kib": peak / 1024}
+            print(Fore.CYAN + f"{name} built in {elapsed:.2f} s, peak {peak / 1024 / 1024:.1f} MiB")
+
+        for name, path in search_paths(engine, catalog).items():
+            results["paths"][name] = stats = measure(path, iterations, seed)
+            print(Fore.LIGHTYELLOW_EX + f"{name:<28}" + Fore.CYAN +
+                  f"p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  "
+                  f"{stats['rows_per_second']:10.0f} rows/s  peak {stats['peak_kib']:9.1f} KiB")
+    finally:
+        pool.close_all()
+    return results
+
+
+def save_results(results: dict, output: str | None = None) -> str:
+    if output is None:
+        os.makedirs(config.BENCH_RESULTS_DIR, exist_ok=True)
+        stamp = results["created"].replace(":", "").replace("-", "")
+        output = os.path.join(config.BENCH_RESULTS_DIR, f"bench-{results['films']}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    return output
+
+
+def compare(old_file: str, new_file: str, tolerance: float = 0.10) -> None:
+    """Prints p50/p95 of both runs per path. More than `tolerance` slower is red, more than `tolerance` faster is green."""
+    with open(old_file, encoding="utf-8") as file:
+        old = json.load(file)
+    with open(new_file, encoding="utf-8") as file:
+        new = json.load(file)
+    if old["films"] != new["films"]:
+        print(Fore.RED + f"Warning: different catalog sizes ({old['films']} vs {new['films']} films)")
+
+    for name, stats in new["paths"].items():
+        before = old["paths"].get(name)
+        if before is None:
+            print(Fore.LIGHTYELLOW_EX + f"{name:<28}" + Fore.CYAN + "new path")
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        color = Fore.RED if change > tolerance else Fore.GREEN if change < -tolerance else Fore.CYAN
+        print(Fore.LIGHTYELLOW_EX + f"{name:<28}" + color +
+              f"p50 {before['p50_ms']:8.2f} -> {stats['p50_ms']:8.2f} ms  "
+              f"p95 {before['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f} ms  ({change:+.0%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks of the film searches on synthetic catalogs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="generate and load a synthetic catalog")
+    load.add_argument("--films", type=int, default=1000)
+    load.add_argument("--seed", type=int, default=42)
+
+    run = commands.add_parser("run", help="benchmark every search path on a loaded catalog")
+    run.add_argument("--films", type=int, default=1000)
+    run.add_argument("--seed", type=int, default=42, help="must be the seed the catalog was loaded with")
+    run.add_argument("--iterations", type=int, default=50)
+    run.add_argument("--output", help=f"result file (default: {config.BENCH_RESULTS_DIR}/bench-<films>-<time>.json)")
+
+    diff = commands.add_parser("compare", help="compare two saved runs")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("--tolerance", type=float, default=0.10, help="relative p95 change treated as noise")
+
+    args = parser.parse_args()
+    if args.command == "load":
+        if not 1000 <= args.films <= 1_000_000:
+            print(Fore.LIGHTRED_EX + "--films must be between 1000 and 1000000")
+            sys.exit(2)
+        load_catalog(args.films, args.seed)
+    elif args.command == "run":
+        results = run_benchmarks(args.films, args.iterations, args.seed)
+        print(Fore.GREEN + f"Saved to {save_results(results, args.output)}")
+    else:
+        compare(args.old, args.new, args.tolerance)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -51,4 +52,120 @@ JOIN actor a USING(actor_id)
 LEFT JOIN film_category fc USING(film_id)
 LEFT JOIN category c USING(category_id)
 )
-"""
\ No newline at end of file
+"""
+
+# ===================CONNECTION POOL========================================
+POOL_MAX_SIZE = int(os.getenv("POOL_MAX_SIZE", 5))              # connections per pool (read / write)
+POOL_IDLE_TIMEOUT = float(os.getenv("POOL_IDLE_TIMEOUT", 300))  # seconds before an idle connection is closed
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("POOL_CHECKOUT_TIMEOUT", 10))  # seconds to wait for a free connection
+
+
+# ===================LOGIN========================================
+# PBKDF2-SHA256 rounds of a stored password. Raising it re-hashes every account on its next successful login
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 600_000))
+
+
+# ===================FILM SUMMARY========================================
+# Materialized version of main_table (one row per film and genre), built and refreshed by FilmSummary.py
+FILM_SUMMARY_TABLE = os.getenv("FILM_SUMMARY_TABLE", "film_summary")
+# The account which may CREATE / DROP / RENAME the summary in the catalog database (the read account only reads):
+# by default the write account, on the catalog's server
+DB_CONFIG_SUMMARY = {
+    "host": os.getenv("DB_HOST_SUMMARY", DB_CONFIG_READ["host"]),
+    "port": int(os.getenv("DB_PORT", 3306)),
+    "user": os.getenv("DB_USER_SUMMARY", DB_CONFIG_WRITE["user"]),
+    "password": os.getenv("DB_PASSWORD_SUMMARY", DB_CONFIG_WRITE["password"]),
+    "database": DB_CONFIG_READ["database"],
+}
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 600)) # seconds the year bounds / genre list are trusted
+
+
+# ===================RESULT CACHE========================================
+# Rows of executed searches (and of their COUNT/page queries), keyed on the normalized query text + params
+RESULT_CACHE = os.getenv("RESULT_CACHE", "1") == "1"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 256))              # least recently used entries go first
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 16 * 1024 * 1024))     # approximate memory of the cached rows
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300))                            # seconds a result is trusted
+
+
+# ===================LOCAL REPLICA========================================
+# SQLite copy of the catalog, made and kept up to date with python LocalReplica.py sync
+REPLICA_PATH = os.getenv("REPLICA_PATH", "catalog_replica.sqlite3")
+# "off" - MySQL only, "fallback" - the replica answers while MySQL is unreachable, "replica" - every read from the replica
+READ_FROM_REPLICA = os.getenv("READ_FROM_REPLICA", "fallback")
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 30))  # "fallback": how long MySQL is skipped after a failure
+REPLICA_SYNC_OVERLAP_SECONDS = int(os.getenv("REPLICA_SYNC_OVERLAP_SECONDS", 3600))  # rows this much older than the watermark are copied again
+
+
+# ===================TITLE INDEX========================================
+TITLE_INDEX = os.getenv("TITLE_INDEX", "1") == "1"                   # answer title searches from the in-memory trigram index
+TITLE_INDEX_PRELOAD = os.getenv("TITLE_INDEX_PRELOAD", "0") == "1"   # build it in the background at startup instead of on the first search
+TITLE_INDEX_MAX_IDS = int(os.getenv("TITLE_INDEX_MAX_IDS", 5000))    # broader matches are hydrated with LIKE instead of a huge IN list
+TITLE_INDEX_MAX_AGE = float(os.getenv("TITLE_INDEX_MAX_AGE", 300))   # seconds before the index is rebuilt (in the background) from the film summary
+
+
+# ===================ACTOR INDEX========================================
+ACTOR_INDEX = os.getenv("ACTOR_INDEX", "1") == "1"                                # answer actor searches from the sorted prefix index
+ACTOR_INDEX_REFRESH_INTERVAL = float(os.getenv("ACTOR_INDEX_REFRESH_INTERVAL", 300))  # seconds between incremental refreshes
+
+
+# ===================COLUMNAR CATALOG========================================
+# Answer the year/genre searches from the NumPy snapshot: "1" everywhere, "0" nowhere, "service" - only in the search service
+# and the benchmark. The snapshot holds the whole catalog in memory, worth it for many clients but not for one menu session
+COLUMNAR_CATALOG = os.getenv("COLUMNAR_CATALOG", "service")
+COLUMNAR_CATALOG_MAX_AGE = float(os.getenv("COLUMNAR_CATALOG_MAX_AGE", 300))  # seconds before the snapshot is rebuilt
+
+
+# ===================PAGINATION========================================
+PAGINATION_MODE = os.getenv("PAGINATION_MODE", "lazy")  # "lazy" - COUNT + one LIMIT query per page, "eager" - fetchall
+PAGE_PREFETCH = int(os.getenv("PAGE_PREFETCH", 1))       # pages fetched ahead in the background in lazy mode
+
+
+# ===================EXPORT========================================
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", 1000))  # rows per fetchmany / written batch, the memory of an export
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")                # default folder of the exports started from the result pages
+
+
+# ===================QUERY LOG========================================
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 1000))  # searches waiting to be logged before log_query() blocks
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 50))    # max documents per insert_many
+LOG_RETENTION = os.getenv("LOG_RETENTION", "capped")                 # "capped" | "ttl" | "trim", see MyLogger.set_retention
+LOG_TTL_SECONDS = int(os.getenv("LOG_TTL_SECONDS", 30 * 24 * 3600))  # "ttl": age of the deleted documents
+LOG_TRIM_EVERY = int(os.getenv("LOG_TRIM_EVERY", 50))                # "trim": writes between two bulk trims
+LOG_CAPPED_SIZE = int(os.getenv("LOG_CAPPED_SIZE", 1024 * 1024))     # "capped": size of the collection in bytes
+
+
+# ===================SEARCH SERVICE========================================
+# python SearchService.py serves the searches and the history to many clients with one pool and one cache.
+# Addresses are "host:port" (loopback TCP) or "unix:/path/to/socket"
+SERVICE_ADDRESS = os.getenv("SERVICE_ADDRESS", "127.0.0.1:8765")          # where the service listens
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", POOL_MAX_SIZE))        # searches running at the same time
+SERVICE_TIMEOUT = float(os.getenv("SERVICE_TIMEOUT", 30))                 # seconds a client waits for an answer
+SEARCH_SERVICE = os.getenv("SEARCH_SERVICE", "")                          # thin client mode: the CLI sends its searches there, "" = off
+
+
+# ===================SLOW QUERY LOG========================================
+# queries slower than SLOW_QUERY_SECONDS in MySQL are stored with their EXPLAIN plan, see SlowQueryLog.py report
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "1") == "1"
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", 0.5))                 # threshold of execute() + fetchall()
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"                # capture EXPLAIN FORMAT=JSON of the slow ones
+SLOW_QUERY_TTL_SECONDS = int(os.getenv("SLOW_QUERY_TTL_SECONDS", 30 * 24 * 3600))  # MongoDB deletes the older documents
+
+
+# ===================METRICS========================================
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics.prom")  # Prometheus text format, written from the stats menu and on exit
+
+
+# ===================BENCHMARK========================================
+# Benchmark.py loads the synthetic catalogs into f"{BENCH_DATABASE}_{films}" with the DB_CONFIG_WRITE account
+BENCH_DATABASE = os.getenv("BENCH_DATABASE", "film_bench")
+BENCH_RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", "benchmarks")  # one JSON file per run, see Benchmark.py compare
+
+
+# ===================RENDERING========================================
+# "animated" - character by character (print_slowly), "instant" - every page/menu written at once,
+# "plain" - instant and without colors. "auto": animated in a terminal, plain when piped or NO_COLOR is set
+RENDER_MODE = os.getenv("RENDER_MODE", "auto")
+if RENDER_MODE == "auto":
+    RENDER_MODE = "animated" if sys.stdout.isatty() and "NO_COLOR" not in os.environ else "plain"
+STRIP_COLORS = True if RENDER_MODE == "plain" else None # for colorama.init(strip=...), None = colorama decides
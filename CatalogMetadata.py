@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Callable
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+from LocalReplica import local_replica
+
+
+class CatalogMetadata:
+    """
+    Caches the catalog-wide facts the menus keep asking for:
+    - the lowest and the highest release year
+    - the list of genres
+    - the number of rows / films in the film summary
+
+    Everything is loaded with one connection checkout and kept for `ttl` seconds
+    (or until invalidate() is called). Hits and misses are counted, see stats().
+    Like the searches, it is read from the local replica when READ_FROM_REPLICA says so (see LocalReplica.route).
+    """
+
+    def __init__(self,
+                 pool: ConnectionPool = read_pool,
+                 table: str = config.FILM_SUMMARY_TABLE,
+                 ttl: float = config.CATALOG_CACHE_TTL) -> None:
+        self.pool = pool
+        self.table = table
+        self.ttl = ttl
+        self._data = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_from_mysql(self) -> dict:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                def rows(query: str) -> tuple:
+                    cursor.execute(query)
+                    return cursor.fetchall()
+                return self._load_with(rows)
+
+    def _load(self) -> dict:
+        return local_replica.route(self._load_from_mysql,
+                                   lambda: self._load_with(lambda query: local_replica.fetch(query, {})))
+
+    def _load_with(self, rows: Callable[[str], tuple]) -> dict:
+        """Runs the two catalog queries with `rows(query)` - on a MySQL cursor or on the replica."""
+        min_year, max_year, row_count, film_count = rows(f"""
+                    SELECT
+                        MIN(release_year), MAX(release_year), COUNT(*), COUNT(DISTINCT film_id)
+                    FROM
+                        {self.table};
+                """)[0]
+        genres = [row[0] for row in rows(f"""
+                    SELECT
+                        DISTINCT genre
+                    FROM
+                        {self.table}
+                    WHERE genre IS NOT NULL
+                    ORDER BY genre;
+                """)]
+        return {
+            "min_year": min_year,
+            "max_year": max_year,
+            "row_count": row_count,
+            "film_count": film_count,
+            "genres": genres,
+        }
+
+    def _get(self) -> dict:
+        with self._lock:
+            if self._data is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self.hits += 1
+                return self._data
+            self.misses += 1
+            self._data = self._load()
+            self._loaded_at = time.monotonic()
+            return self._data
+
+    def min_year(self) -> int:
+        return self._get()["min_year"]
+
+    def max_year(self) -> int:
+        return self._get()["max_year"]
+
+    def genres(self) -> list[str]:
+        return self._get()["genres"]
+
+    def row_count(self) -> int:
+        return self._get()["row_count"]
+
+    def film_count(self) -> int:
+        return self._get()["film_count"]
+
+    def invalidate(self) -> None:
+        """Forgets the cached data, the next call reloads it (e.g. after FilmSummary refresh)."""
+        with self._lock:
+            self._data = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            age = time.monotonic() - self._loaded_at if self._data is not None else None
+        return {"hits": self.hits, "misses": self.misses, "age_seconds": age, "ttl": self.ttl}
+
+
+catalog_metadata = CatalogMetadata()
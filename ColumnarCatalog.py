@@ -0,0 +1,226 @@
+#============================================================================================================================#
+#                ColumnarCatalog answers the year and genre searches from a NumPy snapshot of the film summary               #
+#          release_year is an int16 column, genre a column of category codes, titles and actors stay in a string table.      #
+#          A search is a vectorized boolean mask over the columns, the matching row positions index the string table:        #
+#                          a million films are filtered in milliseconds, without a round trip to MySQL                       #
+#============================================================================================================================#
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+from LocalReplica import local_replica
+from Metrics import STAGE_SECONDS
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+NO_YEAR = -1  # release_year IS NULL
+NO_GENRE = -1 # genre IS NULL
+
+
+class _Snapshot:
+    """The columns of one build. A new build makes a new snapshot, the old one lives on in the results which use it."""
+
+    def __init__(self, years, genre_codes, genres: list[str | None], titles: list[str], actors: list[str | None]) -> None:
+        self.years = years             # position -> release_year (int16)
+        self.genre_codes = genre_codes # position -> index into genres (int16)
+        self.genres = genres           # code -> genre name
+        self.codes = {genre.casefold(): code for code, genre in enumerate(genres)} # like MySQL, genre = %s ignores the case
+        self.titles = titles           # position -> title
+        self.actors = actors           # position -> "A, B, C"
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def row(self, position: int) -> tuple[Any, ...]:
+        code = int(self.genre_codes[position])
+        year = int(self.years[position])
+        return (self.titles[position],
+                None if year == NO_YEAR else year,
+                None if code == NO_GENRE else self.genres[code],
+                self.actors[position])
+
+
+class ColumnarResult(Sequence):
+    """
+    The rows of a search as row positions into a snapshot.
+    Rows are made only for the slices which are read, so a page of a big result costs a page.
+    """
+
+    def __init__(self, snapshot: _Snapshot, positions) -> None:
+        self._snapshot = snapshot
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._snapshot.row(int(position)) for position in self.positions[index])
+        return self._snapshot.row(int(self.positions[index]))
+
+
+class ColumnarCatalog:
+    """
+    In-process columnar copy of the film summary for the year and genre searches.
+
+    - The rows are read once, sorted like the templates (title, film_id), so the mask of a search
+      already gives its positions in the right order. The year range searches re-order them by release_year
+      with a stable sort, which keeps title, film_id inside each year.
+    - The snapshot is rebuilt when it is older than COLUMNAR_CATALOG_MAX_AGE seconds.
+    - The searches return a ColumnarResult, or None when NumPy is missing or the build failed -
+      the caller runs the SQL template then.
+    """
+
+    def __init__(self,
+                 pool: ConnectionPool = read_pool,
+                 table: str = config.FILM_SUMMARY_TABLE,
+                 max_age: float = config.COLUMNAR_CATALOG_MAX_AGE) -> None:
+        self.pool = pool
+        self.table = table
+        self.max_age = max_age
+        self._snapshot = None
+        self._built_at = 0.0
+        self._next_build = 0.0 # monotonic time of the next (re)build, a failed build is retried after max_age too
+        self._build_lock = threading.Lock()
+        self._failed = False
+        self.build_seconds = None
+
+    def _query(self) -> str:
+        return f"""
+                    SELECT
+                        title, release_year, genre, actors
+                    FROM
+                        {self.table}
+                    ORDER BY title, film_id;
+                """
+
+    def _rows_from_mysql(self) -> tuple:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(self._query())
+                return cursor.fetchall()
+
+    def build(self) -> None:
+        """
+        Reads the film summary into columns, then swaps the new snapshot in.
+        Like the searches, the rows come from the local replica when READ_FROM_REPLICA says so (see LocalReplica.route),
+        so a rebuild while MySQL is down does not wait for the connect timeout again.
+        """
+        import numpy as np
+
+        start = time.perf_counter()
+        rows = local_replica.route(self._rows_from_mysql, lambda: local_replica.fetch(self._query(), {}))
+
+        titles, years, genre_names, actors = (list(column) for column in zip(*rows)) if rows else ([], [], [], [])
+        genres = sorted({genre for genre in genre_names if genre is not None})
+        codes = {genre: code for code, genre in enumerate(genres)}
+        snapshot = _Snapshot(
+            years=np.array([NO_YEAR if year is None else year for year in years], dtype=np.int16),
+            genre_codes=np.array([codes.get(genre, NO_GENRE) for genre in genre_names], dtype=np.int16),
+            genres=genres,
+            titles=titles,
+            actors=actors,
+        )
+
+        self._snapshot = snapshot
+        self._built_at = time.monotonic()
+        self._next_build = self._built_at + self.max_age
+        self._failed = False
+        self.build_seconds = time.perf_counter() - start
+
+    def _current(self) -> _Snapshot | None:
+        """The snapshot, built on the first use and rebuilt when it is too old. None if it can't be built."""
+        if time.monotonic() < self._next_build:
+            return self._snapshot
+        with self._build_lock: #only one thread builds, the others wait for it
+            if time.monotonic() >= self._next_build:
+                try:
+                    self.build()
+                except Exception as e:
+                    if not self._failed:
+                        reason = "NumPy is missing (pip install numpy)" if isinstance(e, ImportError) else str(e)
+                        print(Fore.RED + f"The columnar catalog could not be built ({reason}), the searches use MySQL.")
+                    self._failed = True
+                    self._next_build = time.monotonic() + self.max_age
+        return self._snapshot #after a failed rebuild the older snapshot is still better than nothing
+
+    #===================SEARCHES========================================
+    def _result(self, snapshot: _Snapshot, mask, by_year: bool = False) -> ColumnarResult:
+        import numpy as np
+
+        positions = np.flatnonzero(mask)
+        if by_year:
+            positions = positions[np.argsort(snapshot.years[positions], kind="stable")]
+        return ColumnarResult(snapshot, positions)
+
+    def year(self, year: int) -> ColumnarResult | None:
+        """WHERE release_year = year ORDER BY title, film_id"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        return self._result(snapshot, snapshot.years == year)
+
+    def year_range(self, year_1: int, year_2: int) -> ColumnarResult | None:
+        """WHERE release_year BETWEEN year_1 AND year_2 ORDER BY release_year, title, film_id"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        years = snapshot.years
+        return self._result(snapshot, (years >= year_1) & (years <= year_2), by_year=True)
+
+    def genre(self, genre: str) -> ColumnarResult | None:
+        """WHERE genre = genre ORDER BY title, film_id"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        code = snapshot.codes.get(str(genre).casefold())
+        if code is None:
+            return ColumnarResult(snapshot, ())
+        return self._result(snapshot, snapshot.genre_codes == code)
+
+    def genre_year(self, genre: str, year_1: int, year_2: int | None = None) -> ColumnarResult | None:
+        """A genre in one year (year_2 is None) or in a range of years, ORDER BY release_year, title, film_id"""
+        snapshot = self._current()
+        if snapshot is None:
+            return None
+        code = snapshot.codes.get(str(genre).casefold())
+        if code is None:
+            return ColumnarResult(snapshot, ())
+        years = snapshot.years
+        in_years = (years >= year_1) & (years <= year_2) if year_1 and year_2 else years == year_1
+        return self._result(snapshot, (snapshot.genre_codes == code) & in_years, by_year=True)
+
+    @STAGE_SECONDS.time(stage="columnar")
+    def search(self, search: str, value: Any = None,
+               year_from: int | None = None, year_to: int | None = None) -> ColumnarResult | None:
+        """The year and genre searches by name (see SearchEngine.spec_query). None for the others."""
+        if search == "year":
+            return self.year(int(value))
+        if search == "range":
+            return self.year_range(year_from, year_to)
+        if search == "genre":
+            return self.genre(str(value))
+        if search == "genre_year":
+            return self.genre_year(str(value), year_from, year_to)
+        return None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"films": 0, "built": "no"}
+        memory = snapshot.years.nbytes + snapshot.genre_codes.nbytes
+        return {
+            "films": len(snapshot),
+            "genres": len(snapshot.genres),
+            "columns": f"{memory / 1024:.1f} KiB",
+            "build": f"{self.build_seconds:.2f} s",
+            "age": f"{time.monotonic() - self._built_at:.0f} s",
+        }
+
+
+columnar_catalog = ColumnarCatalog()
@@ -0,0 +1,213 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import pymysql
+
+import CONFIG_AND_MODULES as config
+
+
+class ConnectionPool:
+    """
+    A small, thread-safe pool of persistent pymysql connections.
+
+    - Bounded: never opens more than `max_size` connections at once.
+    - Health checks: every idle connection is pinged before it is handed out.
+    - Idle eviction: connections unused for longer than `idle_timeout` seconds are closed.
+    - Metrics: see stats().
+
+    Connections are opened lazily, so creating a pool costs nothing until the first checkout.
+    """
+
+    def __init__(self,
+                 db_config: dict,
+                 max_size: int = config.POOL_MAX_SIZE,
+                 idle_timeout: float = config.POOL_IDLE_TIMEOUT,
+                 checkout_timeout: float = config.POOL_CHECKOUT_TIMEOUT) -> None:
+        self.db_config = dict(db_config)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = []  # [(connection, time it was returned)], the most recently used is the last one
+        self._in_use = 0
+        self._lock = threading.Condition()
+
+        self.created = 0
+        self.reused = 0
+        self.evicted_idle = 0
+        self.failed_pings = 0
+        self.waits = 0
+        self.checkouts = 0
+
+    def _open(self) -> pymysql.connections.Connection:
+        conn = pymysql.connect(**self.db_config)
+        with self._lock:
+            self.created += 1
+        return conn
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self) -> list:
+        """
+        Takes every idle connection which has not been used for idle_timeout seconds out of the pool. Lock must be held.
+        Returns them, the caller closes them after releasing the lock.
+        """
+        now = time.monotonic()
+        alive, stale = [], []
+        for conn, returned_at in self._idle:
+            if now - returned_at > self.idle_timeout:
+                stale.append(conn)
+                self.evicted_idle += 1
+            else:
+                alive.append((conn, returned_at))
+        self._idle = alive
+        return stale
+
+    def _reserve(self, deadline: float):
+        """
+        Takes a slot: returns the most recently used idle connection (not pinged yet),
+        or None when a new connection may be opened. Waits while all slots are busy.
+        """
+        stale = []
+        try:
+            with self._lock:
+                while True:
+                    stale += self._evict_idle()
+                    if self._idle:
+                        self._in_use += 1
+                        return self._idle.pop()[0]
+
+                    if self._in_use < self.max_size:
+                        self._in_use += 1
+                        return None
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise pymysql.err.OperationalError(
+                            f"Connection pool exhausted: all {self.max_size} connections are busy")
+                    self.waits += 1
+                    self._lock.wait(remaining)
+        finally:
+            for conn in stale:
+                self._close_quietly(conn)
+
+    def _give_back_slot(self) -> None:
+        with self._lock:
+            self._in_use -= 1
+            self._lock.notify()
+
+    def acquire(self) -> pymysql.connections.Connection:
+        """
+        Takes a healthy connection from the pool (or opens a new one).
+
+        Waits up to checkout_timeout seconds when all max_size connections are busy,
+        then raises pymysql.err.OperationalError, so callers handle it like any other connection issue.
+        The lock is held only to take the slot and to count: the ping, the connect and the closing
+        of dead connections run outside it, so one slow server round trip doesn't stall every other checkout.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn = self._reserve(deadline)
+            if conn is None:
+                break
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                self._close_quietly(conn)
+                with self._lock:
+                    self.failed_pings += 1
+                self._give_back_slot()
+                continue
+            with self._lock:
+                self.reused += 1
+                self.checkouts += 1
+            return conn
+
+        try:
+            conn = self._open()
+        except Exception:
+            self._give_back_slot()
+            raise
+        with self._lock:
+            self.checkouts += 1
+        return conn
+
+    def release(self, conn, broken: bool = False) -> None:
+        """
+        Returns the connection to the pool. Broken connections are closed instead of being reused.
+
+        The transaction of the connection is rolled back first (autocommit is off): a SELECT opens
+        a REPEATABLE READ snapshot, which would otherwise be served to every later caller
+        and would hold a metadata lock on the tables it read (blocking e.g. the RENAME of the film summary).
+        Whatever should stay must be committed before the release.
+        """
+        if not broken and conn.open:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        if broken or not conn.open:
+            self._close_quietly(conn)
+        with self._lock:
+            self._in_use -= 1
+            if not broken and conn.open:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[pymysql.connections.Connection]:
+        """
+        with pool.connection() as conn: ...
+
+        Any exception inside the block marks the connection as broken, so a half-finished
+        transaction or an unread result set is never handed to the next caller.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, broken=True)
+            raise
+        else:
+            self.release(conn)
+
+    def set_database(self, database: str) -> None:
+        """Makes `database` the default schema for idle and future connections (USE database)."""
+        with self._lock:
+            self.db_config["database"] = database
+            for conn, _ in self._idle:
+                conn.select_db(database)
+
+    def close_all(self) -> None:
+        """Closes all idle connections. Connections that are in use are closed when they are released."""
+        with self._lock:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._idle = []
+
+    def stats(self) -> dict:
+        """Snapshot of the pool metrics."""
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self.created,
+                "reused": self.reused,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "evicted_idle": self.evicted_idle,
+                "failed_pings": self.failed_pings,
+            }
+
+
+read_pool = ConnectionPool(config.DB_CONFIG_READ)    # sakila, used by executor_sql
+write_pool = ConnectionPool(config.DB_CONFIG_WRITE)  # accounts, used by UserStorage
+summary_pool = ConnectionPool(config.DB_CONFIG_SUMMARY, max_size=1)  # DDL of the film summary, used by FilmSummary
@@ -0,0 +1,237 @@
+#============================================================================================================================#
+#                     Exporter streams a whole result set into a CSV, JSONL or Parquet file                                  #
+#          The rows come from an unbuffered server-side cursor (SSCursor) in fetchmany batches and go straight to            #
+#                    the writer, so an export of the whole catalog needs the memory of one batch                             #
+#            The file is written as <output>.part and renamed at the end, a failed export leaves no truncated file           #
+#                                                                                                                            #
+#   python Exporter.py --search all --format parquet --output catalog.parquet                                                #
+#   python Exporter.py --search genre_year --value Drama --year-from 2005 --year-to 2007 --output drama.csv                  #
+#                                                                                                                            #
+#   Parquet needs pyarrow (pip install pyarrow), CSV and JSONL need nothing.                                                 #
+#============================================================================================================================#
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from typing import Any, Iterator
+
+import pymysql
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+FORMATS = ("csv", "jsonl", "parquet")
+FILM_COLUMNS = ["title", "release_year", "genre", "actors"] #the columns of every search template
+
+
+class RowStream:
+    """
+    with RowStream(query, params) as rows:
+        rows.columns  - the column names
+        for row in rows: ...
+
+    The connection stays checked out of the pool while the rows are read. If the stream is left early
+    (an error, a break) the connection is closed instead of returned, the unread rows die with it.
+    """
+
+    def __init__(self,
+                 query: str,
+                 params: dict,
+                 pool: ConnectionPool = read_pool,
+                 batch_size: int = config.EXPORT_FETCH_SIZE) -> None:
+        self.query = query
+        self.params = params
+        self.pool = pool
+        self.batch_size = batch_size
+        self.columns = []
+        self._conn = None
+        self._cursor = None
+        self._exhausted = False
+
+    def __enter__(self) -> "RowStream":
+        self._conn = self.pool.acquire()
+        try:
+            self._cursor = self._conn.cursor(pymysql.cursors.SSCursor)
+            self._cursor.execute(self.query, self.params)
+        except BaseException:
+            self.pool.release(self._conn, broken=True)
+            raise
+        self.columns = [column[0] for column in self._cursor.description]
+        return self
+
+    def __iter__(self) -> Iterator[tuple[Any, ...]]:
+        while True:
+            rows = self._cursor.fetchmany(self.batch_size)
+            if not rows:
+                self._exhausted = True
+                return
+            yield from rows
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._exhausted and exc_type is None:
+            self._cursor.close()
+            self.pool.release(self._conn)
+        else:
+            self.pool.release(self._conn, broken=True) #closing the connection is faster than reading the rest
+
+
+def _batches(rows: Iterator[tuple], size: int) -> Iterator[list[tuple]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def write_csv(columns: list[str], rows: Iterator[tuple], path: str) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(columns: list[str], rows: Iterator[tuple], path: str) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for row in rows:
+            file.write(json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def write_parquet(columns: list[str], rows: Iterator[tuple], path: str,
+                  batch_size: int = config.EXPORT_FETCH_SIZE) -> int:
+    """
+    One row group per batch. The schema is inferred from the first batch,
+    a column which is empty (NULL) there becomes a string column.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("The Parquet export needs pyarrow: pip install pyarrow") from None
+
+    count = 0
+    writer = None
+    schema = None
+    try:
+        for batch in _batches(rows, batch_size):
+            values = list(zip(*batch))
+            if schema is None:
+                inferred = [pa.array(column) for column in values]
+                schema = pa.schema([pa.field(name, pa.string() if array.type == pa.null() else array.type)
+                                    for name, array in zip(columns, inferred)])
+                writer = pq.ParquetWriter(path, schema)
+            arrays = [pa.array(column, type=field.type) for column, field in zip(values, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(batch)
+        if writer is None: #no rows, still a valid file with the column names
+            schema = pa.schema([pa.field(name, pa.string()) for name in columns])
+            writer = pq.ParquetWriter(path, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def write_rows(columns: list[str],
+               rows: Iterator[tuple],
+               path: str,
+               file_format: str = "csv",
+               batch_size: int = config.EXPORT_FETCH_SIZE) -> int:
+    """
+    Writes the rows into `path.part` and renames it to `path` at the end,
+    so a failed export leaves the old file (or none) and never a truncated one. Returns the number of rows.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{file_format}', use one of {', '.join(FORMATS)}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temporary = f"{path}.part"
+    try:
+        if file_format == "parquet":
+            count = write_parquet(columns, rows, temporary, batch_size)
+        elif file_format == "jsonl":
+            count = write_jsonl(columns, rows, temporary)
+        else:
+            count = write_csv(columns, rows, temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary)
+        raise
+    return count
+
+
+def export(query: str,
+           params: dict,
+           path: str,
+           file_format: str = "csv",
+           pool: ConnectionPool = read_pool,
+           batch_size: int = config.EXPORT_FETCH_SIZE) -> int:
+    """
+    Streams all rows of the query into the file. Returns the number of rows.
+    The rows come from where the searches read (READ_FROM_REPLICA): MySQL, the local replica or both.
+    """
+    from LocalReplica import local_replica #LocalReplica imports RowStream from here
+
+    def from_mysql() -> int:
+        with RowStream(query, params, pool, batch_size) as rows:
+            return write_rows(rows.columns, rows, path, file_format, batch_size)
+
+    def from_replica() -> int:
+        columns, rows = local_replica.stream(query, params)
+        return write_rows(columns, rows, path, file_format, batch_size)
+
+    return local_replica.route(from_mysql, from_replica)
+
+
+def default_path(file_format: str) -> str:
+    return os.path.join(config.EXPORT_DIR, f"export-{time.strftime('%Y%m%d-%H%M%S')}.{file_format}")
+
+
+def main() -> None:
+    from SearchEngine import engine
+
+    parser = argparse.ArgumentParser(description="Export the films of a search (or the whole catalog) to a file.")
+    parser.add_argument("--search", required=True, choices=("title", "year", "range", "genre", "genre_year", "actor", "all"))
+    parser.add_argument("--value", help="title fragment, year, genre or actor name prefix")
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("--format", choices=FORMATS, help="default: by the extension of --output, csv otherwise")
+    parser.add_argument("--output", help=f"default: {config.EXPORT_DIR}/export-<time>.<format>")
+    parser.add_argument("--batch-size", type=int, default=config.EXPORT_FETCH_SIZE)
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.output)[1].lstrip(".") if args.output else ""
+    file_format = args.format or (extension if extension in FORMATS else "csv")
+    path = args.output or default_path(file_format)
+
+    start = time.perf_counter()
+    try:
+        query, params = engine.spec_query(args.search, args.value, args.year_from, args.year_to)
+        count = export(query, params, path, file_format, engine.pool, args.batch_size)
+    except Exception as e:
+        print(Fore.RED + f"Export failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        engine.pool.close_all()
+
+    elapsed = time.perf_counter() - start
+    print(Fore.GREEN + f"{count} rows written to {path} in {elapsed:.2f} s "
+                       f"({count / elapsed if elapsed else 0:.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
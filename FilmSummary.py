@@ -0,0 +1,219 @@
+#============================================================================================================================#
+#                 The film summary is a materialized version of CONFIG_AND_MODULES.main_table                                #
+#         Searches read it through its indexes instead of running the whole-catalog CTE for every single query               #
+#                                                                                                                            #
+#   python FilmSummary.py build     - (re)builds the whole table and swaps it in atomically                                  #
+#   python FilmSummary.py refresh   - re-aggregates only the films changed since the last build/refresh (last_update)        #
+#                                                                                                                            #
+#   Both run with the DB_CONFIG_SUMMARY account (the read account can't create tables). The CLI and the search service       #
+#   check the table at startup: a missing summary is built, and if that fails the searches run on the base tables.           #
+#============================================================================================================================#
+import sys
+import time
+
+import pymysql
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool, summary_pool
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+REFRESH_CHUNK = 1000 # film ids re-aggregated per statement during a refresh
+
+
+def _create_table_sql(table: str) -> str:
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            film_id INT UNSIGNED NOT NULL,
+            category_id INT UNSIGNED NOT NULL DEFAULT 0, -- 0 = film without a category
+            title VARCHAR(255) NOT NULL,
+            release_year YEAR,
+            genre VARCHAR(25),
+            actors TEXT,
+            actor_ids TEXT,
+            source_last_update TIMESTAMP NOT NULL, -- the newest last_update of all source rows of this film
+            PRIMARY KEY (film_id, category_id),
+            KEY idx_title (title),
+            KEY idx_release_year (release_year, title),
+            KEY idx_genre_year (genre, release_year),
+            KEY idx_source_last_update (source_last_update)
+        );
+    """
+
+
+def _aggregate_sql(table: str, where: str = "") -> str:
+    """The same joins and GROUP_CONCAT as main_table, plus the ids and the freshness of every film."""
+    return f"""
+        INSERT INTO {table}
+            (film_id, category_id, title, release_year, genre, actors, actor_ids, source_last_update)
+        SELECT
+            f.film_id,
+            COALESCE(c.category_id, 0),
+            f.title,
+            f.release_year,
+            c.name,
+            GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name) SEPARATOR ', '),
+            GROUP_CONCAT(a.actor_id),
+            GREATEST(
+                MAX(f.last_update),
+                MAX(fa.last_update),
+                MAX(a.last_update),
+                COALESCE(MAX(fc.last_update), MAX(f.last_update)),
+                COALESCE(MAX(c.last_update), MAX(f.last_update))
+            )
+        FROM film f
+        JOIN film_actor fa USING(film_id)
+        JOIN actor a USING(actor_id)
+        LEFT JOIN film_category fc USING(film_id)
+        LEFT JOIN category c USING(category_id)
+        {where}
+        GROUP BY f.film_id, c.category_id, f.title, f.release_year, c.name;
+    """
+
+
+_changed_films_sql = """
+    SELECT film_id FROM film WHERE last_update >= %(since)s
+    UNION
+    SELECT film_id FROM film_actor WHERE last_update >= %(since)s
+    UNION
+    SELECT fa.film_id FROM actor a JOIN film_actor fa USING(actor_id) WHERE a.last_update >= %(since)s
+    UNION
+    SELECT film_id FROM film_category WHERE last_update >= %(since)s
+    UNION
+    SELECT fc.film_id FROM category c JOIN film_category fc USING(category_id) WHERE c.last_update >= %(since)s;
+"""
+
+
+def fallback_source(table: str = config.FILM_SUMMARY_TABLE) -> str:
+    """
+    The summary as a derived table over the base tables (the same columns the searches read, named like the table),
+    for a database without the summary: as slow as the original main_table CTE, but the searches work.
+    """
+    return f"""(
+                    SELECT
+                        f.film_id, COALESCE(c.category_id, 0) AS category_id, f.title, f.release_year, c.name AS genre,
+                        GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name) SEPARATOR ', ') AS actors
+                    FROM film f
+                    JOIN film_actor fa USING(film_id)
+                    JOIN actor a USING(actor_id)
+                    LEFT JOIN film_category fc USING(film_id)
+                    LEFT JOIN category c USING(category_id)
+                    GROUP BY f.film_id, c.category_id, f.title, f.release_year, c.name
+                ) AS {table}"""
+
+
+def film_summary_exists(pool: ConnectionPool = read_pool, table: str = config.FILM_SUMMARY_TABLE) -> bool:
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s;",
+                           (table,))
+            return cursor.fetchone() is not None
+
+
+def ensure_film_summary(pool: ConnectionPool = read_pool,
+                        ddl_pool: ConnectionPool = summary_pool,
+                        table: str = config.FILM_SUMMARY_TABLE) -> str:
+    """
+    What the searches should read: the table, built now if it is missing,
+    or fallback_source() when it can't be built (no rights for DDL, the DB_CONFIG_SUMMARY account is unreachable...).
+    """
+    try:
+        if film_summary_exists(pool, table):
+            return table
+    except pymysql.err.MySQLError: #MySQL is down: nothing to decide now, the searches go to the replica or report it
+        return table
+    print(Fore.LIGHTYELLOW_EX + f"The film summary '{table}' is missing, building it (once)...")
+    try:
+        rows = build_film_summary(ddl_pool, table)
+    except pymysql.err.MySQLError as e:
+        print(Fore.RED + f"The film summary could not be built ({e}). The searches read the base tables instead, "
+                         f"which is much slower - run 'python FilmSummary.py build' with an account allowed to create tables.")
+        return fallback_source(table)
+    print(Fore.GREEN + f"The film summary is built: {rows} rows.")
+    return table
+
+
+def setup_film_summary() -> None:
+    """Checks the summary and points the search engine at it (or at the fallback). Run by Startup and the search service."""
+    from SearchEngine import engine
+    engine.use_source(ensure_film_summary())
+
+
+def build_film_summary(pool: ConnectionPool = summary_pool,
+                       table: str = config.FILM_SUMMARY_TABLE) -> int:
+    """
+    Builds the whole summary into a side table and swaps it in with one atomic RENAME,
+    so searches never see a half-built table.
+
+    Returns the number of rows in the new table.
+    """
+    build_table, old_table = f"{table}_build", f"{table}_old"
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(_create_table_sql(table))
+            cursor.execute(f"DROP TABLE IF EXISTS {build_table}, {old_table};")
+            cursor.execute(_create_table_sql(build_table))
+            cursor.execute(_aggregate_sql(build_table))
+            conn.commit()
+            cursor.execute(f"RENAME TABLE {table} TO {old_table}, {build_table} TO {table};")
+            cursor.execute(f"DROP TABLE {old_table};")
+            cursor.execute(f"SELECT COUNT(*) FROM {table};")
+            return cursor.fetchone()[0]
+
+
+def refresh_film_summary(pool: ConnectionPool = summary_pool,
+                         table: str = config.FILM_SUMMARY_TABLE) -> int:
+    """
+    Incremental refresh driven by the last_update columns of film, film_actor, actor,
+    film_category and category.
+
+    - Takes the newest source_last_update in the summary as the watermark.
+    - Re-aggregates every film with at least one source row changed at or after the watermark.
+    - Drops the rows of films which no longer exist.
+
+    A link row deleted from film_actor/film_category leaves no last_update behind,
+    so such changes need a full build_film_summary().
+
+    Returns the number of re-aggregated films.
+    """
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(_create_table_sql(table))
+            cursor.execute(f"SELECT MAX(source_last_update) FROM {table};")
+            since = cursor.fetchone()[0]
+            if since is None: #empty table, nothing to be incremental about
+                conn.commit()
+                return build_film_summary(pool, table)
+
+            cursor.execute(_changed_films_sql, {"since": since})
+            changed = [row[0] for row in cursor.fetchall()]
+
+            for start in range(0, len(changed), REFRESH_CHUNK):
+                ids = tuple(changed[start:start + REFRESH_CHUNK])
+                cursor.execute(f"DELETE FROM {table} WHERE film_id IN %(ids)s;", {"ids": ids})
+                cursor.execute(_aggregate_sql(table, "WHERE f.film_id IN %(ids)s"), {"ids": ids})
+
+            cursor.execute(f"""
+                DELETE s FROM {table} s
+                LEFT JOIN film f USING(film_id)
+                WHERE f.film_id IS NULL;
+            """)
+            conn.commit()
+            return len(changed)
+
+
+if __name__ == "__main__":
+    commands = {"build": build_film_summary, "refresh": refresh_film_summary}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print(Fore.LIGHTRED_EX + "Usage: python FilmSummary.py build|refresh")
+        sys.exit(2)
+
+    start = time.perf_counter()
+    count = commands[sys.argv[1]]()
+    elapsed = time.perf_counter() - start
+    if sys.argv[1] == "build":
+        print(Fore.GREEN + f"{config.FILM_SUMMARY_TABLE} built: {count} rows in {elapsed:.2f} s")
+    else:
+        print(Fore.GREEN + f"{config.FILM_SUMMARY_TABLE} refreshed: {count} films re-aggregated in {elapsed:.2f} s")
+    summary_pool.close_all()
@@ -0,0 +1,92 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+import CONFIG_AND_MODULES as config
+
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch")
+
+
+class LazyResultSet:
+    """
+    A result set which is never fetched as a whole.
+
+    - len(results) runs one COUNT(*) over the query (and remembers it).
+    - results[start:stop] runs the query with LIMIT/OFFSET for exactly that slice.
+    - After every slice the next `prefetch` slices of the same size are fetched in the background,
+      so pressing 'n' is usually served from memory.
+
+    Only the current page, the previous one and the prefetched ones are kept,
+    so memory is bounded by the page size and not by the size of the result.
+
+    The query must be a single SELECT (a leading WITH is fine) with a deterministic ORDER BY,
+    otherwise the pages may overlap.
+    """
+
+    def __init__(self,
+                 query: str,
+                 params: dict,
+                 fetch: Callable[[str, dict], tuple[tuple[Any, ...], ...]],
+                 prefetch: int = config.PAGE_PREFETCH) -> None:
+        self.query = query.strip().rstrip(";")
+        self.params = params
+        self.fetch = fetch
+        self.prefetch = prefetch
+        self._count = None
+        self._pages = {}  # (start, stop) -> rows or Future with rows
+
+    def __len__(self) -> int:
+        if self._count is None:
+            count_query = f"SELECT COUNT(*) FROM ({self.query}) AS counted_results"
+            self._count = self.fetch(count_query, self.params)[0][0]
+        return self._count
+
+    def _fetch_page(self, start: int, stop: int) -> tuple[tuple[Any, ...], ...]:
+        page_query = f"{self.query} LIMIT %(page_limit)s OFFSET %(page_offset)s"
+        return self.fetch(page_query, {**self.params, "page_limit": stop - start, "page_offset": start})
+
+    def __getitem__(self, item: slice) -> tuple[tuple[Any, ...], ...]:
+        if not isinstance(item, slice):
+            raise TypeError("LazyResultSet supports only slices, e.g. results[start:stop]")
+        start, stop, _ = item.indices(len(self))
+        if start >= stop:
+            return ()
+
+        page = self._pages.get((start, stop))
+        if isinstance(page, Future):
+            page = page.result()
+        if page is None:
+            page = self._fetch_page(start, stop)
+
+        size = (item.stop if item.stop is not None else stop) - start #the page size, even for the short last page
+        wanted = {(start - size, start), (start, stop)}
+        for step in range(1, self.prefetch + 1):
+            next_start = start + step * size
+            if next_start >= len(self):
+                break
+            next_key = (next_start, min(next_start + size, len(self)))
+            wanted.add(next_key)
+            if next_key not in self._pages:
+                self._pages[next_key] = _prefetcher.submit(self._fetch_page, *next_key)
+
+        self._pages[(start, stop)] = page
+        for key in [key for key in self._pages if key not in wanted]:
+            stale = self._pages.pop(key)
+            if isinstance(stale, Future):
+                stale.cancel()
+        return page
+
+    def rows(self, batch_size: int = config.EXPORT_FETCH_SIZE) -> Iterator[tuple[Any, ...]]:
+        """All rows, page by page, without keeping or prefetching the pages (Exporter)."""
+        start = 0
+        while page := self._fetch_page(start, start + batch_size):
+            yield from page
+            if len(page) < batch_size:
+                return
+            start += batch_size
+
+    def close(self) -> None:
+        """Drops the kept pages and cancels the prefetches which haven't started yet."""
+        for page in self._pages.values():
+            if isinstance(page, Future):
+                page.cancel()
+        self._pages = {}
@@ -0,0 +1,320 @@
+#============================================================================================================================#
+#                    LocalReplica is an SQLite copy of the catalog: the Sakila tables the searches read + film_summary       #
+#                                                                                                                            #
+#   python LocalReplica.py sync      - the first time a bulk copy, then only the rows changed since the last sync            #
+#                                      (last_update), and the rows deleted upstream are removed                              #
+#                                      film_summary is derived, it is copied in full every time                              #
+#   python LocalReplica.py sync --full - every table copied from scratch                                                     #
+#   python LocalReplica.py status    - rows and the last sync of every table                                                 #
+#                                                                                                                            #
+#   READ_FROM_REPLICA (CONFIG_AND_MODULES) decides when the searches read it: never, while MySQL is down, or always.         #
+#   The MySQL templates are translated on the fly: %(x)s -> :x, IN %(ids)s -> IN (:ids_0, ...), GROUP_CONCAT ... SEPARATOR.  #
+#============================================================================================================================#
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, TypeVar
+
+import pymysql
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+from Exporter import RowStream
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+T = TypeVar("T")
+SYNC_BATCH = 5000 # rows per executemany into SQLite
+
+# table -> columns (name, SQLite type), primary key, the column of the incremental sync,
+# "full": copied in full on every sync - the film summary: a rebuild after a deleted link recomputes
+# source_last_update from the remaining rows, which may be older than the watermark, so its changes can't be found by it
+TABLES = {
+    "category": {
+        "columns": [("category_id", "INTEGER"), ("name", "TEXT COLLATE NOCASE"), ("last_update", "TEXT")],
+        "key": ["category_id"], "updated": "last_update",
+    },
+    "actor": {
+        "columns": [("actor_id", "INTEGER"), ("first_name", "TEXT COLLATE NOCASE"),
+                    ("last_name", "TEXT COLLATE NOCASE"), ("last_update", "TEXT")],
+        "key": ["actor_id"], "updated": "last_update",
+    },
+    "film": {
+        "columns": [("film_id", "INTEGER"), ("title", "TEXT COLLATE NOCASE"), ("release_year", "INTEGER"),
+                    ("last_update", "TEXT")],
+        "key": ["film_id"], "updated": "last_update",
+    },
+    "film_actor": {
+        "columns": [("actor_id", "INTEGER"), ("film_id", "INTEGER"), ("last_update", "TEXT")],
+        "key": ["actor_id", "film_id"], "updated": "last_update",
+    },
+    "film_category": {
+        "columns": [("film_id", "INTEGER"), ("category_id", "INTEGER"), ("last_update", "TEXT")],
+        "key": ["film_id", "category_id"], "updated": "last_update",
+    },
+    config.FILM_SUMMARY_TABLE: {
+        "columns": [("film_id", "INTEGER"), ("category_id", "INTEGER"), ("title", "TEXT COLLATE NOCASE"),
+                    ("release_year", "INTEGER"), ("genre", "TEXT COLLATE NOCASE"), ("actors", "TEXT"),
+                    ("actor_ids", "TEXT"), ("source_last_update", "TEXT")],
+        "key": ["film_id", "category_id"], "updated": "source_last_update", "full": True,
+    },
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_film_actor_film ON film_actor (film_id)",
+    "CREATE INDEX IF NOT EXISTS idx_film_category_category ON film_category (category_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_summary_title ON {config.FILM_SUMMARY_TABLE} (title)",
+    f"CREATE INDEX IF NOT EXISTS idx_summary_year ON {config.FILM_SUMMARY_TABLE} (release_year, title)",
+    f"CREATE INDEX IF NOT EXISTS idx_summary_genre_year ON {config.FILM_SUMMARY_TABLE} (genre, release_year)",
+]
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+_GROUP_CONCAT = re.compile(r"GROUP_CONCAT\((?P<expr>.+?)(?:\s+ORDER BY\s+(?P<order>.+?))?\s+SEPARATOR\s+(?P<sep>'[^']*')\)",
+                           re.IGNORECASE)
+
+
+def _concat(*values: Any) -> str | None:
+    """MySQL CONCAT(): NULL if any argument is NULL."""
+    if any(value is None for value in values):
+        return None
+    return "".join(str(value) for value in values)
+
+
+def _sqlite_value(value: Any) -> Any:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else value
+
+
+def translate(query: str, params: dict) -> tuple[str, dict]:
+    """A MySQL template of SearchEngine / CatalogMetadata -> (SQLite query, named params)."""
+    named = {}
+
+    def parameter(match: re.Match) -> str:
+        name = match.group(1)
+        value = params[name]
+        if isinstance(value, (tuple, list)): #pymysql renders a tuple as (a, b, ...)
+            names = [f"{name}_{i}" for i in range(len(value))]
+            named.update(zip(names, value))
+            return "(" + ", ".join(f":{n}" for n in names) + ")"
+        named[name] = value
+        return f":{name}"
+
+    def group_concat(match: re.Match) -> str:
+        order = match.group("order")
+        if order and sqlite3.sqlite_version_info >= (3, 44, 0):
+            return f"group_concat({match.group('expr')}, {match.group('sep')} ORDER BY {order})"
+        return f"group_concat({match.group('expr')}, {match.group('sep')})" #older SQLite: the order inside a group is lost
+
+    query = _PARAM.sub(parameter, query)
+    query = _GROUP_CONCAT.sub(group_concat, query)
+    return query, named
+
+
+class LocalReplica:
+    """
+    The SQLite replica: sync() writes it, fetch() reads it, route() decides where a read goes.
+
+    Every thread reads through its own read-only SQLite connection (the page prefetcher runs in another thread).
+    """
+
+    def __init__(self, path: str = config.REPLICA_PATH, pool: ConnectionPool = read_pool) -> None:
+        self.path = path
+        self.pool = pool
+        self._local = threading.local()
+        self._upstream_down_until = 0.0
+        self._warned = False
+
+    #===================READING========================================
+    def _connect(self, read_only: bool = True) -> sqlite3.Connection:
+        if read_only:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        else:
+            conn = sqlite3.connect(self.path)
+        conn.create_function("CONCAT", -1, _concat, deterministic=True)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def available(self) -> bool:
+        """True when the replica file exists and has been synced at least once."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            return self._reader().execute("SELECT COUNT(*) FROM sync_state").fetchone()[0] > 0
+        except sqlite3.Error:
+            return False
+
+    def fetch(self, query: str, params: dict) -> tuple[tuple[Any, ...], ...]:
+        sqlite_query, named = translate(query, params)
+        return tuple(self._reader().execute(sqlite_query, named).fetchall())
+
+    def stream(self, query: str, params: dict) -> tuple[list[str], Iterator[tuple[Any, ...]]]:
+        """Like fetch(), but the rows are read while they are iterated (Exporter). Returns (columns, rows)."""
+        sqlite_query, named = translate(query, params)
+        cursor = self._reader().execute(sqlite_query, named)
+        return [column[0] for column in cursor.description], cursor
+
+    def route(self, primary: Callable[[], T], replica: Callable[[], T]) -> T:
+        """
+        Runs a read on MySQL (primary) or on the replica, following READ_FROM_REPLICA:
+        - "off":      always MySQL
+        - "replica":  always the replica (MySQL if it was never synced)
+        - "fallback": MySQL; if it can't be reached, the replica - and for the next REPLICA_RETRY_SECONDS
+                      the replica right away, so not every search waits for the connect timeout
+        """
+        mode = config.READ_FROM_REPLICA
+        if mode == "replica" and self.available():
+            return replica()
+        if mode == "fallback" and time.monotonic() < self._upstream_down_until and self.available():
+            return replica()
+        try:
+            return primary()
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            if mode == "off" or not self.available():
+                raise
+            self._upstream_down_until = time.monotonic() + config.REPLICA_RETRY_SECONDS
+            if not self._warned:
+                self._warned = True
+                print(Fore.LIGHTRED_EX + f"MySQL is unreachable, the results come from the local replica "
+                                         f"(synced {self.last_sync() or 'at an unknown time'}).")
+            return replica()
+
+    def last_sync(self) -> str | None:
+        try:
+            return self._reader().execute("SELECT MIN(synced_at) FROM sync_state").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    #===================SYNC========================================
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute("CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, watermark TEXT, synced_at TEXT)")
+        for table, spec in TABLES.items():
+            columns = ", ".join(f"{name} {sql_type}" for name, sql_type in spec["columns"])
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({', '.join(spec['key'])}))")
+        for statement in INDEXES:
+            conn.execute(statement)
+
+    def _copy(self, conn: sqlite3.Connection, table: str, spec: dict, since: str | None) -> int:
+        """Copies the rows changed at or after `since` (all rows if None). INSERT OR REPLACE makes it idempotent."""
+        names = [name for name, _ in spec["columns"]]
+        query = f"SELECT {', '.join(names)} FROM {table}"
+        params = {}
+        if since is not None:
+            query += f" WHERE {spec['updated']} >= %(since)s"
+            params["since"] = since
+        insert = f"INSERT OR REPLACE INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+        count = 0
+        batch = []
+        with RowStream(query, params, self.pool, SYNC_BATCH) as rows:
+            for row in rows:
+                batch.append(tuple(_sqlite_value(value) for value in row))
+                if len(batch) == SYNC_BATCH:
+                    conn.executemany(insert, batch)
+                    count += len(batch)
+                    batch = []
+        if batch:
+            conn.executemany(insert, batch)
+            count += len(batch)
+        return count
+
+    def _remove_deleted(self, conn: sqlite3.Connection, table: str, spec: dict) -> int:
+        """Deletes the rows whose keys are gone upstream (deletes leave no last_update behind)."""
+        key = spec["key"]
+        conn.execute("DROP TABLE IF EXISTS temp.upstream_keys")
+        conn.execute(f"CREATE TEMP TABLE upstream_keys ({', '.join(key)}, PRIMARY KEY ({', '.join(key)}))")
+        insert = f"INSERT OR IGNORE INTO temp.upstream_keys VALUES ({', '.join('?' * len(key))})"
+        batch = []
+        with RowStream(f"SELECT {', '.join(key)} FROM {table}", {}, self.pool, SYNC_BATCH) as rows:
+            for row in rows:
+                batch.append(row)
+                if len(batch) == SYNC_BATCH:
+                    conn.executemany(insert, batch)
+                    batch = []
+        if batch:
+            conn.executemany(insert, batch)
+
+        matches = " AND ".join(f"k.{column} = {table}.{column}" for column in key)
+        deleted = conn.execute(f"DELETE FROM {table} WHERE NOT EXISTS (SELECT 1 FROM temp.upstream_keys k WHERE {matches})").rowcount
+        conn.execute("DROP TABLE temp.upstream_keys")
+        return deleted
+
+    @staticmethod
+    def _since(watermark: str | None) -> str | None:
+        """
+        The watermark minus REPLICA_SYNC_OVERLAP_SECONDS: a long transaction may commit rows with a last_update
+        older than the newest row copied last time, the overlap copies them again (INSERT OR REPLACE, no duplicates).
+        """
+        if watermark is None:
+            return None
+        since = datetime.strptime(str(watermark)[:19], "%Y-%m-%d %H:%M:%S") - timedelta(seconds=config.REPLICA_SYNC_OVERLAP_SECONDS)
+        return since.strftime("%Y-%m-%d %H:%M:%S")
+
+    def sync(self, full: bool = False) -> dict[str, tuple[int, int]]:
+        """
+        Brings every table up to date, each one in its own SQLite transaction.
+        full=True (and the tables marked "full") replace all rows instead of copying the changes since the watermark.
+        Returns table -> (copied rows, deleted rows).
+        """
+        conn = self._connect(read_only=False)
+        report = {}
+        try:
+            self._create_schema(conn)
+            conn.commit()
+            for table, spec in TABLES.items():
+                if full or spec.get("full"):
+                    deleted = conn.execute(f"DELETE FROM {table}").rowcount #the copy below writes them back in this transaction
+                    copied = self._copy(conn, table, spec, None)
+                    deleted = max(deleted - copied, 0)
+                else:
+                    row = conn.execute("SELECT watermark FROM sync_state WHERE name = ?", (table,)).fetchone()
+                    since = self._since(row[0] if row else None)
+                    copied = self._copy(conn, table, spec, since)
+                    deleted = self._remove_deleted(conn, table, spec) if since is not None else 0
+                watermark = conn.execute(f"SELECT MAX({spec['updated']}) FROM {table}").fetchone()[0]
+                conn.execute("INSERT OR REPLACE INTO sync_state (name, watermark, synced_at) VALUES (?, ?, ?)",
+                             (table, watermark, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                conn.commit()
+                report[table] = (copied, deleted)
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        self._local = threading.local() #the readers reopen the file and see the new data
+        return report
+
+    def status(self) -> list[tuple]:
+        """(table, rows, watermark, synced_at) of every synced table."""
+        conn = self._reader()
+        return [(name, conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0], watermark, synced_at)
+                for name, watermark, synced_at in conn.execute("SELECT name, watermark, synced_at FROM sync_state ORDER BY name")]
+
+
+local_replica = LocalReplica()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in (["sync"], ["sync", "--full"], ["status"]):
+        print(Fore.LIGHTRED_EX + "Usage: python LocalReplica.py sync [--full] | status")
+        sys.exit(2)
+
+    if sys.argv[1] == "sync":
+        start = time.perf_counter()
+        for table, (copied, deleted) in local_replica.sync(full="--full" in sys.argv).items():
+            print(Fore.CYAN + f"{table:<16} {copied:>9} rows copied, {deleted:>7} deleted")
+        print(Fore.GREEN + f"{config.REPLICA_PATH} synced in {time.perf_counter() - start:.2f} s")
+        read_pool.close_all()
+    elif not local_replica.available():
+        print(Fore.RED + f"{config.REPLICA_PATH} has not been synced yet: python LocalReplica.py sync")
+    else:
+        for table, rows, watermark, synced_at in local_replica.status():
+            print(Fore.CYAN + f"{table:<16} {rows:>9} rows, changes up to {watermark}, synced {synced_at}")
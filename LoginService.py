@@ -0,0 +1,102 @@
+import base64
+import hashlib
+import hmac
+import secrets
+
+import CONFIG_AND_MODULES as config
+from UserStorage import UserStorage, try_exeption
+
+ALGORITHM = "pbkdf2_sha256"
+SALT_BYTES = 16
+
+
+def hash_password(password: str, iterations: int = config.PASSWORD_HASH_ITERATIONS) -> str:
+    """'pbkdf2_sha256$<iterations>$<salt>$<hash>' - everything needed to check the password later is in the string."""
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+
+def hash_length(iterations: int = config.PASSWORD_HASH_ITERATIONS) -> int:
+    """Length of the strings hash_password() makes with `iterations` (the same for every password)."""
+    return len(f"{ALGORITHM}${iterations}$") + len(base64.b64encode(bytes(SALT_BYTES))) + 1 + len(base64.b64encode(bytes(32)))
+
+
+def verify_password(password: str, stored: str, iterations: int = config.PASSWORD_HASH_ITERATIONS) -> tuple[bool, bool]:
+    """
+    (the password is correct, the stored value should be re-hashed).
+
+    Stored values without the pbkdf2_sha256$ prefix are the plaintext passwords of the accounts
+    created before hashing was added: they are compared as they are and always need the upgrade.
+    The comparison is constant-time either way (hmac.compare_digest).
+    """
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != ALGORITHM:
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")), True
+
+    _, rounds, salt, expected = parts
+    try:
+        rounds = int(rounds)
+        salt, expected = base64.b64decode(salt, validate=True), base64.b64decode(expected, validate=True)
+    except ValueError: #binascii.Error is a ValueError
+        return False, False #a damaged hash matches no password, the login just fails
+    if rounds < 1:
+        return False, False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, rounds)
+    return hmac.compare_digest(digest, expected), rounds != iterations
+
+
+class LoginService:
+    """
+    Checks credentials on top of UserStorage.
+
+    - One query per login: the UNIQUE index on username finds the row (username = %s),
+      BINARY username = %s keeps the comparison case-sensitive like before.
+    - Passwords are stored as salted PBKDF2-SHA256 hashes, the cost is PASSWORD_HASH_ITERATIONS.
+      Plaintext (legacy) and cheaper hashes are re-hashed on the next successful login.
+    - Every call takes its own pooled connection, so logins can run in parallel threads.
+      hashlib releases the GIL while hashing.
+    """
+
+    def __init__(self, storage: UserStorage, iterations: int = config.PASSWORD_HASH_ITERATIONS) -> None:
+        self.storage = storage
+        self.iterations = iterations
+        self._dummy_hash = None # for unknown users, see authenticate(); made on first use, hashing costs time
+
+    @property
+    def table(self) -> str:
+        return self.storage.table or "users"
+
+    def hash_password(self, password: str) -> str:
+        return hash_password(password, self.iterations)
+
+    @try_exeption
+    def authenticate(self, username: str, password: str) -> bool:
+        """True if the user exists and the password is correct."""
+        with self.storage.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT id, password FROM {self.table} WHERE username = %s AND BINARY username = %s LIMIT 1",
+                               (username, username))
+                row = cursor.fetchone()
+
+        if row is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash_password(secrets.token_hex(8))
+            verify_password(password, self._dummy_hash, self.iterations) #an unknown user takes as long as a wrong password
+            return False
+
+        user_id, stored = row
+        correct, needs_upgrade = verify_password(password, stored, self.iterations)
+        if correct and needs_upgrade:
+            self._store_hash(user_id, self.hash_password(password))
+        return correct
+
+    def _store_hash(self, user_id: int, password_hash: str) -> None:
+        with self.storage.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"UPDATE {self.table} SET password = %s WHERE id = %s", (password_hash, user_id))
+            conn.commit()
+
+    def register(self, username: str, password: str) -> bool:
+        """Creates the account with the hashed password. False if the username is already taken."""
+        return self.storage.add_user(username, self.hash_password(password))
@@ -0,0 +1,174 @@
+#============================================================================================================================#
+#                        In-process metrics: counters and histograms of the hot path of every search                         #
+#                                                                                                                            #
+#   with STAGE_SECONDS.time(stage="execute"): ...      - records how long the block took                                    #
+#   SEARCHES.inc(status="Success")                      - counts                                                             #
+#   metrics.dump()                                      - writes everything to METRICS_FILE in the Prometheus text format    #
+#============================================================================================================================#
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+
+import CONFIG_AND_MODULES as config
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{str(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._values = {} # labels key -> value
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def prometheus(self) -> list[str]:
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in sorted(self.snapshot().items())]
+
+
+class Gauge(Counter):
+    """A value which is set, not added up (e.g. how long the start took)."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_labels_key(labels)] = value
+
+
+class Histogram:
+    """Cumulative buckets + sum + count per label set, like a Prometheus histogram. Also keeps the max."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # labels key -> {"counts": [per bucket + overflow], "sum", "count", "max"}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+            series["counts"][bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["max"] = max(series["max"], value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observes the duration of the block in seconds, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _quantile(self, counts: list[int], total: int, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the max for the overflow bucket)."""
+        rank, seen = q * total, 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        """labels key -> count, sum, avg, p50/p95 (bucket bounds) and max."""
+        with self._lock:
+            series = {key: {**value, "counts": list(value["counts"])} for key, value in self._series.items()}
+        result = {}
+        for key, value in series.items():
+            count = value["count"]
+            result[key] = {
+                "count": count,
+                "sum": value["sum"],
+                "avg": value["sum"] / count if count else 0.0,
+                "p50": min(self._quantile(value["counts"], count, 0.50), value["max"]),
+                "p95": min(self._quantile(value["counts"], count, 0.95), value["max"]),
+                "max": value["max"],
+            }
+        return result
+
+    def prometheus(self) -> list[str]:
+        with self._lock:
+            series = {key: {**value, "counts": list(value["counts"])} for key, value in self._series.items()}
+        lines = []
+        for key, value in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {value['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {value['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {value['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """All metrics of the process, in the order they were registered."""
+
+    def __init__(self) -> None:
+        self._metrics = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._metrics.setdefault(name, Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def all(self) -> list[Counter | Gauge | Histogram]:
+        return list(self._metrics.values())
+
+    def prometheus_text(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str = config.METRICS_FILE) -> str:
+        """Writes the Prometheus text format atomically (temp file + rename), so a scraper never reads half a file."""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(temp_path, path)
+        return path
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("search_stage_seconds", "Duration of the stages of a search (executor_sql, DB, logging, rendering).")
+SEARCHES = metrics.counter("searches_total", "Searches run by executor_sql, by result status.")
+LOGGED_SEARCHES = metrics.counter("logged_searches_total", "Searches written to the history, by target.")
+STARTUP_SECONDS = metrics.gauge("startup_seconds", "Duration of the background start tasks and the time to the first prompt.")
@@ -0,0 +1,45 @@
+#============================================================================================================================#
+#                        Navigator is the central dispatcher loop of the menus (screens)                                     #
+#                                                                                                                            #
+#   A screen is a function which does its work and RETURNS the next state - go(next_screen, *args) -                         #
+#   instead of calling the next screen itself. run() executes one screen after another in a loop,                            #
+#   so the call stack (and everything the previous screens kept alive) doesn't grow with the session.                        #
+#============================================================================================================================#
+from typing import Any, Callable, NamedTuple
+
+
+class Transition(NamedTuple):
+    """The next state: which screen to show and with which arguments."""
+    screen: Callable[..., Any]
+    args: tuple = ()
+    kwargs: dict = {}
+
+
+def go(screen: Callable[..., Any], *args, **kwargs) -> Transition:
+    """return go(main_menu) - "show the main menu next"."""
+    return Transition(screen, args, kwargs)
+
+
+class Navigate(BaseException):
+    """
+    Leaves the current screen from a nested helper (e.g. a failed min_year() inside a prompt loop):
+    raise Navigate(go(main_menu)).
+
+    BaseException like SystemExit, so the `except Exception` of the prompt loops doesn't swallow it.
+    """
+
+    def __init__(self, transition: Transition) -> None:
+        super().__init__(transition)
+        self.transition = transition
+
+
+def run(start: Callable[..., Any], *args, **kwargs) -> None:
+    """
+    Runs screens until one of them returns None (or exit_program() ends the process).
+    """
+    state = go(start, *args, **kwargs)
+    while state is not None:
+        try:
+            state = state.screen(*state.args, **state.kwargs)
+        except Navigate as jump:
+            state = jump.transition
@@ -1,28 +1,52 @@
 import os
 
-import sqlparse
 from dotenv import load_dotenv
 load_dotenv()
 
+from pymysql.converters import escape_item
+
 import CONFIG_AND_MODULES as config
 from class_MyLogger import MyLogger
+from Metrics import STAGE_SECONDS
 
 
 myLogger = MyLogger()
 
-myLogger.connect_mongo(os.getenv("MONGO"))
-myLogger.create_db(os.getenv("DB_MONGO"))
-myLogger.create_collection(os.getenv("COLLECTION_MONGO"))
-myLogger.create_collection_of_states(os.getenv("COLLECTION_MONGO_STATES"))
-myLogger.set_path_for_last_query(os.getenv("FILE_LAST_QUERY"), "last_query.txt")
-myLogger.set_max_docs_in_collection(24) #25 in fact
-
 
-def pure_query(query: str, params: dict) -> None:
+def setup_query_log() -> None:
+    """
+    Connects the logger to MongoDB and starts the background writer.
+    Startup.start_background() runs it in the background - the MongoDB ping may take up to 3 s.
+    """
+    myLogger.connect_mongo(os.getenv("MONGO"))
+    myLogger.create_db(os.getenv("DB_MONGO"))
+    myLogger.set_max_docs_in_collection(24) #25 in fact
+    myLogger.set_retention(config.LOG_RETENTION,
+                           ttl_seconds=config.LOG_TTL_SECONDS,
+                           trim_every=config.LOG_TRIM_EVERY,
+                           capped_size=config.LOG_CAPPED_SIZE)
+    myLogger.create_collection(os.getenv("COLLECTION_MONGO"))
+    myLogger.create_collection_of_states(os.getenv("COLLECTION_MONGO_STATES"))
+    myLogger.create_counters_collection(os.getenv("COLLECTION_MONGO_COUNTERS")) #optional, TOP N without scanning the history (lifetime totals)
+    myLogger.create_slow_query_collection(os.getenv("COLLECTION_MONGO_SLOW", "slow_queries"), config.SLOW_QUERY_TTL_SECONDS)
+    myLogger.set_path_for_last_query(os.getenv("FILE_LAST_QUERY"), "last_query.txt")
+    myLogger.start_log_writer(max_queue=config.LOG_QUEUE_SIZE, batch_size=config.LOG_BATCH_SIZE)
+
+
+def setup_slow_query_log() -> None:
+    """Only the connection and the slow query collection - for the report of SlowQueryLog.py."""
+    myLogger.connect_mongo(os.getenv("MONGO"))
+    myLogger.create_db(os.getenv("DB_MONGO"))
+    myLogger.create_slow_query_collection(os.getenv("COLLECTION_MONGO_SLOW", "slow_queries"), config.SLOW_QUERY_TTL_SECONDS)
+
+
+@STAGE_SECONDS.time(stage="pure_query")
+def pure_query(query: str, params: dict) -> str | None:
     """
     Prepare a SQL query string by inserting parameters safely.
 
-    - Adds quotes around string values in params.
+    - Escapes the params like pymysql sends them: strings quoted, None as NULL,
+      the id lists of the title/actor indexes as (1,2,3) - (NULL) when nothing matched.
     - Tries to insert params into the query string.
     - If formatting fails, prints an error and returns None.
     - Removes certain table name placeholders from the query.
@@ -31,36 +55,18 @@ def pure_query(query: str, params: dict) -> None:
     Returns the cleaned and formatted query as a string for saving.
     Returns None if there was a formatting error.
     """
-    from functions import main_menu
-    safe_params = {
-        k: f"'{v}'" if isinstance(v, str) else v
-        for k, v in params.items()
-    }
+    safe_params = {k: escape_item(v, "utf8mb4") for k, v in params.items()}
     try:
         query = query % safe_params
     except Exception as e:
         print("SQL formatting error:", e)
-        return main_menu()
+        return None
 
     if config.table_for_actors in query:
         query = query.replace(config.table_for_actors, "")
     elif config.main_table in query:
         query = query.replace(config.main_table, "")
 
+    import sqlparse #imported on the first logged search, not at startup
     query =  sqlparse.format(query.strip(), reindent=True, keyword_case='upper')
     return query
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
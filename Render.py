@@ -0,0 +1,76 @@
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import CONFIG_AND_MODULES as config
+
+ANSI_CODES = re.compile(r"\x1b\[[0-9;]*m")
+
+
+class AnimatedRenderer:
+    """The classic look: every text is typed character by character with a delay."""
+    animated = True
+
+    def write(self, text: str, color: str, delay: float = 0.03, end: str = "\n") -> None:
+        if delay <= 0:
+            sys.stdout.write(color + text)
+        else:
+            for char in text:
+                sys.stdout.write(color + char)
+                sys.stdout.flush()
+                time.sleep(delay)
+        print(end=end)
+
+    @contextmanager
+    def page(self) -> Iterator[None]:
+        """Nothing to collect, the animation writes as it goes."""
+        yield
+
+
+class InstantRenderer:
+    """
+    No delays. Inside page() the texts are collected in a buffer
+    and the whole page is written (and flushed) with one call.
+    """
+    animated = False
+
+    def __init__(self) -> None:
+        self._buffer = None
+
+    def _format(self, text: str, color: str) -> str:
+        return color + text
+
+    def write(self, text: str, color: str, delay: float = 0.03, end: str = "\n") -> None:
+        chunk = self._format(text, color) + end
+        if self._buffer is not None:
+            self._buffer.append(chunk)
+        else:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+
+    @contextmanager
+    def page(self) -> Iterator[None]:
+        self._buffer = []
+        try:
+            yield
+        finally:
+            page, self._buffer = "".join(self._buffer), None
+            sys.stdout.write(page)
+            sys.stdout.flush()
+
+
+class PlainRenderer(InstantRenderer):
+    """Instant and without colors - for pipes, logs and NO_COLOR terminals."""
+
+    def _format(self, text: str, color: str) -> str:
+        return ANSI_CODES.sub("", text)
+
+
+def get_renderer(mode: str = config.RENDER_MODE) -> AnimatedRenderer | InstantRenderer:
+    renderers = {"animated": AnimatedRenderer, "instant": InstantRenderer, "plain": PlainRenderer}
+    return renderers.get(mode, AnimatedRenderer)()
+
+
+renderer = get_renderer()
@@ -0,0 +1,124 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+import CONFIG_AND_MODULES as config
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _size_of(rows: Any) -> int:
+    """Approximate memory of a result: the containers plus every value (shared values are counted every time)."""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        if isinstance(row, (tuple, list)):
+            size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class ResultCache:
+    """
+    LRU + TTL cache of query results.
+
+    - The key is the query text with collapsed whitespace plus the params,
+      so the same template with the same values is one entry wherever it was built.
+    - Entries older than `ttl` seconds are never returned.
+    - When there are more than `max_entries` entries or they take more than `max_bytes`,
+      the least recently used ones are evicted.
+
+    Hits, misses, expirations and evictions are counted, see stats().
+    """
+
+    def __init__(self,
+                 max_entries: int = config.RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = config.RESULT_CACHE_MAX_BYTES,
+                 ttl: float = config.RESULT_CACHE_TTL) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (rows, stored_at, size), the most recently used at the end
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(query: str, params: dict) -> tuple:
+        normalized = _WHITESPACE.sub(" ", query).strip()
+        return normalized, tuple(sorted((name, repr(value)) for name, value in params.items()))
+
+    def get(self, query: str, params: dict) -> tuple[bool, Any]:
+        """(True, rows) on a hit, (False, None) on a miss - empty results are cached as well."""
+        key = self.key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            rows, stored_at, size = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, rows
+
+    def put(self, query: str, params: dict, rows: Any) -> None:
+        key = self.key(query, params)
+        size = _size_of(rows)
+        if size > self.max_bytes: #would evict everything else and still not fit
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (rows, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_fetch(self, query: str, params: dict, fetch: Callable[[str, dict], Any]) -> Any:
+        """Cached rows, or fetch(query, params) stored for the next time. The lock is not held while fetching."""
+        found, rows = self.get(query, params)
+        if found:
+            return rows
+        rows = fetch(query, params)
+        self.put(query, params, rows)
+        return rows
+
+    def _remove(self, key: tuple) -> None:
+        rows, stored_at, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate(self) -> None:
+        """Drops every entry, e.g. after the film summary was rebuilt."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+result_cache = ResultCache()
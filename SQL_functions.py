@@ -1,5 +1,6 @@
+import time
 from math import ceil
-from typing import Callable, Any
+from typing import Callable, Any, Sequence
 from collections import defaultdict
 
 import pymysql
@@ -8,8 +9,19 @@ import CONFIG_AND_MODULES as config
 from colorama import Fore, init
 import functions as f
 from QueryLogger import myLogger
+from ConnectionPool import read_pool
+from CatalogMetadata import catalog_metadata
+from ResultCache import result_cache
+from LocalReplica import local_replica
+from Metrics import SEARCHES, STAGE_SECONDS
+from SearchEngine import engine
+from Render import renderer
+from Navigator import Navigate, Transition, go
+from LazyResults import LazyResultSet
+from SearchService import ServiceResultSet, history_label, search_client
+from SlowQueryLog import slow_query_log
 
-init(autoreset=True)
+init(autoreset=True, strip=config.STRIP_COLORS)
 
 
 #============================================================================================================================#                                                                                                                           #
@@ -24,8 +36,9 @@ def executor_sql(
         need_to_log:bool=True,
         search_key:str=None,
         search_value:str=None,
+        rows:Sequence[tuple[Any, ...]]=None,
         **params
-) -> tuple[tuple[Any, ...], ...] | None:
+) -> tuple[tuple[Any, ...], ...] | Transition:
     """
         Executes SQL query and handles results/logging.
 
@@ -36,39 +49,42 @@ def executor_sql(
             title (bool): Helps adjust flow for title-specific searches.
             need_to_log (bool): If True, logs query to Mongo.
             search_key/value: Info for logging.
+            rows: Rows found without running the query here (search service, columnar catalog), the query is only logged.
             **params: Params for SQL placeholders — allow fine-tuning specific queries.
 
         Returns:
-            Raw results or paginated rendering, or None on error.
+            Raw results (get_only_result), otherwise the next screen for Navigator.run().
     """
     try:
-        with pymysql.connect(**config.DB_CONFIG_READ) as conn:
-            with conn.cursor() as cursor:
-                cursor.execute(query, params)
-                results = cursor.fetchall()
-                status = "Success" if results else "Failure"
-
-                if need_to_log:
-                    myLogger.extract_query_and_params(query, params)
-                    myLogger.set_query_result_status(status, search_key, search_value)
-                    myLogger.log_in_mongo()
-                    myLogger.log_in_txt()
-
-                if not results:
-                    print(Fore.RED + "No results found.", end="\n\n")
-
-                    if actor:
-                        f.print_slowly("Try again:", Fore.RED, end="\n\n", delay=0.02)
-                        return f.find_by_actor()
-                    if title:
-                        f.print_slowly("Try again:", Fore.RED, end="\n\n", delay=0.02)
-                        return f.find_by_title()
-                    return f.lets_begin()
-
-                if get_only_result:
-                    return results
-                else:
-                    return paginate_list(results, render_films, actor=actor)
+        with STAGE_SECONDS.time(stage="executor_sql"):
+            if rows is not None:
+                results = rows
+            elif config.PAGINATION_MODE == "lazy" and not get_only_result:
+                results = LazyResultSet(query, params, fetch_rows) #only COUNT(*) now, the pages are fetched while paging
+            else:
+                results = fetch_rows(query, params)
+        status = "Success" if results else "Failure"
+        SEARCHES.inc(status=status)
+
+        if need_to_log:
+            with STAGE_SECONDS.time(stage="log_enqueue"):
+                myLogger.log_query(query, params, status, search_key, search_value) #queued, written in the background
+
+        if not results:
+            print(Fore.RED + "No results found.", end="\n\n")
+
+            if actor:
+                f.print_slowly("Try again:", Fore.RED, end="\n\n", delay=0.02)
+                return go(f.find_by_actor)
+            if title:
+                f.print_slowly("Try again:", Fore.RED, end="\n\n", delay=0.02)
+                return go(f.find_by_title)
+            return go(f.lets_begin)
+
+        if get_only_result:
+            return results
+        else:
+            return go(paginate_list, results, render_films, actor=actor, source=(query, params))
 
     except (pymysql.err.OperationalError,
             pymysql.err.ProgrammingError,
@@ -79,32 +95,92 @@ def executor_sql(
             pymysql.err.DatabaseError,
             Exception) as e:
         print(Fore.RED + str(e), end='\n\n')
-        return f.main_menu()
+        return go(f.main_menu)
+
+def fetch_rows(query: str, params: dict) -> tuple[tuple[Any, ...], ...]:
+    """
+    Returns all rows of the query - from the result cache when the same query with the same params
+    ran recently, otherwise from a pooled connection (which goes back to the pool right away).
+    Lazy pages and their COUNT(*) come through here too, so they are cached page by page.
+    """
+    if config.RESULT_CACHE:
+        return result_cache.get_or_fetch(query, params, _fetch_from_db)
+    return _fetch_from_db(query, params)
+
+
+def _fetch_from_db(query: str, params: dict) -> tuple[tuple[Any, ...], ...]:
+    """MySQL, or the local SQLite replica when READ_FROM_REPLICA says so (or MySQL is down), see LocalReplica.route."""
+    return local_replica.route(lambda: _fetch_from_mysql(query, params),
+                               lambda: _fetch_from_replica(query, params))
+
+
+@STAGE_SECONDS.time(stage="replica")
+def _fetch_from_replica(query: str, params: dict) -> tuple[tuple[Any, ...], ...]:
+    return local_replica.fetch(query, params)
+
+
+def _fetch_from_mysql(query: str, params: dict) -> tuple[tuple[Any, ...], ...]:
+    """
+    Every stage is timed separately: waiting for a connection, execute() on the server, fetchall() over the wire.
+    execute() + fetchall() over SLOW_QUERY_SECONDS goes to the slow query log (with its EXPLAIN plan).
+    """
+    checkout = time.perf_counter()
+    with read_pool.connection() as conn: #an error inside marks the connection broken, see ConnectionPool.connection
+        STAGE_SECONDS.observe(time.perf_counter() - checkout, stage="checkout")
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            with STAGE_SECONDS.time(stage="execute"):
+                cursor.execute(query, params)
+            with STAGE_SECONDS.time(stage="fetchall"):
+                rows = cursor.fetchall()
+        elapsed = time.perf_counter() - start
+    slow_query_log.observe(query, params, elapsed, len(rows)) #after the release, the EXPLAIN needs a connection too
+    return rows
+
+_service_warned = False
+
+
+def prefetched_rows(query: str, params: dict, search: str, value: Any = None,
+                    year_from: int | None = None, year_to: int | None = None) -> Sequence[tuple[Any, ...]] | None:
+    """
+    Rows of a search found without running its query (query, params) in this process:
+    from the search service in the thin client mode (SEARCH_SERVICE is set),
+    otherwise from the columnar catalog (year and genre searches only).
+    None means the template runs here as usual. The search is still logged here, so the service is asked not to.
+
+    In the lazy pagination mode the service sends the total first and then page by page (ServiceResultSet),
+    a page the service fails to send comes from the local database.
+    """
+    global _service_warned
+    if search_client is not None:
+        try:
+            if config.PAGINATION_MODE == "lazy":
+                return search_client.search_pages(search, value, year_from, year_to, log=False,
+                                                  fallback=LazyResultSet(query, params, fetch_rows))
+            return search_client.search(search, value, year_from, year_to, log=False)
+        except (OSError, RuntimeError, ValueError) as e:
+            if not _service_warned:
+                print(Fore.RED + f"The search service at {config.SEARCH_SERVICE} failed ({e}), searching locally.")
+                _service_warned = True
+    return engine.columnar(search, value, year_from, year_to)
 
 #============================================================================================================================#                                                                                                                     #
 #                                 Below is the first part of functions                                                       #
-#                           These functions serve as templates for SQL queries                                               #                                                                                                                 #
+#                  These functions run the search templates of SearchEngine for the menus                                    #                                                                                                                 #
 #============================================================================================================================#
 
-def where_search_title(where: str) -> None:
+def where_search_title(where: str) -> Transition:
     """
         Searches films by title and fills the list with the result
         Then ,  calls the function if_not_results(result)
-    """
-    query = f"""{config.main_table} 
-    
-                SELECT
-                    * 
-                FROM 
-                    main_table 
-                WHERE title = %(where)s OR title LIKE %(like)s;
-            """
 
-    parameters_of_search = {"where": where, "like": f"%{where}%"}
-    executor_sql(query, **parameters_of_search, title=True, search_key="Title", search_value=f"{where} or like %{where}%")
+        The template (title index + hydration, or LIKE) comes from SearchEngine.title_query.
+    """
+    query, parameters_of_search = engine.title_query(where)
+    return executor_sql(query, **parameters_of_search, rows=prefetched_rows(query, parameters_of_search, "title", where), title=True, search_key="Title", search_value=f"{where} or like %{where}%")
 
 
-def where_search_specific_year(year: int) -> None:
+def where_search_specific_year(year: int) -> Transition:
     """
     Searches films by year and fills the list with the result
 
@@ -113,74 +189,52 @@ def where_search_specific_year(year: int) -> None:
 
     :return: None
     """
-    query = f"""{config.main_table} 
-
-                SELECT 
-                    * 
-                FROM 
-                    main_table
-                WHERE 
-                    release_year = %(year)s;
-            """
-    parameters_of_search = {"year": year}
-    executor_sql(query, **parameters_of_search, search_key="Year", search_value=str(year))
-
-
-def where_search_range_year(year_1, year_2) -> None:
-    query = f"""{config.main_table} 
-                
-                SELECT 
-                    * 
-                FROM 
-                    main_table
-                WHERE 
-                    release_year BETWEEN %(year_1)s AND %(year_2)s 
-                ORDER BY release_year ASC;
-            """
-
-    parameters_of_search = {"year_1": year_1, "year_2": year_2}
-    executor_sql(query, **parameters_of_search, search_key="Range of years", search_value=f"between {year_1} and {year_2}")
-
-
-def where_genre_year(genre, year_1=None, year_2=None) -> None:
-    type_of_year = "AND release_year BETWEEN %(year_1)s AND %(year_2)s" if year_1 and year_2 else "AND release_year = %(year_1)s"
-    query = f"""{config.main_table} 
-
-                    SELECT 
-                        * 
-                    FROM 
-                        main_table
-                    WHERE 
-                        genre = %(genre)s
-                        {type_of_year}
-                    ORDER BY release_year ASC;
-                """
-    params_range = {"genre": genre, "year_1": year_1, "year_2": year_2}
-    params_single_year = {"genre": genre, "year_1": year_1}
+    query, parameters_of_search = engine.year_query(year)
+    return executor_sql(query, **parameters_of_search, rows=prefetched_rows(query, parameters_of_search, "year", year),
+                        search_key="Year", search_value=str(year))
 
-    if year_1 and year_2:
-        return executor_sql(query, **params_range, search_key="range of year and genre", search_value=f"between {year_1} and {year_2}, {genre}")
 
-    return executor_sql(query, **params_single_year, search_key="year and genre",search_value=f"{year_1} and {genre}")
+def where_search_range_year(year_1, year_2) -> Transition:
+    query, parameters_of_search = engine.year_range_query(year_1, year_2)
+    return executor_sql(query, **parameters_of_search, rows=prefetched_rows(query, parameters_of_search, "range", None, year_1, year_2), search_key="Range of years", search_value=f"between {year_1} and {year_2}")
+
 
+def where_genre_year(genre, year_1=None, year_2=None) -> Transition:
+    query, parameters_of_search = engine.genre_year_query(genre, year_1, year_2)
+    rows = prefetched_rows(query, parameters_of_search, "genre_year", genre, year_1, year_2)
+
+    if year_1 and year_2:
+        return executor_sql(query, **parameters_of_search, rows=rows, search_key="range of year and genre", search_value=f"between {year_1} and {year_2}, {genre}")
+
+    return executor_sql(query, **parameters_of_search, rows=rows, search_key="year and genre",search_value=f"{year_1} and {genre}")
 
-def where_like_actor(name) -> None:
-    query = f"""{config.table_for_actors} 
 
-                SELECT 
-                    *
-                FROM 
-                    actors_table 
-                WHERE 
-                    Actor LIKE %(like)s;
+def where_like_actor(name) -> Transition:
+    """
+        Searches films by the beginning of an actor's full name.
+        The template (actor prefix index, or the actors_table CTE) comes from SearchEngine.actor_query.
+    """
+    query, parameters_of_search = engine.actor_query(name)
+    return executor_sql(query,  **parameters_of_search, rows=prefetched_rows(query, parameters_of_search, "actor", name), actor=True, search_key="Actor", search_value=f"like %{name}%")
 
-            """
-    parameters_of_search = {"like": f"{name}%"}
-    executor_sql(query,  **parameters_of_search, actor=True, search_key="Actor", search_value=f"like %{name}%")
 
+def where_composite(title: str | None = None,
+                    actor: str | None = None,
+                    genre: str | None = None,
+                    year_1: int | None = None,
+                    year_2: int | None = None) -> Transition:
+    """
+        Searches films matching every given filter at once: title fragment, actor, genre, year or range.
+        One query over the base tables with the filters pushed down, see SearchEngine.composite_query.
+    """
+    query, parameters_of_search = engine.composite_query(title, actor, genre, year_1, year_2)
+    filters = {"title": title, "actor": actor, "genre": genre}
+    search_key, search_value = history_label("composite", filters, year_1, year_2)
+    return executor_sql(query, **parameters_of_search, rows=prefetched_rows(query, parameters_of_search, "composite", filters, year_1, year_2),
+                        search_key=search_key, search_value=search_value)
 
 
-def where_genre() -> None:
+def where_genre() -> Transition:
     """
         Shows all unique genres from the database in a numbered list.
 
@@ -199,23 +253,16 @@ def where_genre() -> None:
 
         elif option in genres:
             choice = genres[option]
-            query = f"""{config.main_table}
-                    SELECT 
-                        * 
-                    FROM
-                        main_table
-                    WHERE 
-                    genre = %(genre)s;
-                    """
-            parameters_of_search = {"genre": choice}
-            return executor_sql(query, **parameters_of_search, search_key="Genre", search_value=choice)
+            query, parameters_of_search = engine.genre_query(choice)
+            return executor_sql(query, **parameters_of_search, rows=prefetched_rows(query, parameters_of_search, "genre", choice),
+                                search_key="Genre", search_value=choice)
 
         elif option == "m":
-            return f.main_menu()
+            return go(f.main_menu)
         elif option == "s":
-            return f.lets_begin()
+            return go(f.lets_begin)
         elif option == "e":
-            return f.exit_program()
+            return go(f.exit_program)
 
 
 def show_all_genres() -> defaultdict[str, str]:
@@ -225,23 +272,16 @@ def show_all_genres() -> defaultdict[str, str]:
         Gives the menu of choice.
         Returns the dict with the genres, so to analyse them then
     """
-    query = f"""{config.main_table} 
-
-                SELECT 
-                    DISTINCT genre
-                FROM 
-                    main_table;
-                """
-    result = executor_sql(query, get_only_result=True, need_to_log=False)
+    result = _from_catalog(catalog_metadata.genres) #cached, no whole-catalog DISTINCT per menu visit
     num = 1
 
     genres = defaultdict(str)
 
     print(Fore.YELLOW + "+" + "-" * 25 + "+")
     for genre in result:
-        text = f"{num:>2}. {genre[0]:<18}"
+        text = f"{num:>2}. {genre:<18}"
         print(Fore.YELLOW + f"| {text} |")
-        genres[str(num)] = genre[0]
+        genres[str(num)] = genre
         num += 1
     print(Fore.YELLOW + "+" + "-" * 25 + "+")
     print(Fore.GREEN + "\nOptions:")
@@ -251,29 +291,24 @@ def show_all_genres() -> defaultdict[str, str]:
     return genres
 
 
+def _from_catalog(getter: Callable) -> Any:
+    """
+    Reads a value from the catalog metadata cache.
+    On a DB error it behaves like executor_sql: prints the error and goes back to the main menu
+    (from wherever it was called, see Navigator.Navigate).
+    """
+    try:
+        return getter()
+    except Exception as e:
+        print(Fore.RED + str(e), end='\n\n')
+        raise Navigate(go(f.main_menu))
+
+
 def min_year() -> int: #in the whole DB
-    query = f"""{config.main_table} 
-                    SELECT 
-                        release_year
-                    FROM 
-                        main_table
-                    ORDER BY release_year ASC
-                    LIMIT 1;
-                """
-    min_year = executor_sql(query, need_to_log=False, get_only_result=True)
-    return min_year[0][0]
+    return _from_catalog(catalog_metadata.min_year)
 
 def max_year() -> int: #in the whole DB
-    query = f"""{config.main_table} 
-                        SELECT 
-                            release_year
-                        FROM 
-                            main_table
-                        ORDER BY release_year DESC
-                        LIMIT 1;
-                    """
-    max_year = executor_sql(query, need_to_log=False, get_only_result=True)
-    return max_year[0][0]
+    return _from_catalog(catalog_metadata.max_year)
 
 #============================================================================================================================#
 #                                  Below is the second part of functions                                                     #
@@ -283,7 +318,8 @@ def max_year() -> int: #in the whole DB
 
 def paginate_list(results: tuple[tuple[Any, ...], ...],
                   render_fn: Callable,
-                  actor=False) -> None:
+                  actor=False,
+                  source: tuple[str, dict] | None = None) -> Transition:
     """
        Displays results in pages and handles navigation.
 
@@ -291,9 +327,10 @@ def paginate_list(results: tuple[tuple[Any, ...], ...],
        Allows moving to next, previous page, or quitting.
 
        Args:
-           results (list): list of items to display
+           results (list | LazyResultSet): items to display, a LazyResultSet fetches only the shown pages
            render_fn (Callable): function to render each page
            actor (bool): passed to render_fn to control actor display
+           source (tuple): (query, params) of the results - enables "Export all results"
     """
     total_rows = len(results)
 
@@ -351,49 +388,92 @@ def paginate_list(results: tuple[tuple[Any, ...], ...],
         elif cmd == "q":
             break
 
+    if isinstance(results, LazyResultSet):
+        results.close() #drop the kept pages, the user doesn't page anymore
+
     # Navigation
     f.print_slowly("\n1. I want to find another film?", Fore.LIGHTCYAN_EX, delay=0.015)
     f.print_slowly("2. BACK TO MENU", Fore.LIGHTCYAN_EX, delay=0.015)
     f.print_slowly("3. EXIT", Fore.LIGHTCYAN_EX, delay=0.015)
+    if source is not None:
+        f.print_slowly("4. Export all results (CSV / JSONL / Parquet)", Fore.LIGHTCYAN_EX, delay=0.015)
     while True:
         option = input(Fore.LIGHTGREEN_EX + "Enter your choice: ")
 
-        if option not in("1", "2", "3"):
+        if option not in ("1", "2", "3", "4") or (option == "4" and source is None):
             print(Fore.LIGHTRED_EX + f"Invalid choice: {option} or no option selected (x_x)")
             continue
 
+        if option == "4":
+            export_results(*source, results)
+            continue
+
         if option == "1":
-            return f.lets_begin()
+            return go(f.lets_begin)
         elif option == "2":
-            return f.main_menu()
+            return go(f.main_menu)
         elif option == "3":
-            return f.exit_program()
+            return go(f.exit_program)
+
+
 
+def export_results(query: str, params: dict, results: Sequence | LazyResultSet) -> None:
+    """
+    Asks for the format and the file and writes all rows of the search into it (Exporter),
+    from the same source the shown pages came from:
+    - the rows themselves when they are all in memory (columnar catalog, small results),
+    - the search service page by page for its results,
+    - otherwise the query streamed from MySQL or the local replica (READ_FROM_REPLICA).
+    """
+    from Exporter import FILM_COLUMNS, FORMATS, default_path, export, write_rows
 
+    while True:
+        file_format = input(Fore.GREEN + f"Format ({' / '.join(FORMATS)}): ").strip().lower()
+        if file_format in FORMATS:
+            break
+        print(Fore.LIGHTRED_EX + f"Invalid format: {file_format} (x_x)")
 
-def render_films(films: list, actor=False):# param actor=True means that I search film by actors. Then I have only 1 actor to each film
+    suggested = default_path(file_format)
+    path = input(Fore.GREEN + f"File (Enter for {suggested}): ").strip() or suggested
+    try:
+        if isinstance(results, ServiceResultSet):
+            count = write_rows(FILM_COLUMNS, results.rows(), path, file_format)
+        elif isinstance(results, LazyResultSet):
+            count = export(query, params, path, file_format, read_pool)
+        else:
+            count = write_rows(FILM_COLUMNS, iter(results), path, file_format)
+    except Exception as e:
+        print(Fore.RED + f"Export failed: {e}", end='\n\n')
+        return
+    print(Fore.GREEN + f"{count} rows exported to {path}", end='\n\n')
+
+
+@STAGE_SECONDS.time(stage="render_films")
+def render_films(films: list, actor=False):# param actor=True means that I search film by actors. Then only the matched actors of each film are listed
     """
     Print film info: title, year, genre, and actors (if any).
-    'actor' flag changes label to singular.
+    'actor' flag: the actors are the matched ones of an actor search, the label follows their number.
 
     Args:
         films (list): list of film data tuples
-        actor (bool): use "Actor:" if True, else "Actors:"
+        actor (bool): "Actor:" for one matched actor, "Actors:" for more (always "Actors:" if False)
     """
-    for row in films:
-        print(Fore.CYAN + "Title ---> ", end='')
-        f.print_slowly(row[0], Fore.CYAN, delay=0.01)
-
-        print(Fore.LIGHTMAGENTA_EX + "Year  ---> ", end='')
-        f.print_slowly(str(row[1]), Fore.LIGHTMAGENTA_EX, delay=0.01)
-
-        print(Fore.LIGHTBLUE_EX + "Genre ---> ", end='')
-        f.print_slowly(row[2], Fore.LIGHTBLUE_EX, delay=0.01)
-
-        if len(row) > 3 and row[3]:
-            print()
-            print("Actor:" if actor else "Actors:") # param actor=True means that I search film by actors. Then I have only 1 actor to each film
-            for actor_ in row[3].split(','):
-                print("\t➤ ", end='')
-                f.print_slowly(actor_, Fore.LIGHTCYAN_EX, delay=0.003)
-        print(Fore.WHITE + "-" * 30)
+    with renderer.page(): #instant/plain modes write the whole page with one call
+        for row in films:
+            f.print_slowly("Title ---> ", Fore.CYAN, delay=0, end='')
+            f.print_slowly(row[0], Fore.CYAN, delay=0.01)
+
+            f.print_slowly("Year  ---> ", Fore.LIGHTMAGENTA_EX, delay=0, end='')
+            f.print_slowly(str(row[1]), Fore.LIGHTMAGENTA_EX, delay=0.01)
+
+            f.print_slowly("Genre ---> ", Fore.LIGHTBLUE_EX, delay=0, end='')
+            f.print_slowly(row[2], Fore.LIGHTBLUE_EX, delay=0.01)
+
+            if len(row) > 3 and row[3]:
+                f.print_slowly("", "", delay=0)
+                actors = row[3].split(',')
+                f.print_slowly("Actor:" if actor and len(actors) == 1 else "Actors:", "", delay=0)
+                for actor_ in actors:
+                    f.print_slowly("\t➤ ", "", delay=0, end='')
+                    f.print_slowly(actor_, Fore.LIGHTCYAN_EX, delay=0.003)
+            f.print_slowly("-" * 30, Fore.WHITE, delay=0)
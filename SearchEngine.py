@@ -0,0 +1,373 @@
+#============================================================================================================================#
+#                      SearchEngine is the headless core of the film searches: no input(), no printing                      #
+#          The query templates live here, SQL_functions uses them for the menus, batch.py and other scripts call            #
+#                                  the search_* methods and get typed results back                                          #
+#============================================================================================================================#
+from typing import Any, NamedTuple
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+from CatalogMetadata import CatalogMetadata, catalog_metadata
+from TitleIndex import TitleIndex, title_index
+from ActorIndex import ActorIndex, actor_index
+from ColumnarCatalog import ColumnarCatalog, ColumnarResult, columnar_catalog
+
+
+class Film(NamedTuple):
+    title: str
+    release_year: int
+    genre: str | None
+    actors: tuple[str, ...]
+
+    @classmethod
+    def from_row(cls, row: tuple[Any, ...]) -> "Film":
+        """(title, release_year, genre, actors as "A, B, C") -> Film"""
+        actors = tuple(actor.strip() for actor in row[3].split(",")) if row[3] else ()
+        return cls(row[0], row[1], row[2], actors)
+
+
+class SearchEngine:
+    """
+    Builds and runs the film searches.
+
+    - *_query() methods return (query, params) - the same templates the interactive menus execute.
+    - search_*() methods run them on the pool and return a list of Film.
+    - columnar() answers the year and genre searches from the in-memory ColumnarCatalog, without a query.
+
+    Every dependency can be passed in, so the same engine runs against another database (e.g. the benchmarks).
+    In the thin client mode (SEARCH_SERVICE is set) the in-memory indexes are left to the service:
+    the templates fall back to LIKE / the CTE, they are only logged there.
+    """
+
+    def __init__(self,
+                 pool: ConnectionPool = read_pool,
+                 titles: TitleIndex = title_index,
+                 actors: ActorIndex = actor_index,
+                 metadata: CatalogMetadata = catalog_metadata,
+                 columns: ColumnarCatalog = columnar_catalog,
+                 table: str = config.FILM_SUMMARY_TABLE,
+                 indexes: bool = not config.SEARCH_SERVICE,
+                 columnar: bool = config.COLUMNAR_CATALOG == "1") -> None:
+        self.pool = pool
+        self.titles = titles
+        self.actors = actors
+        self.metadata = metadata
+        self.columns = columns
+        self.table = table
+        self.indexes = indexes
+        self.use_columnar = columnar # off in the interactive CLI by default, see COLUMNAR_CATALOG
+
+    def use_source(self, source: str) -> None:
+        """
+        Points every template, and the indexes and caches built from the summary, at `source`:
+        the summary table or FilmSummary.fallback_source() (the unqualified columns work with both).
+        """
+        self.table = self.titles.table = self.metadata.table = self.columns.table = source
+
+    #===================QUERY TEMPLATES========================================
+    def _ids_from_title_index(self, where: str) -> list[int] | None:
+        """
+        Film ids matching the title fragment, or None when the index can't be used
+        (switched off, failed to build, or the match is broader than TITLE_INDEX_MAX_IDS).
+        """
+        if not (config.TITLE_INDEX and self.indexes):
+            return None
+        try:
+            film_ids = sorted(set(self.titles.exact(where)) | set(self.titles.search(where)))
+        except Exception:
+            return None
+        if len(film_ids) > config.TITLE_INDEX_MAX_IDS:
+            return None
+        return film_ids
+
+    def title_query(self, where: str) -> tuple[str, dict]:
+        """
+        Films whose title is `where` or contains it.
+
+        The matching film ids come from the in-memory title index (TitleIndex),
+        MySQL only hydrates them. Without the index (or for very broad fragments) LIKE is used.
+        """
+        film_ids = self._ids_from_title_index(where)
+        if film_ids is not None:
+            query = f"""
+                SELECT
+                    title, release_year, genre, actors
+                FROM
+                    {self.table}
+                WHERE film_id IN %(ids)s
+                ORDER BY title, film_id;
+            """
+            return query, {"ids": tuple(film_ids) or (None,)} # IN (NULL) matches nothing
+
+        query = f"""
+                SELECT
+                    title, release_year, genre, actors
+                FROM
+                    {self.table}
+                WHERE title = %(where)s OR title LIKE %(like)s
+                ORDER BY title, film_id;
+            """
+        return query, {"where": where, "like": f"%{where}%"}
+
+    def year_query(self, year: int) -> tuple[str, dict]:
+        query = f"""
+                SELECT
+                    title, release_year, genre, actors
+                FROM
+                    {self.table}
+                WHERE
+                    release_year = %(year)s
+                ORDER BY title, film_id;
+            """
+        return query, {"year": year}
+
+    def year_range_query(self, year_1: int, year_2: int) -> tuple[str, dict]:
+        query = f"""
+                SELECT
+                    title, release_year, genre, actors
+                FROM
+                    {self.table}
+                WHERE
+                    release_year BETWEEN %(year_1)s AND %(year_2)s
+                ORDER BY release_year ASC, title, film_id;
+            """
+        return query, {"year_1": year_1, "year_2": year_2}
+
+    def genre_query(self, genre: str) -> tuple[str, dict]:
+        query = f"""
+                    SELECT
+                        title, release_year, genre, actors
+                    FROM
+                        {self.table}
+                    WHERE
+                    genre = %(genre)s
+                    ORDER BY title, film_id;
+                    """
+        return query, {"genre": genre}
+
+    def genre_year_query(self, genre: str, year_1: int, year_2: int | None = None) -> tuple[str, dict]:
+        """A genre in one year (year_2 is None) or in a range of years."""
+        type_of_year = "AND release_year BETWEEN %(year_1)s AND %(year_2)s" if year_1 and year_2 else "AND release_year = %(year_1)s"
+        query = f"""
+                    SELECT
+                        title, release_year, genre, actors
+                    FROM
+                        {self.table}
+                    WHERE
+                        genre = %(genre)s
+                        {type_of_year}
+                    ORDER BY release_year ASC, title, film_id;
+                """
+        if year_1 and year_2:
+            return query, {"genre": genre, "year_1": year_1, "year_2": year_2}
+        return query, {"genre": genre, "year_1": year_1}
+
+    def _ids_from_actor_index(self, name: str) -> tuple[list[int], list[int]] | None:
+        """(actor ids, film ids) for the name prefix, or None when the index is switched off or can't be loaded."""
+        if not (config.ACTOR_INDEX and self.indexes):
+            return None
+        try:
+            return self.actors.films_for_prefix(name)
+        except Exception:
+            return None
+
+    def actor_query(self, name: str) -> tuple[str, dict]:
+        """
+        Films of the actors whose full name starts with `name`: one row per film,
+        the matching actors of the film aggregated into the last column ("A, B").
+
+        The sorted actor index (ActorIndex) resolves the prefix to actor ids and their film ids,
+        so only the matching films are read. Without the index the actors_table CTE is used.
+        Either way MySQL groups the rows, so a film shared by several matching actors is sent once.
+        The ORDER BY covers the whole group key, so the pages of a lazy result never swap two rows with the same title.
+        """
+        matches = self._ids_from_actor_index(name)
+        if matches is not None:
+            actor_ids, film_ids = matches
+            query = f"""
+                SELECT
+                    title, release_year, genre,
+                    GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name) ORDER BY a.first_name, a.last_name SEPARATOR ', ') AS Actors
+                FROM
+                    {self.table}
+                JOIN film_actor fa USING(film_id)
+                JOIN actor a USING(actor_id)
+                WHERE
+                    film_id IN %(film_ids)s AND fa.actor_id IN %(actor_ids)s
+                GROUP BY film_id, category_id, title, release_year, genre
+                ORDER BY title, film_id, category_id;
+            """
+            return query, {"film_ids": tuple(film_ids) or (None,), "actor_ids": tuple(actor_ids) or (None,)}
+
+        query = f"""{config.table_for_actors}
+
+                SELECT
+                    title, release_year, genre, GROUP_CONCAT(Actor ORDER BY Actor SEPARATOR ', ') AS Actors
+                FROM
+                    actors_table
+                WHERE
+                    Actor LIKE %(like)s
+                GROUP BY title, release_year, genre
+                ORDER BY title, release_year, genre;
+
+            """
+        return query, {"like": f"{name}%"}
+
+    def composite_query(self,
+                        title: str | None = None,
+                        actor: str | None = None,
+                        genre: str | None = None,
+                        year_1: int | None = None,
+                        year_2: int | None = None) -> tuple[str, dict]:
+        """
+        Films matching every given filter: a title fragment, the beginning of an actor's name, a genre,
+        a year (year_1) or a range of years (year_1 and year_2). The filters which are None are left out.
+
+        The predicates go straight onto film and category, the actor filter is an EXISTS on film_actor/actor,
+        so MySQL drops the other films before GROUP_CONCAT and only aggregates the matching ones.
+        The actors column has every actor of the film, like the film summary.
+        The title and actor indexes give the film ids when they can, LIKE is used otherwise.
+        """
+        where, params = [], {}
+        if title:
+            film_ids = self._ids_from_title_index(title)
+            if film_ids is not None:
+                where.append("f.film_id IN %(title_ids)s")
+                params["title_ids"] = tuple(film_ids) or (None,)
+            else:
+                where.append("(f.title = %(title_eq)s OR f.title LIKE %(title_like)s)")
+                params.update(title_eq=title, title_like=f"%{title}%")
+        if actor:
+            matches = self._ids_from_actor_index(actor)
+            if matches is not None:
+                where.append("f.film_id IN %(actor_film_ids)s")
+                params["actor_film_ids"] = tuple(matches[1]) or (None,)
+            else:
+                where.append("""EXISTS (
+                        SELECT 1
+                        FROM film_actor fa2
+                        JOIN actor a2 ON a2.actor_id = fa2.actor_id
+                        WHERE fa2.film_id = f.film_id AND CONCAT(a2.first_name, ' ', a2.last_name) LIKE %(actor_like)s
+                    )""")
+                params["actor_like"] = f"{actor}%"
+        if genre:
+            where.append("c.name = %(genre)s")
+            params["genre"] = genre
+        if year_1 and year_2:
+            where.append("f.release_year BETWEEN %(year_1)s AND %(year_2)s")
+            params.update(year_1=year_1, year_2=year_2)
+        elif year_1:
+            where.append("f.release_year = %(year_1)s")
+            params["year_1"] = year_1
+
+        where_clause = "WHERE " + "\n                    AND ".join(where) if where else ""
+        query = f"""
+                SELECT
+                    f.title, f.release_year, c.name AS genre,
+                    GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name) ORDER BY a.first_name, a.last_name SEPARATOR ', ') AS actors
+                FROM film f
+                JOIN film_actor fa ON fa.film_id = f.film_id
+                JOIN actor a ON a.actor_id = fa.actor_id
+                LEFT JOIN film_category fc ON fc.film_id = f.film_id
+                LEFT JOIN category c ON c.category_id = fc.category_id
+                {where_clause}
+                GROUP BY f.film_id, c.category_id, f.title, f.release_year, c.name
+                ORDER BY {"f.release_year ASC, " if year_1 and year_2 else ""}f.title, f.film_id, c.category_id;
+            """
+        return query, params
+
+    def catalog_query(self) -> tuple[str, dict]:
+        """The whole catalog, for the exports."""
+        query = f"""
+                SELECT
+                    title, release_year, genre, actors
+                FROM
+                    {self.table}
+                ORDER BY title, film_id;
+            """
+        return query, {}
+
+    def spec_query(self, search: str, value: Any = None,
+                   year_from: int | None = None, year_to: int | None = None) -> tuple[str, dict]:
+        """
+        (query, params) of a search described by its name - the specs of batch.py and Exporter.py:
+        title, year, range, genre, genre_year, actor, composite or all.
+        The value of composite holds its filters ({"title": ..., "actor": ..., "genre": ...} or the same as pairs),
+        year_from and year_to are its year or range.
+        """
+        if search == "title":
+            return self.title_query(str(value))
+        if search == "year":
+            return self.year_query(int(value))
+        if search == "range":
+            return self.year_range_query(year_from, year_to)
+        if search == "genre":
+            return self.genre_query(str(value))
+        if search == "genre_year":
+            return self.genre_year_query(str(value), year_from, year_to)
+        if search == "actor":
+            return self.actor_query(str(value))
+        if search == "composite":
+            filters = dict(value or {})
+            return self.composite_query(filters.get("title"), filters.get("actor"), filters.get("genre"), year_from, year_to)
+        if search == "all":
+            return self.catalog_query()
+        raise ValueError(f"Unknown search '{search}'")
+
+    #===================SEARCHES========================================
+    def columnar(self, search: str, value: Any = None,
+                 year_from: int | None = None, year_to: int | None = None) -> ColumnarResult | None:
+        """
+        The rows of a year, range, genre or genre_year search (the same order as its template) from the columnar catalog,
+        or None when the catalog is switched off or can't be used - run the template then.
+        """
+        if not (self.use_columnar and self.indexes):
+            return None
+        try:
+            return self.columns.search(search, value, year_from, year_to)
+        except Exception:
+            return None
+
+    def run(self, query: str, params: dict) -> list[Film]:
+        """Runs a (query, params) pair from the templates above and converts the rows."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return [Film.from_row(row) for row in cursor.fetchall()]
+
+    def search_title(self, where: str) -> list[Film]:
+        return self.run(*self.title_query(where))
+
+    def _columnar_or_run(self, rows: ColumnarResult | None, query: str, params: dict) -> list[Film]:
+        if rows is not None:
+            return [Film.from_row(row) for row in rows]
+        return self.run(query, params)
+
+    def search_year(self, year: int) -> list[Film]:
+        return self._columnar_or_run(self.columnar("year", year), *self.year_query(year))
+
+    def search_year_range(self, year_1: int, year_2: int) -> list[Film]:
+        return self._columnar_or_run(self.columnar("range", None, year_1, year_2), *self.year_range_query(year_1, year_2))
+
+    def search_genre(self, genre: str) -> list[Film]:
+        return self._columnar_or_run(self.columnar("genre", genre), *self.genre_query(genre))
+
+    def search_genre_year(self, genre: str, year_1: int, year_2: int | None = None) -> list[Film]:
+        return self._columnar_or_run(self.columnar("genre_year", genre, year_1, year_2),
+                                     *self.genre_year_query(genre, year_1, year_2))
+
+    def search_actor(self, name: str) -> list[Film]:
+        return self.run(*self.actor_query(name))
+
+    def search_composite(self, title: str | None = None, actor: str | None = None, genre: str | None = None,
+                         year_1: int | None = None, year_2: int | None = None) -> list[Film]:
+        return self.run(*self.composite_query(title, actor, genre, year_1, year_2))
+
+    def genres(self) -> list[str]:
+        return self.metadata.genres()
+
+    def year_bounds(self) -> tuple[int, int]:
+        return self.metadata.min_year(), self.metadata.max_year()
+
+
+engine = SearchEngine()
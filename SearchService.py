@@ -0,0 +1,380 @@
+#============================================================================================================================#
+#                SearchService serves the film searches and the search history to many local clients at once                 #
+#                                                                                                                            #
+#   python SearchService.py                                   - listens on SERVICE_ADDRESS (127.0.0.1:8765 by default)       #
+#   python SearchService.py --address unix:/tmp/sakila.sock   - a Unix socket instead of loopback TCP                        #
+#   SEARCH_SERVICE=127.0.0.1:8765 python main.py              - the CLI as a thin client: its searches go to the service     #
+#                                                                                                                            #
+#   All clients share one connection pool, one result cache, the indexes and the columnar catalog of this process.           #
+#   Identical searches which arrive while the first one is still running wait for its result instead of running again.       #
+#                                                                                                                            #
+#   Protocol: JSON lines, one request per line, one response per line with the same "id" (answers may come out of order):    #
+#       {"id": 1, "op": "search", "search": "genre_year", "value": "Drama", "year_from": 2005, "year_to": 2007}              #
+#       -> {"id": 1, "ok": true, "total": 12, "rows": [[title, release_year, genre, actors], ...], "coalesced": false}       #
+#       {"id": 2, "op": "history", "limit": 5}  -> {"id": 2, "ok": true, "top": [{"key": ..., "value": ..., "count": ...}]}  #
+#       {"id": 3, "op": "stats"}, {"id": 4, "op": "ping"}                                                                    #
+#   Searches take "offset"/"limit" for one page ("limit": 0 - only the total) and "log": false when the client logs itself.  #
+#   The composite search has its filters in "value", year_from alone is one year:                                            #
+#       {"id": 5, "op": "search", "search": "composite", "value": {"title": "ACE", "genre": "Drama"}, "year_from": 2006}     #
+#   Errors: {"id": 1, "ok": false, "error": "..."}                                                                           #
+#============================================================================================================================#
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from Metrics import STAGE_SECONDS, metrics
+from LazyResults import LazyResultSet
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+SEARCHES = ("title", "year", "range", "genre", "genre_year", "actor", "composite")
+COMPOSITE_FILTERS = ("title", "actor", "genre")
+
+SERVICE_REQUESTS = metrics.counter("service_requests_total", "Requests answered by the search service, by operation and status.")
+COALESCED = metrics.counter("service_coalesced_total", "Searches which waited for an identical search already running.")
+
+
+def parse_address(address: str) -> tuple[str, Any]:
+    """"unix:/path" -> ("unix", "/path"), "host:port" -> ("tcp", (host, port))"""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def history_label(search: str, value: Any, year_from: int | None, year_to: int | None) -> tuple[str, str]:
+    """(key of search, value of search) like the menus write them into the history."""
+    if search == "title":
+        return "Title", f"{value} or like %{value}%"
+    if search == "year":
+        return "Year", str(value)
+    if search == "range":
+        return "Range of years", f"between {year_from} and {year_to}"
+    if search == "genre":
+        return "Genre", str(value)
+    if search == "genre_year":
+        if year_from and year_to:
+            return "range of year and genre", f"between {year_from} and {year_to}, {value}"
+        return "year and genre", f"{year_from} and {value}"
+    if search == "composite":
+        filters = dict(value or {})
+        labels = [f"title like %{filters['title']}%" if filters.get("title") else "",
+                  f"actor like {filters['actor']}%" if filters.get("actor") else "", filters.get("genre") or "",
+                  (f"between {year_from} and {year_to}" if year_to else str(year_from)) if year_from else ""]
+        return "several filters", ", ".join(label for label in labels if label)
+    return "Actor", f"like %{value}%"
+
+
+class SearchService:
+    """
+    The asyncio side only reads requests and writes answers. The searches themselves block (pymysql, NumPy)
+    and run in a thread pool of SERVICE_WORKERS threads, the same code paths as the menus:
+    columnar catalog -> result cache -> pooled MySQL connection (or the local replica).
+
+    Request coalescing: a running search is kept in `_in_flight` under its spec and page,
+    an identical request awaits the same future instead of starting another query.
+    """
+
+    def __init__(self, workers: int = config.SERVICE_WORKERS) -> None:
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search-service")
+        self._in_flight = {} # (search, value, year_from, year_to, offset, limit) -> asyncio.Future
+        self.clients = 0
+
+    #===================SEARCHES========================================
+    @staticmethod
+    def _spec(request: dict) -> tuple[str, Any, int | None, int | None]:
+        search = request.get("search")
+        if search not in SEARCHES:
+            raise ValueError(f"Unknown search '{search}', use one of {', '.join(SEARCHES)}")
+        year_from = int(request["year_from"]) if request.get("year_from") not in (None, "") else None
+        year_to = int(request["year_to"]) if request.get("year_to") not in (None, "") else None
+        value = request.get("value")
+        if search == "year":
+            value = int(value)
+        elif search == "composite":
+            #the filters as sorted pairs: hashable for _in_flight, the same key whatever order the client sent them in
+            filters = value if isinstance(value, dict) else {}
+            value = tuple(sorted((name, str(filters[name])) for name in COMPOSITE_FILTERS if filters.get(name)))
+        elif value is not None:
+            value = str(value)
+        return search, value, year_from, year_to
+
+    @staticmethod
+    def _run_search(search: str, value: Any, year_from: int | None, year_to: int | None,
+                    offset: int = 0, limit: int | None = None) -> tuple[str, dict, int, list[list[Any]]]:
+        """
+        (query, params, total, rows of the page). Only the page is read: the columnar catalog is sliced,
+        a MySQL search with a limit runs a COUNT(*) and LIMIT/OFFSET like LazyResultSet does (both go through
+        the result cache), so paging a broad search doesn't run the whole query again for every page.
+        """
+        from SearchEngine import engine
+        from SQL_functions import fetch_rows
+
+        stop = offset + limit if limit is not None else None
+        with STAGE_SECONDS.time(stage="service_search"):
+            query, params = engine.spec_query(search, value, year_from, year_to)
+            rows = engine.columnar(search, value, year_from, year_to)
+            if rows is None and limit is not None:
+                rows = LazyResultSet(query, params, fetch_rows, prefetch=0) #the client prefetches the next pages itself
+                total = len(rows)
+                page = rows[offset:stop] if limit else ()
+            else:
+                if rows is None:
+                    rows = fetch_rows(query, params)
+                total = len(rows)
+                page = rows[offset:stop]
+            return query, params, total, [list(row) for row in page]
+
+    async def search(self, request: dict) -> dict:
+        spec = self._spec(request)
+        offset = int(request.get("offset") or 0)
+        limit = int(request["limit"]) if request.get("limit") is not None else None
+        key = (*spec, offset, limit) #the same page of the same search
+        loop = asyncio.get_running_loop()
+        future = self._in_flight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            COALESCED.inc()
+        else:
+            future = loop.run_in_executor(self._executor, self._run_search, *spec, offset, limit)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._in_flight.pop(key, None))
+        query, params, total, rows = await asyncio.shield(future) #a client which hangs up doesn't cancel it for the others
+
+        if request.get("log", True):
+            from QueryLogger import myLogger
+            #in a worker thread: log_query() may block on a full queue
+            await loop.run_in_executor(self._executor, myLogger.log_query, query, params,
+                                       "Success" if total else "Failure", *history_label(*spec))
+        return {"total": total, "rows": rows, "coalesced": coalesced}
+
+    async def history(self, request: dict) -> dict:
+        from QueryLogger import myLogger
+        if myLogger.collection is None:
+            raise RuntimeError("There is no search history, MongoDB is not connected")
+        limit = int(request.get("limit") or 5)
+        top = await asyncio.get_running_loop().run_in_executor(self._executor, myLogger.top_queries_data, limit)
+        return {"top": top}
+
+    async def stats(self, request: dict) -> dict:
+        from ResultCache import result_cache
+        from ColumnarCatalog import columnar_catalog
+        return {"clients": self.clients, "in_flight": len(self._in_flight),
+                "result_cache": result_cache.stats(), "columnar_catalog": columnar_catalog.stats()}
+
+    async def ping(self, request: dict) -> dict:
+        return {}
+
+    #===================PROTOCOL========================================
+    async def answer(self, line: bytes) -> dict:
+        request_id = None
+        op = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = request.get("op")
+            handler = {"search": self.search, "history": self.history, "stats": self.stats, "ping": self.ping}.get(op)
+            if handler is None:
+                raise ValueError(f"Unknown op '{op}'")
+            response = {"id": request_id, "ok": True, **await handler(request)}
+        except Exception as e:
+            SERVICE_REQUESTS.inc(op=str(op), status="error")
+            return {"id": request_id, "ok": False, "error": str(e)}
+        SERVICE_REQUESTS.inc(op=op, status="ok")
+        return response
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Every request of the connection is answered in its own task, so one slow search doesn't hold up the next ones."""
+        self.clients += 1
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line: bytes) -> None:
+            response = await self.answer(line)
+            data = (json.dumps(response, default=str, ensure_ascii=False) + "\n").encode("utf-8")
+            async with write_lock:
+                writer.write(data)
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(respond(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError): #ValueError: a line over the reader's limit
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def serve(self, address: str = config.SERVICE_ADDRESS) -> None:
+        import functions #first, like main.py does: functions and QueryLogger import each other
+        from QueryLogger import setup_query_log
+        from FilmSummary import setup_film_summary
+        from SearchEngine import engine
+        engine.use_columnar = config.COLUMNAR_CATALOG != "0" #one snapshot for every client
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, setup_query_log) #MongoDB for the history, before the first client
+        await loop.run_in_executor(self._executor, setup_film_summary) #built if it is missing
+
+        kind, where = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(where):
+                os.unlink(where) #left over from a previous run
+            server = await asyncio.start_unix_server(self.handle_client, path=where)
+        else:
+            server = await asyncio.start_server(self.handle_client, host=where[0], port=where[1])
+        print(Fore.GREEN + f"The search service is listening on {address} ({self.workers} workers)")
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        from ConnectionPool import read_pool
+        from QueryLogger import myLogger
+        from SlowQueryLog import slow_query_log
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        slow_query_log.flush()
+        myLogger.stop_log_writer()
+        read_pool.close_all()
+
+
+class SearchClient:
+    """
+    Blocking client of the service, one connection reused for every request (thread-safe, one request at a time).
+    A broken connection is opened again on the next request.
+    """
+
+    def __init__(self, address: str = config.SEARCH_SERVICE, timeout: float = config.SERVICE_TIMEOUT) -> None:
+        self.address = address
+        self.timeout = timeout
+        self._socket = None
+        self._file = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        kind, where = parse_address(self.address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(where)
+        else:
+            sock = socket.create_connection(where, timeout=self.timeout)
+        self._socket = sock
+        self._file = sock.makefile("rwb")
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+    def request(self, op: str, **fields) -> dict:
+        """
+        Sends one request and returns its answer. OSError when the service can't be reached,
+        ValueError for an answer which isn't JSON (the connection is dropped, it is out of step), RuntimeError for its errors.
+        """
+        with self._lock:
+            self._next_id += 1
+            payload = json.dumps({"id": self._next_id, "op": op, **fields}, default=str).encode("utf-8") + b"\n"
+            try:
+                if self._socket is None:
+                    self._connect()
+                self._file.write(payload)
+                self._file.flush()
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("The search service closed the connection")
+                response = json.loads(line)
+            except (OSError, ValueError):
+                self.close()
+                raise
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error"))
+        return response
+
+    def search(self, search: str, value: Any = None, year_from: int | None = None, year_to: int | None = None,
+               log: bool = True) -> tuple[tuple[Any, ...], ...]:
+        """The rows of the search, the same as the menus get them from fetch_rows()."""
+        response = self.request("search", search=search, value=value, year_from=year_from, year_to=year_to, log=log)
+        return tuple(tuple(row) for row in response["rows"])
+
+    def search_pages(self, search: str, value: Any = None, year_from: int | None = None, year_to: int | None = None,
+                     log: bool = True, fallback: LazyResultSet | None = None) -> "ServiceResultSet":
+        """
+        The rows of the search as a ServiceResultSet: only the total now, the pages when they are shown.
+        The total is asked for right away, so an unreachable service is noticed here and not while paging.
+        """
+        results = ServiceResultSet(self, {"search": search, "value": value, "year_from": year_from,
+                                          "year_to": year_to, "log": log}, fallback)
+        len(results)
+        return results
+
+    def history(self, limit: int) -> list[dict]:
+        return self.request("history", limit=limit)["top"]
+
+
+class ServiceResultSet(LazyResultSet):
+    """
+    A LazyResultSet whose pages come from the search service (offset/limit) instead of LIMIT/OFFSET queries,
+    so a broad search sends one page over the socket at a time. Prefetching and the kept pages work the same.
+
+    If the service fails while paging, the page is read from the local database through `fallback`
+    (the LazyResultSet of the same template), so the user can go on paging.
+    """
+
+    def __init__(self, client: SearchClient, spec: dict, fallback: LazyResultSet | None = None,
+                 prefetch: int = config.PAGE_PREFETCH) -> None:
+        super().__init__("", {}, fetch=None, prefetch=prefetch)
+        self.client = client
+        self.spec = spec
+        self.fallback = fallback
+
+    def __len__(self) -> int:
+        if self._count is None:
+            self._count = self.client.request("search", **self.spec, offset=0, limit=0)["total"]
+        return self._count
+
+    def _fetch_page(self, start: int, stop: int) -> tuple[tuple[Any, ...], ...]:
+        try:
+            response = self.client.request("search", **{**self.spec, "log": False}, offset=start, limit=stop - start)
+        except (OSError, RuntimeError, ValueError):
+            if self.fallback is None:
+                raise
+            return self.fallback._fetch_page(start, stop)
+        return tuple(tuple(row) for row in response["rows"])
+
+
+search_client = SearchClient() if config.SEARCH_SERVICE else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the film searches and the search history to local clients.")
+    parser.add_argument("--address", default=config.SERVICE_ADDRESS, help="host:port or unix:/path/to/socket")
+    parser.add_argument("--workers", type=int, default=config.SERVICE_WORKERS, help="searches running at the same time")
+    args = parser.parse_args()
+
+    service = SearchService(args.workers)
+    try:
+        asyncio.run(service.serve(args.address))
+    except KeyboardInterrupt:
+        print(Fore.CYAN + "The search service is stopped.", file=sys.stderr)
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#============================================================================================================================#
+#                 SlowQueryLog keeps the searches which took MySQL longer than SLOW_QUERY_SECONDS, with their plans          #
+#                                                                                                                            #
+#   Every query of executor_sql (pages and COUNT(*) of the lazy results too) is timed around execute() + fetchall().         #
+#   Over the threshold, a background thread captures the fingerprint of the template, the params, the time,                  #
+#   the rows and the EXPLAIN FORMAT=JSON plan, and MyLogger stores them in the slow query collection of MongoDB.             #
+#                                                                                                                            #
+#   python SlowQueryLog.py report                 - the worst templates by p95                                               #
+#   python SlowQueryLog.py report --by rows       - the worst templates by the rows examined (EXPLAIN estimate)              #
+#============================================================================================================================#
+import argparse
+import hashlib
+import json
+import re
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+from Metrics import metrics
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+SLOW_QUERIES = metrics.counter("slow_queries_total", "Queries over SLOW_QUERY_SECONDS, captured for the slow query log.")
+
+MAX_PARAM_ITEMS = 20 # the IN lists of the indexes may hold thousands of ids, only the beginning is kept
+
+
+def fingerprint(query: str) -> tuple[str, str]:
+    """
+    (fingerprint, normalized template). The templates keep their values in params (%(name)s),
+    so the template with collapsed whitespace identifies the search - and its hash is short enough for an index.
+    """
+    template = re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+    return hashlib.sha1(template.encode("utf-8")).hexdigest()[:16], template
+
+
+def _safe_params(params: dict) -> dict:
+    """The params as MongoDB can store them, long sequences cut to MAX_PARAM_ITEMS."""
+    safe = {}
+    for name, value in params.items():
+        if isinstance(value, (list, tuple)):
+            items = list(value[:MAX_PARAM_ITEMS])
+            if len(value) > MAX_PARAM_ITEMS:
+                items.append(f"... +{len(value) - MAX_PARAM_ITEMS}")
+            value = items
+        safe[name] = value
+    return safe
+
+
+def plan_summary(plan: dict) -> dict:
+    """
+    The numbers of an EXPLAIN FORMAT=JSON plan which tell why a query is slow:
+    rows examined, the tables read by a full scan, filesort and temporary tables, and the optimizer's cost.
+
+    Rows examined follows the nested loop: a table is scanned once per row of the join prefix before it,
+    so its rows_examined_per_scan is multiplied by the rows_produced_per_join of the previous table
+    (the first table of a loop, and a single-table query, are scanned once). Subqueries and derived tables
+    have loops of their own, which are added as they are.
+    """
+    summary = {"rows_examined": 0, "full_scans": [], "filesort": False, "temporary": False,
+               "cost": float(plan.get("query_block", {}).get("cost_info", {}).get("query_cost", 0) or 0)}
+
+    def scan(table: dict, prefix_rows: float) -> float:
+        """Counts one table of a loop, returns the rows of the join prefix after it."""
+        examined = float(table["rows_examined_per_scan"]) * prefix_rows
+        summary["rows_examined"] += examined
+        if table.get("access_type") == "ALL":
+            summary["full_scans"].append(table["table_name"])
+        return float(table.get("rows_produced_per_join", examined))
+
+    def walk(node: Any, counted: bool = False) -> None:
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if not counted and "table_name" in node and "rows_examined_per_scan" in node:
+            scan(node, 1.0)
+        summary["filesort"] |= bool(node.get("using_filesort"))
+        summary["temporary"] |= bool(node.get("using_temporary_table"))
+        for key, value in node.items():
+            if key == "nested_loop" and isinstance(value, list):
+                prefix_rows = 1.0
+                for item in value:
+                    table = item.get("table") if isinstance(item, dict) else None
+                    if isinstance(table, dict) and "table_name" in table and "rows_examined_per_scan" in table:
+                        prefix_rows = scan(table, prefix_rows)
+                        walk(table, counted=True) #its subqueries, the table itself is counted
+                    else:
+                        walk(item)
+            else:
+                walk(value)
+
+    walk(plan)
+    summary["rows_examined"] = round(summary["rows_examined"])
+    return summary
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(sorted(values), n=100, method="inclusive")[percent - 1]
+
+
+class SlowQueryLog:
+    """
+    observe() is called for every query with its duration. Only the slow ones cost anything:
+    the EXPLAIN runs on another pooled connection in a background thread, the search has its rows already.
+    """
+
+    def __init__(self,
+                 threshold: float = config.SLOW_QUERY_SECONDS,
+                 explain: bool = config.SLOW_QUERY_EXPLAIN,
+                 pool: ConnectionPool = read_pool) -> None:
+        self.threshold = threshold
+        self.explain_plans = explain
+        self.pool = pool
+        self._executor = None # made by the first slow query, most runs have none
+        self._lock = threading.Lock() # observe() runs in the threads of the batch and of the search service
+
+    @property
+    def enabled(self) -> bool:
+        return config.SLOW_QUERY_LOG and self.threshold > 0
+
+    def observe(self, query: str, params: dict, seconds: float, rows: int) -> None:
+        if not self.enabled or seconds < self.threshold:
+            return
+        SLOW_QUERIES.inc()
+        with self._lock: #two threads must not both make an executor, one of them would never be shut down
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-log")
+            self._executor.submit(self._capture, query, dict(params), seconds, rows, datetime.now().replace(microsecond=0))
+
+    def explain(self, query: str, params: dict) -> dict:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("EXPLAIN FORMAT=JSON " + query.strip().rstrip(";"), params)
+                return json.loads(cursor.fetchone()[0])
+
+    def _capture(self, query: str, params: dict, seconds: float, rows: int, when: datetime) -> None:
+        from QueryLogger import myLogger
+
+        query_fingerprint, template = fingerprint(query)
+        record = {
+            "time": when,
+            "fingerprint": query_fingerprint,
+            "template": template,
+            "params": _safe_params(params),
+            "seconds": seconds,
+            "rows": rows,
+        }
+        if self.explain_plans:
+            try:
+                plan = self.explain(query, params)
+                record.update(plan_summary(plan))
+                record["plan"] = plan
+            except Exception as e:
+                record["plan_error"] = str(e)
+        try:
+            myLogger.log_slow_query(record)
+        except Exception as e:
+            print(Fore.RED + f"Error while logging a slow query: {e}")
+
+    def flush(self) -> None:
+        """Waits for the captures in progress (used on exit)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+slow_query_log = SlowQueryLog()
+
+
+def report(documents: list[dict], by: str = "p95", limit: int = 10) -> list[dict]:
+    """The slow query documents grouped by fingerprint, the worst `limit` templates first (by p95 or rows examined)."""
+    groups = {}
+    for doc in documents:
+        groups.setdefault(doc["fingerprint"], []).append(doc)
+
+    templates = []
+    for query_fingerprint, docs in groups.items():
+        seconds = [doc["seconds"] for doc in docs]
+        examined = [doc["rows_examined"] for doc in docs if doc.get("rows_examined") is not None]
+        templates.append({
+            "fingerprint": query_fingerprint,
+            "template": docs[-1]["template"],
+            "count": len(docs),
+            "p95": _percentile(seconds, 95),
+            "max": max(seconds),
+            "rows_examined": max(examined) if examined else None,
+            "rows": max(doc.get("rows", 0) for doc in docs),
+            "full_scans": sorted({table for doc in docs for table in doc.get("full_scans", ())}),
+            "filesort": any(doc.get("filesort") for doc in docs),
+            "temporary": any(doc.get("temporary") for doc in docs),
+            "last": max(doc["time"] for doc in docs),
+        })
+    key = (lambda item: item["rows_examined"] or 0) if by == "rows" else (lambda item: item["p95"])
+    return sorted(templates, key=key, reverse=True)[:limit]
+
+
+def print_report(templates: list[dict]) -> None:
+    if not templates:
+        print(Fore.GREEN + f"No query took longer than {config.SLOW_QUERY_SECONDS} s.")
+        return
+    for num, item in enumerate(templates, start=1):
+        flags = [f"full scan: {', '.join(item['full_scans'])}"] if item["full_scans"] else []
+        flags += ["filesort"] * item["filesort"] + ["temporary table"] * item["temporary"]
+        print(Fore.LIGHTYELLOW_EX + f"{num}. {item['fingerprint']}" + Fore.CYAN +
+              f"  {item['count']}x  p95 {item['p95'] * 1000:.0f} ms  max {item['max'] * 1000:.0f} ms  "
+              f"rows examined {item['rows_examined'] if item['rows_examined'] is not None else '?'}  "
+              f"rows sent {item['rows']}  last {item['last']}")
+        if flags:
+            print(Fore.RED + "   " + ", ".join(flags))
+        print(Fore.WHITE + "   " + (item["template"][:300] + ("..." if len(item["template"]) > 300 else "")))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report of the slow query log (the templates which were slow in MySQL).")
+    parser.add_argument("command", choices=("report",))
+    parser.add_argument("--by", choices=("p95", "rows"), default="p95", help="sort by p95 latency or by rows examined")
+    parser.add_argument("--limit", type=int, default=10, help="number of templates")
+    parser.add_argument("--days", type=float, help="only the slow queries of the last DAYS days")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    import functions #first, like main.py does: functions and QueryLogger import each other
+    from QueryLogger import setup_slow_query_log, myLogger
+    setup_slow_query_log()
+    if myLogger.slow_collection is None:
+        print(Fore.RED + "The slow query log needs MongoDB, see the MONGO settings.", file=sys.stderr)
+        sys.exit(1)
+
+    since = datetime.fromtimestamp(time.time() - args.days * 86400) if args.days else None
+    templates = report(myLogger.slow_queries_data(since), args.by, args.limit)
+    if args.json:
+        print(json.dumps(templates, default=str, indent=2))
+    else:
+        print_report(templates)
+
+
+if __name__ == "__main__":
+    main()
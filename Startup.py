@@ -0,0 +1,75 @@
+#============================================================================================================================#
+#                  Startup runs the slow parts of the start (MySQL and MongoDB connections) in the background                #
+#                                                                                                                            #
+#   main.py imports this module first, so `started_at` is the start of the process.                                          #
+#   start_background() starts the connections while the welcome screen renders, wait(name) blocks only where a connection    #
+#   is really needed (login, main menu, exit). The durations and the time to the first prompt go to Metrics.                 #
+#============================================================================================================================#
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from Metrics import STARTUP_SECONDS
+
+started_at = time.perf_counter()
+
+
+class Startup:
+    """
+    Named background tasks, each started once.
+
+    wait(name) re-raises whatever the task raised (SystemExit included), in the thread that waits for it.
+    """
+
+    def __init__(self) -> None:
+        self._executor = None
+        self._tasks = {} # name -> Future
+        self._lock = threading.Lock()
+        self.first_prompt_seconds = None
+
+    def start(self, name: str, task: Callable[[], None]) -> Future:
+        with self._lock:
+            if name not in self._tasks:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+                self._tasks[name] = self._executor.submit(self._timed, name, task)
+            return self._tasks[name]
+
+    @staticmethod
+    def _timed(name: str, task: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        try:
+            task()
+        finally:
+            STARTUP_SECONDS.set(time.perf_counter() - start, phase=name)
+
+    def wait(self, name: str) -> None:
+        """Blocks until the task is done (returns at once if it was never started)."""
+        task = self._tasks.get(name)
+        if task is not None:
+            task.result()
+
+    def first_prompt(self) -> None:
+        """Records the time from the start of the process to the first input() - only the first time."""
+        if self.first_prompt_seconds is None:
+            self.first_prompt_seconds = time.perf_counter() - started_at
+            STARTUP_SECONDS.set(self.first_prompt_seconds, phase="time_to_first_prompt")
+
+
+startup = Startup()
+
+
+def start_background() -> None:
+    """
+    Starts the MongoDB query log and the MySQL user storage at the same time, without blocking,
+    then the check of the film summary (built if it is missing) - the main menu waits for it before the first search.
+    """
+    import CONFIG_AND_MODULES as config
+    from QueryLogger import setup_query_log
+    from User_LOG_IN import setup_user_storage
+    startup.start("query_log", setup_query_log)
+    startup.start("user_storage", setup_user_storage)
+    if not config.SEARCH_SERVICE: #the service reads the summary, not the thin client
+        from FilmSummary import setup_film_summary
+        startup.start("film_summary", setup_film_summary)
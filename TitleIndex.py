@@ -0,0 +1,165 @@
+import sys
+import threading
+import time
+from array import array
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from ConnectionPool import ConnectionPool, read_pool
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+
+class TitleIndex:
+    """
+    In-process n-gram (trigram by default) index over the film titles.
+
+    - Every title is lower-cased and cut into overlapping n-grams.
+    - Each n-gram points to a sorted array of title positions (posting list).
+    - A substring search intersects the posting lists of the fragment's n-grams,
+      starting with the shortest one, and then confirms the candidates with `in`.
+    - Fragments shorter than n can't be cut into n-grams, they are answered by a scan of the titles.
+
+    Only film ids come out of the index, MySQL is used to hydrate the matched films.
+    The first search builds it, later ones start a background rebuild once it is older than `max_age`
+    (and keep searching the old index meanwhile), so added and renamed films show up without a restart.
+    """
+
+    def __init__(self,
+                 pool: ConnectionPool = read_pool,
+                 table: str = config.FILM_SUMMARY_TABLE,
+                 n: int = 3,
+                 max_age: float = config.TITLE_INDEX_MAX_AGE) -> None:
+        self.pool = pool
+        self.table = table
+        self.n = n
+        self.max_age = max_age
+        self._ids = array("I")  # position -> film_id
+        self._titles = []       # position -> lower-cased title
+        self._postings = {}     # n-gram -> array of positions
+        self._exact = {}        # lower-cased title -> array of positions
+        self._built = False
+        self._next_build = 0.0 # monotonic time of the next rebuild
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self.build_seconds = None
+
+    def _grams(self, text: str) -> set[str]:
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def build(self) -> None:
+        """Reads (film_id, title) from the film summary and builds the index, then swaps it in."""
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT DISTINCT film_id, title FROM {self.table} ORDER BY film_id;")
+                rows = cursor.fetchall()
+
+        ids = array("I")
+        titles = []
+        postings = {}
+        exact = {}
+        for position, (film_id, title) in enumerate(rows):
+            title = title.casefold()
+            ids.append(film_id)
+            titles.append(title)
+            exact.setdefault(title, array("I")).append(position)
+            for gram in self._grams(title):
+                postings.setdefault(gram, array("I")).append(position)
+
+        with self._lock:
+            self._ids, self._titles, self._postings, self._exact = ids, titles, postings, exact
+            self._built = True
+            self._next_build = time.monotonic() + self.max_age
+            self.build_seconds = time.perf_counter() - start
+
+    def ensure_built(self) -> None:
+        """Builds the index on the first use, starts a background rebuild when it is older than max_age."""
+        if self._built:
+            self.refresh_if_stale()
+            return
+        with self._build_lock: #only one thread builds, the others wait for it
+            if not self._built:
+                self.build()
+
+    def refresh_if_stale(self) -> None:
+        if time.monotonic() < self._next_build or not self._build_lock.acquire(blocking=False):
+            return #fresh, or a build is already running
+        threading.Thread(target=self._rebuild, name="title-index-rebuild", daemon=True).start()
+
+    def _rebuild(self) -> None:
+        """Runs with _build_lock held (see refresh_if_stale). A failed rebuild keeps the old index until the next try."""
+        try:
+            self.build()
+        except Exception:
+            self._next_build = time.monotonic() + self.max_age
+        finally:
+            self._build_lock.release()
+
+    def invalidate(self) -> None:
+        """The next search starts a rebuild (e.g. after the film summary was refreshed in this process)."""
+        self._next_build = 0.0
+
+    def preload(self) -> None:
+        """Builds the index in a background thread, so the first title search doesn't wait for it."""
+        threading.Thread(target=self.ensure_built, name="title-index-build", daemon=True).start()
+
+    def _positions_with(self, fragment: str) -> list[int]:
+        titles = self._titles
+        if len(fragment) < self.n:
+            return [pos for pos, title in enumerate(titles) if fragment in title]
+
+        postings = []
+        for gram in self._grams(fragment):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(pos for pos in candidates if fragment in titles[pos])
+
+    def search(self, fragment: str) -> list[int]:
+        """Film ids whose title contains `fragment` (case-insensitive), like title LIKE '%fragment%'."""
+        self.ensure_built()
+        return [self._ids[pos] for pos in self._positions_with(fragment.casefold())]
+
+    def exact(self, title: str) -> list[int]:
+        """Film ids whose title is exactly `title` (case-insensitive), like title = 'title'."""
+        self.ensure_built()
+        return [self._ids[pos] for pos in self._exact.get(title.casefold(), ())]
+
+    def memory_bytes(self) -> int:
+        """Approximate memory footprint: containers, posting arrays, keys and title strings."""
+        size = sys.getsizeof(self._ids) + sys.getsizeof(self._titles)
+        size += sum(sys.getsizeof(title) for title in self._titles)
+        size += sys.getsizeof(self._postings) + sys.getsizeof(self._exact)
+        size += sum(sys.getsizeof(gram) + sys.getsizeof(posting) for gram, posting in self._postings.items())
+        size += sum(sys.getsizeof(posting) for posting in self._exact.values())
+        return size
+
+    def stats(self) -> dict:
+        return {
+            "built": self._built,
+            "titles": len(self._titles),
+            "ngrams": len(self._postings),
+            "build_seconds": self.build_seconds,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+title_index = TitleIndex()
+
+
+if __name__ == "__main__":
+    title_index.build()
+    stats = title_index.stats()
+    print(Fore.GREEN + f"Title index: {stats['titles']} titles, {stats['ngrams']} {title_index.n}-grams")
+    print(Fore.GREEN + f"Built in {stats['build_seconds']:.3f} s, about {stats['memory_bytes'] / 1024 / 1024:.1f} MB in memory")
+    read_pool.close_all()
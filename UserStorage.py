@@ -6,13 +6,20 @@ import pymysql
 
 from colorama import Fore, init
 
+import CONFIG_AND_MODULES as config
+
 import functions
+from ConnectionPool import ConnectionPool, write_pool
 
-init(autoreset=True)
+init(autoreset=True, strip=config.STRIP_COLORS)
 
 from functools import wraps
 import Animation as anim
 
+DUPLICATE_ENTRY = 1062 # MySQL error code of a duplicate key
+USERNAME_LENGTH = 255  # VARCHAR sizes of the users table
+PASSWORD_LENGTH = 255  # holds the whole 'pbkdf2_sha256$...' string
+
 #decorator
 def try_exeption(func: Callable) -> Callable:
     @wraps(func) #to save metadata of an original function
@@ -41,73 +48,124 @@ class UserStorage:
         self.user = None
         self.password = None
         self.database = None
-        self.conn = None
-        self.cursor = None
+        self.table = None
+        self.pool = None
         self.user_session_path = None
 
     @try_exeption
-    def create_connection(self, host=None, port=None, user=None, password=None) -> None:
-        anim.animation_spinner("Connection to the Database...")
-        self.conn = pymysql.connect(host=host, port=port, user=user, password=password)
-        self.cursor = self.conn.cursor()
+    def create_connection(self, pool: ConnectionPool = write_pool, spinner: bool = True) -> None:
+        """
+        Attaches the storage to a connection pool and checks right away that the server is reachable.
+        spinner=False when it runs in the background (Startup) - the spinner would write over the welcome screen.
+        """
+        if spinner:
+            anim.animation_spinner("Connection to the Database...")
+        self.pool = pool
+        with self.pool.connection() as conn:
+            conn.ping(reconnect=False)
 
     @try_exeption
     def create_database(self, database:str) -> None:
-        self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database};")
-        self.conn.commit()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database};")
+            conn.commit()
+        self.pool.set_database(database) #every pooled connection works in this database from now on
         self.database = database
 
     @try_exeption
     def create_table(self, table:str) -> None:
-        self.cursor.execute(f"USE {self.database};")
-        self.cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table} (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) NOT NULL UNIQUE,
-                password VARCHAR(255) NOT NULL
-            );
-        """)
-        self.conn.commit()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        username VARCHAR({USERNAME_LENGTH}) NOT NULL UNIQUE,
+                        password VARCHAR({PASSWORD_LENGTH}) NOT NULL
+                    );
+                """)
+            conn.commit()
         self.table = table
 
     @try_exeption
-    def add_user(self, username:str, password:str) -> None:
+    def add_user(self, username:str, password:str) -> bool:
+        """False if the username is taken: the UNIQUE index decides, so two sign-ups can't both get the same name."""
         sql = "INSERT INTO users (username, password) VALUES (%s, %s)"
-        self.cursor.execute(sql, (username, password))
-        self.conn.commit()
+        with self.pool.connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql, (username, password))
+            except pymysql.err.IntegrityError as e:
+                if e.args and e.args[0] == DUPLICATE_ENTRY:
+                    return False #the connection goes back to the pool, which rolls the transaction back
+                raise
+            conn.commit()
         print()
         print(Fore.GREEN + "User inserted successfully")
+        return True
+
+    def add_users(self, users: list[tuple[str, str]], on_duplicate: str = "ignore") -> tuple[int, int]:
+        """
+        Inserts many (username, password hash) rows with one executemany in one transaction.
+
+        on_duplicate="ignore" keeps the existing accounts (ON DUPLICATE KEY UPDATE id = id - unlike INSERT IGNORE
+        it doesn't turn the other errors, like a value too long for its column, into warnings and truncated rows),
+        "update" replaces their passwords (ON DUPLICATE KEY UPDATE password = ...).
+        Returns (inserted, duplicates). Errors are raised, the transaction is rolled back by the pool.
+        """
+        table = self.table or "users"
+        if on_duplicate == "update":
+            sql = (f"INSERT INTO {table} (username, password) VALUES (%s, %s) "
+                   f"ON DUPLICATE KEY UPDATE password = VALUES(password)")
+        else:
+            sql = f"INSERT INTO {table} (username, password) VALUES (%s, %s) ON DUPLICATE KEY UPDATE id = id"
+        count_sql = f"SELECT COUNT(*) FROM {table} WHERE username IN %s"
+        usernames = tuple(username for username, _ in users)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                if on_duplicate == "update":
+                    #the affected rows can't tell an update from an unchanged row (MySQL counts 0 for it),
+                    #so the new rows are counted by the UNIQUE index before and after, in the same transaction
+                    #(FOR UPDATE: no other session adds one of these usernames in between)
+                    cursor.execute(count_sql + " FOR UPDATE", (usernames,))
+                    before = cursor.fetchone()[0]
+                    cursor.executemany(sql, users)
+                    cursor.execute(count_sql, (usernames,))
+                    inserted = cursor.fetchone()[0] - before
+                else:
+                    inserted = cursor.executemany(sql, users) or 0 #1 per new row, 0 per existing one (id = id changes nothing)
+            conn.commit()
+        return inserted, len(users) - inserted
 
     @try_exeption
     def user_already_exists(self, username: str) -> bool:
-        sql = "SELECT 1 FROM users WHERE BINARY username = %s LIMIT 1"
-        self.cursor.execute(sql, (username,))
-        return self.cursor.fetchone() is not None
+        sql = "SELECT 1 FROM users WHERE username = %s AND BINARY username = %s LIMIT 1" #the first condition uses the UNIQUE index
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, (username, username))
+                return cursor.fetchone() is not None
 
     @try_exeption
     def password_correct(self, user: str, password: str) -> bool:
-        sql = "SELECT password FROM users WHERE BINARY username = %s LIMIT 1"
-        self.cursor.execute(sql, (user,))
-        result = self.cursor.fetchone()
+        """Kept for old callers, the login uses LoginService.authenticate (one query, re-hashes legacy passwords)."""
+        from LoginService import verify_password
+        sql = "SELECT password FROM users WHERE username = %s AND BINARY username = %s LIMIT 1"
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, (user, user))
+                result = cursor.fetchone()
         if result is None:
             return False
 
-        stored_password = result[0]
-        return stored_password == password
+        correct, _ = verify_password(password, result[0])
+        return correct
 
     @try_exeption
     def close_connection(self) -> None:
-        if self.cursor:
-            try:
-                self.cursor.close()
-            except Exception:
-                pass
-        if self.conn:
-            try:
-                self.conn.close()
-                functions.print_slowly("Connection to the UserStorage closed successfully!", Fore.LIGHTGREEN_EX, delay=0.01)
-            except Exception:
-                pass
+        """Closes the idle pooled connections. The pool reopens them if the storage is used again."""
+        if self.pool is not None and self.pool.stats()["idle"]:
+            self.pool.close_all()
+            functions.print_slowly("Connection to the UserStorage closed successfully!", Fore.LIGHTGREEN_EX, delay=0.01)
         print()
 
 
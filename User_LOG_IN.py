@@ -1,22 +1,33 @@
 import os
 
 from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
 from dotenv import load_dotenv
-from numpy.ma.core import choose
 
 import functions as f
+from Navigator import go
+from Startup import startup
 
 load_dotenv()
-init(autoreset=True)
+init(autoreset=True, strip=config.STRIP_COLORS)
 
 from UserStorage import UserStorage
-from CONFIG_AND_MODULES import DB_CONFIG_WRITE
+from LoginService import LoginService
 import Animation as anim
 
 userStorage = UserStorage()
-userStorage.create_connection(**DB_CONFIG_WRITE)
-userStorage.create_database(os.getenv("DB_DATABASE_WRITE"))
-userStorage.create_table(os.getenv("DB_TABLE_WRITE"))
+loginService = LoginService(userStorage)
+
+
+def setup_user_storage() -> None:
+    """
+    Connects the user storage (shared write_pool, built from DB_CONFIG_WRITE) and creates its database and table.
+    start_background() runs it in the background, the login flows wait for it before the first query.
+    """
+    userStorage.create_connection(spinner=False)
+    userStorage.create_database(os.getenv("DB_DATABASE_WRITE"))
+    userStorage.create_table(os.getenv("DB_TABLE_WRITE"))
 
 
 
@@ -35,34 +46,35 @@ Or give data to create a new account!
 """, Fore.CYAN, delay=0.005)
         user = input(Fore.GREEN + "Create username: ").strip()
         if user == "1":
-            return login_account()
+            return go(login_account)
         elif user == "2":
-            return f.main()
+            return go(f.main)
         elif user == "3":
-            return f.exit_program()
+            return go(f.exit_program)
 
-        if userStorage.user_already_exists(user) or len(user) < 5:
-            anim.animation_spinner("Checking up of the username", time_of_loading=3)
-            print(Fore.RED + "Username already exists or the username is too short(5 characters minimum)")
+        if len(user) < 5:
+            print(Fore.RED + "The username is too short(5 characters minimum)")
             continue
-        break
 
-    while True:
-        password = input(Fore.GREEN +  "Create password: ").strip()
-        if password == "1":
-            return login_account()
-        elif password == "2":
-            return f.main()
-        elif password == "3":
-            return f.exit_program()
-
-        if len(password) < 5:
-            print(Fore.RED + "Password must be at least 5 characters")
-            continue
-        break
+        while True:
+            password = input(Fore.GREEN +  "Create password: ").strip()
+            if password == "1":
+                return go(login_account)
+            elif password == "2":
+                return go(f.main)
+            elif password == "3":
+                return go(f.exit_program)
+
+            if len(password) < 5:
+                print(Fore.RED + "Password must be at least 5 characters")
+                continue
+            break
 
-    userStorage.add_user(user, password)
-    return login_account()
+        startup.wait("user_storage") #usually done long ago, the user was typing
+        if loginService.register(user, password): #stored as a salted hash; the UNIQUE index rejects a taken username
+            break
+        print(Fore.RED + "Username already exists, choose another one")
+    return go(login_account)
 
 
 def login_account():
@@ -90,32 +102,33 @@ Or give data to log in!
 {Fore.GREEN + 'Enter your choice:'} """).lower()
 
             if choose == '1':
-                return create_account()
+                return go(create_account)
             elif choose == '2':
-                return f.main()
+                return go(f.main)
             elif choose == '3':
                 userStorage.close_connection()
-                return f.exit_program()
+                return go(f.exit_program)
 
         elif user == '2':
-            return f.main()
+            return go(f.main)
         elif user == '3':
             userStorage.close_connection()
-            return f.exit_program()
+            return go(f.exit_program)
 
 
         password = input(Fore.GREEN + "Enter password: ").strip()
 
         if password == '1':
-            return create_account()
+            return go(create_account)
         elif password == '2':
-            return f.main()
+            return go(f.main)
         elif password == '3':
             userStorage.close_connection()
-            return f.exit_program()
+            return go(f.exit_program)
 
 
-        if not (userStorage.user_already_exists(user) and userStorage.password_correct(user, password)):
+        startup.wait("user_storage")
+        if not loginService.authenticate(user, password): #one query: the user and the password together
             anim.loading("Logging In")
             print(Fore.RED + "Invalid username or password. Try again.")
             continue
@@ -123,7 +136,7 @@ Or give data to log in!
         anim.loading("Logging In")
         print(Fore.CYAN +  "The log-in succeeded! Welcome to the main menu!")
         userStorage.close_connection()
-        return f.main_menu()
+        return go(f.main_menu)
 
 
 
@@ -0,0 +1,133 @@
+#============================================================================================================================#
+#                                 Batch mode: many searches from a file or stdin, no menus                                   #
+#                                                                                                                            #
+#   python batch.py specs.jsonl --format csv --output results.csv                                                            #
+#   cat specs.jsonl | python batch.py --workers 4                                                                            #
+#                                                                                                                            #
+#   One search spec per line (JSONL) or per row (CSV with the same column names):                                            #
+#       {"search": "title", "value": "ACADEMY"}                                                                              #
+#       {"search": "year", "value": 2006}                                                                                    #
+#       {"search": "range", "year_from": 2005, "year_to": 2007}                                                              #
+#       {"search": "genre", "value": "Drama"}                                                                                #
+#       {"search": "genre_year", "value": "Drama", "year_from": 2006, "year_to": 2007}   (year_to is optional)               #
+#       {"search": "actor", "value": "PENELOPE"}                                                                             #
+#       {"search": "composite", "value": {"title": "ACE", "genre": "Drama"}, "year_from": 2006}   (JSONL only)               #
+#                                                                                                                            #
+#   Output: one record per found film (JSONL or CSV), the failed specs get a record with "error"                             #
+#============================================================================================================================#
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, TextIO
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+
+from SearchEngine import Film, SearchEngine, engine
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+OUTPUT_FIELDS = ["spec", "search", "value", "year_from", "year_to", "title", "release_year", "genre", "actors", "error"]
+
+
+def run_spec(spec: dict, search_engine: SearchEngine = engine) -> list[Film]:
+    """Runs one search spec (see the header of this file) and returns the films."""
+    year_from = int(spec["year_from"]) if spec.get("year_from") not in (None, "") else None
+    year_to = int(spec["year_to"]) if spec.get("year_to") not in (None, "") else None
+    return search_engine.run(*search_engine.spec_query(spec.get("search"), spec.get("value"), year_from, year_to))
+
+
+def read_specs(source: TextIO, input_format: str) -> Iterator[dict]:
+    if input_format == "csv":
+        yield from csv.DictReader(source)
+        return
+    for number, line in enumerate(source, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e: #one bad line becomes an error record, the rest of the batch still runs
+            yield {"error": f"line {number}: {e}"}
+
+
+def _records(number: int, spec: dict) -> list[dict]:
+    """Output records of one spec: one per film, or one with the error."""
+    base = {"spec": number, "search": spec.get("search"), "value": spec.get("value"),
+            "year_from": spec.get("year_from"), "year_to": spec.get("year_to")}
+    if "error" in spec: #the line couldn't be read, see read_specs
+        return [{**base, "error": spec["error"]}]
+    try:
+        films = run_spec(spec)
+    except Exception as e:
+        return [{**base, "error": str(e)}]
+    return [{**base, "title": film.title, "release_year": film.release_year,
+             "genre": film.genre, "actors": ", ".join(film.actors)} for film in films]
+
+
+def run_in_order(workers: ThreadPoolExecutor, specs: Iterable[dict], window: int) -> Iterator[list[dict]]:
+    """
+    The records of every spec, in the order of the specs, while up to `window` searches run in parallel.
+    Unlike map(), the specs are read only as the window moves on, so a huge or endless input (stdin) isn't
+    loaded into memory first, and the first results are written while the rest is still being read.
+    """
+    pending = deque()
+    for number, spec in enumerate(specs, start=1):
+        pending.append(workers.submit(_records, number, spec))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run many film searches without the interactive menus.")
+    parser.add_argument("input", nargs="?", help="file with search specs (default: stdin)")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"), help="default: by the file extension, jsonl for stdin")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="output format")
+    parser.add_argument("--output", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=4, help="searches running at the same time (pooled connections)")
+    args = parser.parse_args()
+
+    input_format = args.input_format or ("csv" if args.input and args.input.endswith(".csv") else "jsonl")
+    source = open(args.input, encoding="utf-8", newline="") if args.input else sys.stdin
+    target = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+
+    writer = csv.DictWriter(target, fieldnames=OUTPUT_FIELDS) if args.format == "csv" else None
+    if writer:
+        writer.writeheader()
+
+    start = time.perf_counter()
+    searches = rows = errors = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as workers:
+            for records in run_in_order(workers, read_specs(source, input_format), window=2 * args.workers):
+                searches += 1
+                for record in records:
+                    if "error" in record:
+                        errors += 1
+                    else:
+                        rows += 1
+                    if writer:
+                        writer.writerow(record)
+                    else:
+                        target.write(json.dumps(record, default=str) + "\n")
+    finally:
+        engine.pool.close_all()
+        if args.input:
+            source.close()
+        if args.output:
+            target.close()
+
+    elapsed = time.perf_counter() - start
+    print(Fore.GREEN + f"{searches} searches, {rows} rows, {errors} errors in {elapsed:.2f} s "
+                       f"({searches / elapsed if elapsed else 0:.0f} searches/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
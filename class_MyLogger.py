@@ -1,18 +1,15 @@
 from datetime import datetime
 import pathlib
-
-from pymongo import MongoClient
-from pymongo.errors import (
-    ConnectionFailure,
-    ServerSelectionTimeoutError,
-    ConfigurationError,
-    OperationFailure,
-    PyMongoError
-)
+import queue
+import threading
 
 from colorama import Fore, init
-init(autoreset=True)
+
+import CONFIG_AND_MODULES as config
+init(autoreset=True, strip=config.STRIP_COLORS)
 import functions as f
+from Navigator import Transition, go
+from Metrics import LOGGED_SEARCHES, STAGE_SECONDS
 
 
 class MyLogger:
@@ -21,15 +18,16 @@ class MyLogger:
     - Connects to MongoDB
     - Stores search history
     - Logs latest query and result
-    - Supports top-5 most frequent searches
+    - Supports top-N most frequent searches (optionally from incrementally maintained counters)
     """
-    NOW = datetime.now().replace(microsecond=0)
 
     def __init__(self) -> None:
         self.client_mongo = None
         self.db = None
         self.collection = None
         self.state_collection = None #only to check whether the history of search is empty or not
+        self.counters_collection = None #optional, search counters for top_queries()
+        self.slow_collection = None #the slow queries with their plans, see SlowQueryLog
         self.max_docs_in_collection = None
         self.last_query_filetxt_path = None
         self.last_query = None
@@ -37,9 +35,26 @@ class MyLogger:
         self.key_of_search = None  # e.g. "genre"
         self.value_of_search = None #e.g. "drama"
         self.result_status = None # Success if "result found" else Failure
+        self.retention = "trim" # "capped" | "ttl" | "trim", see set_retention()
+        self.ttl_seconds = None
+        self.trim_every = 1
+        self.capped_size = None
+        self.writes_since_trim = 0
+        self.state_cleaned = None # the last "cleaned" value written to state_collection
+        self.log_queue = None # the background writer is off until start_log_writer()
+        self.log_batch_size = None
+        self.log_writer = None
 
     def connect_mongo(self, link) -> None:
         """Connect to MongoDB using the given URI."""
+        from pymongo import MongoClient #imported on first use, it's not needed before the logger is set up
+        from pymongo.errors import (
+            ConnectionFailure,
+            ServerSelectionTimeoutError,
+            ConfigurationError,
+            OperationFailure,
+            PyMongoError
+        )
         try:
             client = MongoClient(link, serverSelectionTimeoutMS=3000)
             client.admin.command('ping')
@@ -64,15 +79,72 @@ You can work without it, or you can solve the issue and rerun the script.""")
             self.db = self.client_mongo[db_name]
 
     def create_collection(self, collection_name) -> None:
-        """Create MongoDB collection."""
+        """Create MongoDB collection (with the options of the retention strategy)."""
         if self.db is not None:
             self.collection = self.db[collection_name]
+            self.ensure_retention()
+
+    def set_retention(self, strategy, ttl_seconds=None, trim_every=None, capped_size=None) -> None:
+        """
+        Chooses how the search history is kept small. Call it before create_collection().
 
-    def limit_control_collection(self):
-        current_count_collectoin = self.collection.count_documents({})
-        if current_count_collectoin > self.max_docs_in_collection:
-            oldest_doc = self.collection.find_one(sort=[("_id", 1)])
-            self.collection.delete_one({"_id": oldest_doc["_id"]})
+        - "capped": a capped collection with max = max_docs_in_collection + 1, MongoDB drops the oldest itself.
+        - "ttl":    a TTL index on "time", MongoDB deletes the documents older than ttl_seconds.
+        - "trim":   a plain collection, every trim_every writes the documents over the limit are deleted at once.
+
+        With any of them a logged search costs one write, whatever the size of the history.
+        """
+        if strategy not in ("capped", "ttl", "trim"):
+            print(Fore.RED + f"Unknown log retention '{strategy}', 'trim' is used instead.")
+            strategy = "trim"
+        self.retention = strategy
+        self.ttl_seconds = ttl_seconds
+        self.trim_every = trim_every or 1
+        self.capped_size = capped_size
+
+    def ensure_retention(self) -> None:
+        """Creates the log collection with the right options, or checks the existing one."""
+        from pymongo.errors import PyMongoError
+        name = self.collection.name
+        try:
+            if self.retention == "capped":
+                max_docs = self.max_docs_in_collection + 1
+                if name not in self.db.list_collection_names():
+                    self.db.create_collection(name, capped=True, size=self.capped_size, max=max_docs)
+                    return
+                options = self.collection.options()
+                if not options.get("capped"):
+                    print(Fore.RED + f"The collection '{name}' already exists and is not capped, its history is trimmed instead.")
+                    self.retention = "trim"
+                elif options.get("max") != max_docs:
+                    print(Fore.RED + f"The capped collection '{name}' keeps {options.get('max')} documents, not {max_docs}.")
+
+            elif self.retention == "ttl":
+                indexes = self.collection.index_information()
+                ttl_index = next((index for index in indexes.values() if index["key"] == [("time", 1)]), None)
+                if ttl_index is None:
+                    self.collection.create_index([("time", 1)], expireAfterSeconds=self.ttl_seconds)
+                elif ttl_index.get("expireAfterSeconds") != self.ttl_seconds:
+                    self.db.command("collMod", name, index={"keyPattern": {"time": 1}, "expireAfterSeconds": self.ttl_seconds})
+        except PyMongoError as e:
+            print(Fore.RED + f"Error while setting up the log retention ({self.retention}): {e}")
+
+    def limit_control_collection(self, incoming=1):
+        """
+        Keeps the history within max_docs_in_collection.
+
+        Capped and TTL collections are trimmed by MongoDB itself, so only "trim" does something here:
+        every trim_every writes it finds the newest document over the limit and deletes it with all older ones.
+        """
+        if self.retention != "trim":
+            return None
+        self.writes_since_trim += incoming
+        if self.writes_since_trim < self.trim_every:
+            return None
+        self.writes_since_trim = 0
+        boundary = list(self.collection.find({}, {"_id": 1}).sort("_id", -1).skip(self.max_docs_in_collection + 1).limit(1))
+        if boundary:
+            self.collection.delete_many({"_id": {"$lte": boundary[0]["_id"]}})
         return None
 
     def create_collection_of_states(self, collection_name) -> None:
@@ -89,6 +161,7 @@ You can work without it, or you can solve the issue and rerun the script.""")
             self.state_collection = self.db[collection_name]
             data_cleaned_dict = {"cleaned":1 if self.data_is_cleaned() else 0}
             self.state_collection.insert_one(data_cleaned_dict)
+            self.state_cleaned = data_cleaned_dict["cleaned"]
 
     def state_switcher(self, data_cleaned=False) -> None:
         """
@@ -99,12 +172,13 @@ You can work without it, or you can solve the issue and rerun the script.""")
         Each time when a user finds something -> "cleaned": 0
         """
         if self.collection is not None:
-            if data_cleaned:
-                self.state_collection.update_one({}, {"$set": {"cleaned": 1}}, upsert=True)
-            else:
-                self.state_collection.update_one({}, {"$set": {"cleaned": 0}}, upsert=True)
+            cleaned = 1 if data_cleaned else 0
+            if self.state_cleaned == cleaned: #already stored, no need for another write per search
+                return
+            self.state_collection.update_one({}, {"$set": {"cleaned": cleaned}}, upsert=True)
+            self.state_cleaned = cleaned
 
-    def clean_history_of_search(self) -> None:
+    def clean_history_of_search(self) -> Transition:
         """
         Clear the entire search history.
 
@@ -113,13 +187,20 @@ You can work without it, or you can solve the issue and rerun the script.""")
         - Updates the state to mark history as cleaned.
         - Returns to the main menu.
         """
+        self.flush() #queued searches must not reappear after the cleaning
         if self.last_query_filetxt_path is not None:
             with open(self.last_query_filetxt_path, "w") as file:
                 pass
         if self.collection is not None:
-            self.collection.delete_many({})
+            if self.retention == "capped": #documents can't be deleted from a capped collection, so it is recreated
+                self.collection.drop()
+                self.ensure_retention()
+            else:
+                self.collection.delete_many({})
+            if self.counters_collection is not None:
+                self.counters_collection.delete_many({})
             self.state_switcher(data_cleaned=True)
-            return f.main_menu()
+            return go(f.main_menu)
 
     def clean_state_collection_before_exit(self) -> None:
         """
@@ -141,9 +222,9 @@ You can work without it, or you can solve the issue and rerun the script.""")
     def set_max_docs_in_collection(self, max_) -> None:
         """
         sets the maximum number of documents in the collection of logging
+        (call it before create_collection(), a capped collection is created with this limit)
         """
-        if self.collection is not None:
-            self.max_docs_in_collection = max_
+        self.max_docs_in_collection = max_
 
     def set_query_result_status(self, result_status, search_key, search_value) -> None:
         """
@@ -200,6 +281,7 @@ You can work without it, or you can solve the issue and rerun the script.""")
             print(Fore.RED + f"Error while processing the path: {e}")
 
 
+    @STAGE_SECONDS.time(stage="log_in_txt")
     def log_in_txt(self):
         if self.last_query is not None:
             try:
@@ -210,25 +292,27 @@ You can work without it, or you can solve the issue and rerun the script.""")
                 return
 
 
-    def get_last_query(self) -> None:
+    def get_last_query(self) -> Transition:
         """
         Retrieves the last query from the last_query_filetxt_path.
         :return: None
         """
+        self.flush()
         if self.last_query_filetxt_path is not None:
             try:
                 with open(self.last_query_filetxt_path, "r",encoding="utf-8", newline='') as file:
                     file_content = file.read()
                     if not file_content:
                         print(Fore.RED + "You have no last query yet.")
-                        return f.main_menu()
+                        return go(f.main_menu)
                     f.print_slowly(file_content, Fore.LIGHTBLUE_EX, delay=0.01)
-                    return f.main_menu()
+                    return go(f.main_menu)
             except FileNotFoundError as e:
                 print(Fore.RED + str(e))
             except Exception as e:
                 print(Fore.RED + str(e))
 
+    @STAGE_SECONDS.time(stage="log_in_mongo")
     def log_in_mongo(self) -> None:
         """
         Save the latest SQL query and its metadata to MongoDB.
@@ -238,66 +322,233 @@ You can work without it, or you can solve the issue and rerun the script.""")
         - Stores time, query, search key/value, and result status.
         - Updates state to mark history as not cleaned.
         """
-        if self.collection is not None:
-            import sqlparse
-
+        if self.collection is not None and self.last_query is not None:
             self.limit_control_collection()
 
-            doc_to_save_inMongo = {
-                "time": MyLogger.NOW,
-                "query": sqlparse.format(self.last_query, reindent=True, keyword_case='upper'),
-                "key of search": self.key_of_search,
-                "value of search": self.value_of_search,
-                "Result of the searching": self.result_status
-            }
+            #the time of this write: the TTL index and the order of the history count from it
+            doc_to_save_inMongo = self.log_document(datetime.now().replace(microsecond=0), self.last_query, self.key_of_search,
+                                                    self.value_of_search, self.result_status)
             self.collection.insert_one(doc_to_save_inMongo)
+            self.count_searches([doc_to_save_inMongo])
             self.state_switcher(data_cleaned=False)
-
-    def top_queries(self, limit) -> None:
+            LOGGED_SEARCHES.inc(target="mongo")
+
+    @staticmethod
+    def log_document(time, query, key_of_search, value_of_search, result_status) -> dict:
+        """One document of the search history."""
+        import sqlparse
+        return {
+            "time": time,
+            "query": sqlparse.format(query, reindent=True, keyword_case='upper'),
+            "key of search": key_of_search,
+            "value of search": value_of_search,
+            "Result of the searching": result_status
+        }
+
+    def start_log_writer(self, max_queue=1000, batch_size=50) -> None:
         """
-        Display the top 5 most frequent search keys and their most used values.
+        Moves the logging of searches to a background thread.
 
-        - Aggregates queries by "key of search" and counts frequency.
-        - For each key, finds the most common "value of search".
-        - Prints each as a readable search description.
-        - Returns to the main menu after displaying.
+        - log_query() only puts the search into a bounded queue (it blocks when the queue is full - backpressure).
+        - The worker formats the queries, writes the last one to the .txt file
+          and saves the whole batch to MongoDB with one insert_many.
+        - flush() waits until everything queued is written, stop_log_writer() also stops the thread.
+        """
+        if self.log_writer is not None:
+            return
+        self.log_queue = queue.Queue(maxsize=max_queue)
+        self.log_batch_size = batch_size
+        self.log_writer = threading.Thread(target=self._log_writer_loop, name="query-log-writer", daemon=True)
+        self.log_writer.start()
+
+    def log_query(self, query: str, params: dict, result_status, search_key, search_value) -> None:
         """
+        Logs one search: in the background if the writer is running, otherwise right away
+        (extract_query_and_params -> set_query_result_status -> log_in_mongo -> log_in_txt).
+        """
+        if self.log_writer is None:
+            self.extract_query_and_params(query, params)
+            self.set_query_result_status(result_status, search_key, search_value)
+            self.log_in_mongo()
+            self.log_in_txt()
+            return
+        self.log_queue.put({
+            "time": datetime.now().replace(microsecond=0),
+            "query": query,
+            "params": dict(params),
+            "result_status": result_status,
+            "search_key": search_key,
+            "search_value": search_value,
+        })
+
+    def _log_writer_loop(self) -> None:
+        while True:
+            batch = [self.log_queue.get()]
+            while len(batch) < self.log_batch_size:
+                try:
+                    batch.append(self.log_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            entries = [entry for entry in batch if entry is not None]
+            try:
+                if entries:
+                    self._write_batch(entries)
+            except Exception as e:
+                print(Fore.RED + f"Error while logging the search history: {e}")
+            finally:
+                for _ in batch:
+                    self.log_queue.task_done()
+
+            if len(entries) != len(batch): #None is the stop signal
+                return
+
+    def _write_batch(self, entries: list[dict]) -> None:
+        from QueryLogger import pure_query
+        documents = []
+        for entry in entries:
+            query = pure_query(entry["query"], entry["params"])
+            if query is None:
+                continue
+            self.last_query = query
+            documents.append(self.log_document(entry["time"], query, entry["search_key"],
+                                               entry["search_value"], entry["result_status"]))
+        if not documents:
+            return
+
+        self.log_in_txt()
         if self.collection is not None:
-            if self.data_is_cleaned():
-                print(Fore.RED + "The search history is empty!")
-                return f.main_menu()
+            with STAGE_SECONDS.time(stage="log_in_mongo"):
+                self.limit_control_collection(incoming=len(documents))
+                self.collection.insert_many(documents, ordered=True)
+                self.count_searches(documents)
+                self.state_switcher(data_cleaned=False)
+            LOGGED_SEARCHES.inc(len(documents), target="mongo")
+
+    def flush(self) -> None:
+        """Waits until every queued search is written."""
+        if self.log_writer is not None:
+            self.log_queue.join()
+
+    def stop_log_writer(self) -> None:
+        """Writes what is left in the queue and stops the background writer (used on exit)."""
+        if self.log_writer is not None:
+            self.log_queue.put(None)
+            self.log_writer.join()
+            self.log_writer = None
+
+    def create_counters_collection(self, collection_name) -> None:
+        """
+        Optional collection with one document per searched value: {_id: value, key: key, count: N}.
+
+        Every logged search increments its counter ($inc with upsert), so top_queries()
+        reads the TOP N from the index on "count" instead of aggregating the whole history.
+
+        The counts are lifetime totals (since the last clean_history_of_search()), not counts of the kept history:
+        the retention never decrements them. The capped and TTL collections lose their documents inside MongoDB,
+        so nothing here would know what to decrement - and the TOP N of all time is what the menu promises anyway.
+        """
+        if self.db is not None and collection_name:
+            self.counters_collection = self.db[collection_name]
+            self.counters_collection.create_index([("count", -1)])
+
+    def create_slow_query_collection(self, collection_name, ttl_seconds=None) -> None:
+        """
+        Collection of the slow query log: one document per query over SLOW_QUERY_SECONDS
+        (fingerprint, template, params, seconds, rows, the EXPLAIN plan and its summary).
+        Indexed by fingerprint for the report, a TTL index on "time" keeps it from growing forever.
+        """
+        if self.db is not None and collection_name:
+            self.slow_collection = self.db[collection_name]
+            self.slow_collection.create_index([("fingerprint", 1)])
+            if ttl_seconds:
+                self.slow_collection.create_index([("time", 1)], expireAfterSeconds=ttl_seconds)
+
+    def log_slow_query(self, record: dict) -> None:
+        """Stores one slow query (called from the background thread of SlowQueryLog)."""
+        if self.slow_collection is not None:
+            self.slow_collection.insert_one(record)
+            LOGGED_SEARCHES.inc(target="slow_queries")
+
+    def slow_queries_data(self, since=None) -> list[dict]:
+        """The slow query documents without their plans (only the summary fields), the oldest first."""
+        if self.slow_collection is None:
+            return []
+        return list(self.slow_collection.find({"time": {"$gte": since}} if since else {},
+                                              {"plan": 0, "params": 0, "_id": 0}, sort=[("time", 1)]))
+
+    def count_searches(self, documents: list[dict]) -> None:
+        """Increments the counters of the logged searches with one bulk write (lifetime totals, see create_counters_collection)."""
+        if self.counters_collection is None or not documents:
+            return
+        from pymongo import UpdateOne
+        increments = {}
+        for doc in documents:
+            value = doc["value of search"]
+            key, count = increments.get(value, (doc["key of search"], 0))
+            increments[value] = (key, count + 1)
+        self.counters_collection.bulk_write([
+            UpdateOne({"_id": value}, {"$inc": {"count": count}, "$set": {"key": key}}, upsert=True)
+            for value, (key, count) in increments.items()
+        ], ordered=False)
+
+    def top_queries_data(self, limit) -> list[dict]:
+        """
+        The `limit` most frequent searches as [{"key": ..., "value": ..., "count": ...}], the most frequent first.
 
-            top_values = list(self.collection.aggregate([
-                {"$group": {"_id": "$value of search", "count": {"$sum": 1}}},
+        Reads the counters collection if there is one (lifetime totals), otherwise runs one aggregation
+        which returns the value, its key and its count together (over the history which is still kept).
+        """
+        self.flush()
+        if self.counters_collection is not None:
+            top_values = self.counters_collection.find({}, sort=[("count", -1)], limit=limit)
+        else:
+            top_values = self.collection.aggregate([
+                {"$group": {"_id": "$value of search", "key": {"$first": "$key of search"}, "count": {"$sum": 1}}},
                 {"$sort": {"count": -1}},
                 {"$limit": limit}
-            ]))
+            ])
+        return [{"key": item.get("key") or "unknown", "value": item["_id"], "count": item["count"]}
+                for item in top_values]
 
-            print()
-            print(Fore.LIGHTYELLOW_EX + f"Top {limit} most popular queries:")
-            num = 1
-            for value_item in top_values:
-                value = value_item["_id"]
+    def top_queries(self, limit) -> Transition:
+        """
+        Display the top N most frequent searches with their keys.
 
-                top_values = list(self.collection.aggregate([
-                    {"$match": {"value of search": value}},
-                    {"$limit": 1}
-                ]))
+        - Gets the values, keys and counts from top_queries_data() in one round trip.
+          Without a MongoDB connection of its own, the thin client asks the search service for them.
+        - Prints each as a readable search description.
+        - Returns to the main menu after displaying.
+        """
+        self.flush()
+        if self.collection is not None:
+            if self.data_is_cleaned():
+                print(Fore.RED + "The search history is empty!")
+                return go(f.main_menu)
 
-                if top_values:
-                    key = top_values[0].get("key of search", "unknown")
-                    print(f"→ {num}. {Fore.LIGHTYELLOW_EX + 'Find a film where'} {Fore.CYAN + key} {Fore.LIGHTYELLOW_EX + 'is'} {Fore.CYAN + value}")
-                    num += 1
-                else:
-                    print(f"→ Find a film where {key} has unknown value")
+            self.print_top_queries(limit, self.top_queries_data(limit))
+            return go(f.main_menu)
 
-            return f.main_menu()
+        from SearchService import search_client
+        if search_client is not None:
+            try:
+                self.print_top_queries(limit, search_client.history(limit))
+                return go(f.main_menu)
+            except (OSError, RuntimeError) as e:
+                print(Fore.RED + f"The search service can't show the history: {e}")
 
         print(Fore.RED + "There is an issue with the MongoDB connection, we can't show you the most popular queries!")
-        return f.main_menu()
+        return go(f.main_menu)
+
 
+    @staticmethod
+    def print_top_queries(limit, top_values: list[dict]) -> None:
+        print()
+        print(Fore.LIGHTYELLOW_EX + f"Top {limit} most popular queries:")
+        for num, item in enumerate(top_values, start=1):
+            print(f"→ {num}. {Fore.LIGHTYELLOW_EX + 'Find a film where'} {Fore.CYAN + str(item['key'])} {Fore.LIGHTYELLOW_EX + 'is'} {Fore.CYAN + str(item['value'])}")
 
-    def execute_last_query(self) -> None:
+    def execute_last_query(self) -> Transition:
         """
             Executes the most recent SQL query saved in a local text file.
 
@@ -311,11 +562,18 @@ You can work without it, or you can solve the issue and rerun the script.""")
 
         """
         from SQL_functions import executor_sql
-        from CONFIG_AND_MODULES import main_table
+        from CONFIG_AND_MODULES import main_table, table_for_actors
+        self.flush() #the last search may still be in the queue
         with open(self.last_query_filetxt_path, "r",encoding="utf-8", newline='') as file:
             text = file.read()
             your_last_query = text
-            full_query = f"{main_table} {text} \n"
+            #searches read the film summary table directly, only the CTE based ones need their CTE back
+            if "actors_table" in text:
+                full_query = f"{table_for_actors} {text} \n"
+            elif "main_table" in text:
+                full_query = f"{main_table} {text} \n"
+            else:
+                full_query = f"{text} \n"
             print(Fore.GREEN + "Your last query is: ", end="\n\n")
             f.print_slowly(your_last_query, Fore.LIGHTBLUE_EX, delay=0.01, end="\n\n")
 
@@ -325,10 +583,9 @@ You can work without it, or you can solve the issue and rerun the script.""")
                     print(Fore.LIGHTRED_EX + f"Invalid choice: {choice} or no option selected (x_x)")
                     continue
                 elif choice == "1":
-                    executor_sql(full_query, need_to_log=False)
-                    return f.main_menu()
+                    return executor_sql(full_query, need_to_log=False)
                 elif choice == "0":
-                    return f.main_menu()
+                    return go(f.main_menu)
 
 
 
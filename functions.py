@@ -2,11 +2,14 @@ import sys
 import time
 
 from colorama import Fore, init
-init(autoreset=True)
-
 
 import CONFIG_AND_MODULES as config
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+from Render import renderer
+from Navigator import Transition, go
 from QueryLogger import myLogger
+from Startup import startup, start_background
 
 
 
@@ -22,23 +25,26 @@ def print_slowly(text: str,
         :param color: (str) ANSI color code string (e.g., Fore.GREEN).
         :param delay: (float, optional) Delay between printing each character in seconds
         :param end:  for the regulation of the basic "end" in print()
+
+    The actual writing is done by the render backend chosen with RENDER_MODE (see Render.py):
+    animated - character by character, instant - at once, plain - at once and without colors.
     """
-    for char in text:
-        sys.stdout.write(color + char)
-        sys.stdout.flush()
-        time.sleep(delay)
-    print(end=end)
+    renderer.write(text, color, delay=delay, end=end)
 
 
-def main():
+def main() -> Transition:
     """
     Initializes the session by recording the start time in the global variable `begin`,
     prints welcome messages then calls and returns the main menu function.
     """
     from User_LOG_IN import create_account, login_account
+    start_background() #MySQL and MongoDB connect in the background while the welcome screen is rendering
     print()
     global begin
     begin = time.perf_counter()
+    if config.TITLE_INDEX and config.TITLE_INDEX_PRELOAD and not config.SEARCH_SERVICE:
+        from TitleIndex import title_index
+        title_index.preload()
     print_slowly(f"""
     Welcome to ICH!
     My name is {config.DB_CONFIG_READ['database']}!
@@ -50,6 +56,7 @@ def main():
     """, Fore.CYAN, delay=0.016)
     print_slowly("\t(￣▽￣)ノ", Fore.LIGHTYELLOW_EX, delay=0.015)
     print()
+    startup.first_prompt()
     while True:
         choice = input(Fore.GREEN + "Choose an option: ").strip()
         print()
@@ -59,20 +66,22 @@ def main():
             continue
 
         if choice == "1":
-            return create_account()
+            return go(create_account)
         elif choice == "2":
-            return login_account()
+            return go(login_account)
         elif choice == "3":
-            return exit_program()
+            return go(exit_program)
 
 
-def main_menu() -> None:
+def main_menu() -> Transition:
     """
     Show main menu, get user input, and call related functions.
     Returns result of called function or None.
 
     Repeats menu on invalid input.
     """
+    startup.wait("query_log") #the options below need the search history
+    startup.wait("film_summary") #and the searches the film summary (or the fallback to the base tables)
     print(Fore.WHITE + "=" * 120, end='')
     # ===================MENU========================================
     print(Fore.GREEN + "\nMain Menu:")
@@ -81,21 +90,22 @@ def main_menu() -> None:
     print_slowly("3. Show me previous query", Fore.LIGHTCYAN_EX, delay=0.01)
     print_slowly("4. Show me TOP N queries", Fore.LIGHTCYAN_EX, delay=0.01)
     print_slowly("5. Delete the entire history of search", Fore.LIGHTCYAN_EX, delay=0.01)
-    print_slowly("6. EXIT", Fore.LIGHTCYAN_EX, delay=0.01)
+    print_slowly("6. Show statistics (timings, caches)", Fore.LIGHTCYAN_EX, delay=0.01)
+    print_slowly("7. EXIT", Fore.LIGHTCYAN_EX, delay=0.01)
     # ===================================================================
     while True:
         option = input(Fore.LIGHTGREEN_EX + "Enter your choice: ").strip()
 
-        if option not in ("1", "2", "3", "4", "5", "6"):
+        if option not in ("1", "2", "3", "4", "5", "6", "7"):
             print(Fore.LIGHTRED_EX + f"Invalid choice: {option} or no option selected (x_x)")
             continue
 
         elif option == "1":
-            return who_are_you_answer()
+            return go(who_are_you_answer)
         elif option == "2":
-            return lets_begin()
+            return go(lets_begin)
         elif option == "3":
-            return myLogger.execute_last_query()
+            return go(myLogger.execute_last_query)
 
         elif option == "4":
             while True:
@@ -106,7 +116,7 @@ def main_menu() -> None:
                         print(Fore.LIGHTRED_EX + "The input should be greater than 0 (x_x)")
                         continue
 
-                    return myLogger.top_queries(top_n)
+                    return go(myLogger.top_queries, top_n)
 
                 except ValueError:
                     print(Fore.LIGHTRED_EX + f"Invalid choice: it should be a number (x_x)")
@@ -114,12 +124,14 @@ def main_menu() -> None:
                     print(Fore.LIGHTRED_EX + f"Invalid choice: {e} (x_x)")
 
         elif option == "5":
-            return delete_history_of_search()
+            return go(delete_history_of_search)
         elif option == "6":
-            return exit_program()
+            return go(show_stats)
+        elif option == "7":
+            return go(exit_program)
 
 
-def who_are_you_answer() -> None:
+def who_are_you_answer() -> Transition:
     """
         Display the 'who are you' answer  and show options menu.
         Calls functions based on user input.
@@ -147,11 +159,11 @@ def who_are_you_answer() -> None:
             continue
 
         elif option == "1":
-            return lets_begin()
+            return go(lets_begin)
         elif option == "2":
-            return main_menu()
+            return go(main_menu)
         elif option == "3":
-            return exit_program()
+            return go(exit_program)
 
 answer_who_are_you_str = f"""
        My name is {config.DB_CONFIG_READ['database']}
@@ -166,7 +178,7 @@ answer_who_are_you_str = f"""
        Besides, everything you send me is logged and I can show you the previous queries"""
 
 
-def lets_begin() -> None:
+def lets_begin() -> Transition:
     """
     Display film search options menu and call functions based on user choice.
     Repeats menu on invalid input.
@@ -179,33 +191,36 @@ def lets_begin() -> None:
     print_slowly("3. Find a film by actors?",Fore.LIGHTCYAN_EX,delay=0.005)
     print_slowly("4. Find a film by genre?",Fore.LIGHTCYAN_EX,delay=0.005)
     print_slowly("5. Find a film by genre and year?", Fore.LIGHTCYAN_EX, delay=0.005)
-    print_slowly("6. BACK TO MENU",Fore.LIGHTCYAN_EX,delay=0.005)
-    print_slowly("7. EXIT",Fore.LIGHTCYAN_EX,delay=0.005)
+    print_slowly("6. Combine title, actor, genre and year?", Fore.LIGHTCYAN_EX, delay=0.005)
+    print_slowly("7. BACK TO MENU",Fore.LIGHTCYAN_EX,delay=0.005)
+    print_slowly("8. EXIT",Fore.LIGHTCYAN_EX,delay=0.005)
     # ===================================================================
     while True:
         option = input(Fore.LIGHTGREEN_EX + "Enter your choice: ").strip()
 
-        if option not in ("1", "2", "3", "4", "5", "6", "7"):
+        if option not in ("1", "2", "3", "4", "5", "6", "7", "8"):
             print(Fore.LIGHTRED_EX + f"Invalid choice: {option} or no option selected (x_x)")
             continue
 
         elif option == "1":
-            return find_by_title()
+            return go(find_by_title)
         elif option == "2":
-            return find_by_years()
+            return go(find_by_years)
         elif option == "3":
-            return find_by_actor()
+            return go(find_by_actor)
         elif option == "4":
-            return find_by_genre()
+            return go(find_by_genre)
         elif option == "5":
-            return find_genre_year()
+            return go(find_genre_year)
         elif option == "6":
-            return main_menu()
+            return go(find_composite)
         elif option == "7":
-            return exit_program()
+            return go(main_menu)
+        elif option == "8":
+            return go(exit_program)
 
 
-def find_by_title() -> None:
+def find_by_title() -> Transition:
     """
     Prompt user to enter a film title (or part of it) or choose an option.
     Calls relevant functions based on input.
@@ -238,14 +253,14 @@ def find_by_title() -> None:
                     continue
 
                 elif clarification == "1":
-                    return commands[option]["func"]()
+                    return go(commands[option]["func"])
                 elif clarification == "2":
-                    return where_search_title(option)
+                    return go(where_search_title, option)
 
-        return where_search_title(option)
+        return go(where_search_title, option)
 
 
-def find_by_years(return_year_only:bool=False) -> None:
+def find_by_years(return_year_only:bool=False) -> Transition:
     """
     User chooses to search films by year or range.
 
@@ -270,19 +285,19 @@ def find_by_years(return_year_only:bool=False) -> None:
             print(Fore.LIGHTRED_EX + f"Invalid choice: {option} or no option selected (x_x)")
             continue
         elif option == "r":
-            return find_year_range(return_year_only=return_year_only)
+            return go(find_year_range, return_year_only=return_year_only)
         elif option == "y":
-            return find_specific_year(return_year_only=return_year_only)
+            return go(find_specific_year, return_year_only=return_year_only)
         elif option == "1":
-            return main_menu()
+            return go(main_menu)
         elif option == "2":
-            return lets_begin()
+            return go(lets_begin)
         elif option == "3":
-            return exit_program()
+            return go(exit_program)
 
 
 
-def find_year_range(return_year_only:bool=False) -> None | int:
+def find_year_range(return_year_only:bool=False) -> Transition | tuple[int, int]:
     """
          Prompt the user to enter a valid film year.
 
@@ -310,14 +325,15 @@ def find_year_range(return_year_only:bool=False) -> None | int:
 
             year_1 = int(year_1_input)
             year_2 = int(year_2_input)
+            lowest, highest = min_year(), max_year() #served by the catalog metadata cache
 
-            if year_1 < min_year() or year_2 > max_year():
-                raise ValueError(Fore.LIGHTRED_EX + f"The year must be between {min_year()} and {max_year()}!")
+            if year_1 < lowest or year_2 > highest:
+                raise ValueError(Fore.LIGHTRED_EX + f"The year must be between {lowest} and {highest}!")
 
             if year_1 >= year_2:
                 raise ValueError(Fore.LIGHTRED_EX + "Second year must be greater than the first!")
 
-            return where_search_range_year(year_1, year_2) if not return_year_only else (year_1, year_2)
+            return go(where_search_range_year, year_1, year_2) if not return_year_only else (year_1, year_2)
 
         except ValueError as e:
             print(e)
@@ -325,7 +341,7 @@ def find_year_range(return_year_only:bool=False) -> None | int:
             print(e)
 
 
-def find_specific_year(return_year_only:bool=False) -> None | int:
+def find_specific_year(return_year_only:bool=False) -> Transition | int:
     """
      Prompt the user to enter a valid film year.
 
@@ -351,18 +367,19 @@ def find_specific_year(return_year_only:bool=False) -> None | int:
                 raise ValueError(Fore.LIGHTRED_EX + "Only digits are allowed!")
 
             year = int(year_input)
+            lowest, highest = min_year(), max_year() #served by the catalog metadata cache
 
-            if year not in range(min_year(), max_year() + 1):
-                raise ValueError(Fore.LIGHTRED_EX + f"The year must be between {min_year()} and {max_year()}!")
+            if year not in range(lowest, highest + 1):
+                raise ValueError(Fore.LIGHTRED_EX + f"The year must be between {lowest} and {highest}!")
 
-            return where_search_specific_year(year) if not return_year_only else year
+            return go(where_search_specific_year, year) if not return_year_only else year
         except ValueError as e:
             print(e)
         except Exception as e:
             print(e)
 
 
-def find_genre_year():
+def find_genre_year() -> Transition:
     """
      Lets the user pick a genre and then choose a year or range of years to find films.
 
@@ -405,21 +422,84 @@ def find_genre_year():
                     continue
                 elif option == "r":
                     year_1, year_2 = find_year_range(return_year_only=True)
-                    return where_genre_year(choice, year_1, year_2)
+                    return go(where_genre_year, choice, year_1, year_2)
                 elif option == "y":
                     year = find_specific_year(return_year_only=True)
-                    return where_genre_year(choice, year)
+                    return go(where_genre_year, choice, year)
 
         #choices bellow work only while you are choosing a genre
         elif option == "m":
-            return main_menu()
+            return go(main_menu)
         elif option == "s":
-            return lets_begin()
+            return go(lets_begin)
         elif option == "e":
-            return exit_program()
+            return go(exit_program)
 
 
-def find_by_actor() -> None:
+def find_composite() -> Transition:
+    """
+     Combines the filters in one search: a genre, a title fragment, the beginning of an actor's name
+     and a year or a range of years. Enter skips a filter, at least one is needed.
+
+     Steps:
+     - Shows all available genres, the user picks one by number or presses Enter for any genre.
+     - Asks for the title fragment and the actor's name.
+     - Asks for a year (2006) or a range (2005-2007) within the bounds of the catalog.
+     - Supports special commands(but only on the stage of genre choosing)
+         * 'm' to go back to main menu,
+         * 's' to go back to film search menu,
+         * 'e' to exit the program.
+    """
+    from SQL_functions import min_year, max_year
+    from SQL_functions import show_all_genres, where_composite
+    print()
+    print(Fore.GREEN + "Combine as many filters as you want, press Enter to skip one!")
+    genres = show_all_genres()
+    while True:
+        option = input(Fore.GREEN + "Which genre do you want to see? (Enter - any genre) ").strip()
+        if option and option not in genres and option not in ("m", "s", "e"):
+            print(Fore.LIGHTRED_EX + f"Invalid choice: {option} (x_x)")
+            continue
+        break
+
+    #choices bellow work only while you are choosing a genre
+    if option == "m":
+        return go(main_menu)
+    elif option == "s":
+        return go(lets_begin)
+    elif option == "e":
+        return go(exit_program)
+    genre = genres[option] if option else None
+
+    title = input(Fore.GREEN + "Give me a title or part of it (Enter - any title): ").strip() or None
+    actor = input(Fore.GREEN + "Give me the beginning of an actor's name (Enter - any actor): ").strip() or None
+
+    lowest, highest = min_year(), max_year() #served by the catalog metadata cache
+    print(Fore.LIGHTRED_EX + f"Remember, that year must be between {lowest} and {highest}")
+    while True:
+        years = input(Fore.GREEN + "Give me a year (2006) or a range (2005-2007) (Enter - any year): ").replace(" ", "").split("-")
+        if years == [""]:
+            year_1 = year_2 = None
+            break
+        if len(years) > 2 or not all(year.isdigit() for year in years):
+            print(Fore.LIGHTRED_EX + "Only digits are allowed, a range is two years with '-' between them!")
+            continue
+        year_1, year_2 = int(years[0]), int(years[1]) if len(years) == 2 else None
+        if year_1 < lowest or (year_2 or year_1) > highest:
+            print(Fore.LIGHTRED_EX + f"The year must be between {lowest} and {highest}!")
+            continue
+        if year_2 is not None and year_1 >= year_2:
+            print(Fore.LIGHTRED_EX + "Second year must be greater than the first!")
+            continue
+        break
+
+    if not (genre or title or actor or year_1):
+        print(Fore.LIGHTRED_EX + "No filter chosen! (x_x)")
+        return go(find_composite)
+    return go(where_composite, title, actor, genre, year_1, year_2)
+
+
+def find_by_actor() -> Transition:
     """
     Asks user for actor's name (or part of it) to search films.
 
@@ -448,16 +528,16 @@ def find_by_actor() -> None:
             continue
 
         if name == "1":
-            return main_menu()
+            return go(main_menu)
         elif name == "2":
-            return lets_begin()
+            return go(lets_begin)
         elif name == "3":
-            return exit_program()
+            return go(exit_program)
 
-        return where_like_actor(name)
+        return go(where_like_actor, name)
 
 
-def find_by_genre() -> None:
+def find_by_genre() -> Transition:
     """
        Shows all available genres using SQL.show_all_genres().
        And  show_all_genres() is also responsible for searching
@@ -465,10 +545,10 @@ def find_by_genre() -> None:
     from SQL_functions import where_genre
     print()
     print(Fore.GREEN + "Here are all genres which you can find:")
-    return where_genre()
+    return go(where_genre)
 
 
-def delete_history_of_search() -> None:
+def delete_history_of_search() -> Transition:
     """
      Asks user for confirmation to delete search history.
 
@@ -487,12 +567,88 @@ def delete_history_of_search() -> None:
 
             elif choice == "1":
                 print_slowly("The history of the search has been deleted.", Fore.RED, delay=0.01)
-                myLogger.clean_history_of_search()
+                return myLogger.clean_history_of_search()
             elif choice == "0":
-                return main_menu()
+                return go(main_menu)
 
         print(Fore.RED + "There is an issue with MongoDB connection. You don't have access to the history!")
-        return main_menu()
+        return go(main_menu)
+
+
+def _print_stats_line(name: str, stats: dict) -> None:
+    print(Fore.LIGHTYELLOW_EX + f"{name:<16}" + Fore.CYAN + ", ".join(f"{key}: {value}" for key, value in stats.items()))
+
+
+def show_stats() -> Transition:
+    """
+    Shows where the time of the searches goes (per stage: count, avg, p50, p95, max),
+    the counters and how well the caches work (hits, misses, evictions, memory).
+    Lets the user clear the search result cache or write the metrics file (Prometheus text format).
+    """
+    from ResultCache import result_cache
+    from CatalogMetadata import catalog_metadata
+    from ColumnarCatalog import columnar_catalog
+    from Metrics import metrics, Histogram
+
+    print(Fore.WHITE + "=" * 120, end='')
+    print(Fore.GREEN + "\nTimings (ms):")
+    for metric in metrics.all():
+        for labels, values in sorted(metric.snapshot().items()):
+            name = ", ".join(str(value) for _, value in labels) or metric.name
+            if isinstance(metric, Histogram):
+                _print_stats_line(name, {"count": values["count"],
+                                         **{key: f"{values[key] * 1000:.2f}" for key in ("avg", "p50", "p95", "max")}})
+            else:
+                _print_stats_line(f"{metric.name} {name}" if labels else name,
+                                  {"count" if metric.kind == "counter" else "value": f"{values:g}"})
+
+    stats = result_cache.stats()
+    print(Fore.GREEN + "\nCache statistics:")
+    _print_stats_line("Search results:", {
+        "entries": f"{stats['entries']}/{stats['max_entries']}",
+        "memory": f"{stats['bytes'] / 1024:.1f}/{stats['max_bytes'] / 1024:.0f} KiB",
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit rate": f"{stats['hit_rate']:.0%}",
+        "expired": stats["expirations"],
+        "evicted": stats["evictions"],
+        "ttl": f"{stats['ttl']:.0f} s",
+    })
+    _print_stats_line("Catalog:", catalog_metadata.stats())
+    _print_stats_line("Columnar catalog:", columnar_catalog.stats())
+    if not config.RESULT_CACHE:
+        print(Fore.RED + "The search result cache is switched off (RESULT_CACHE=0).")
+
+    print_slowly("\n1. Clear the search result cache", Fore.LIGHTCYAN_EX, delay=0.01)
+    print_slowly(f"2. Write the metrics to {config.METRICS_FILE}", Fore.LIGHTCYAN_EX, delay=0.01)
+    print_slowly("0. Back to the main menu", Fore.LIGHTCYAN_EX, delay=0.01)
+    while True:
+        choice = input(Fore.LIGHTGREEN_EX + "Enter your choice: ").strip()
+        if choice not in ("1", "2", "0"):
+            print(Fore.LIGHTRED_EX + f"Invalid choice: {choice} or no option selected (x_x)")
+            continue
+        if choice == "1":
+            result_cache.invalidate()
+            catalog_metadata.invalidate()
+            from TitleIndex import title_index
+            title_index.invalidate() #rebuilt in the background on the next title search
+            print(Fore.RED + "The cache has been cleared.")
+        elif choice == "2":
+            try:
+                print(Fore.GREEN + f"The metrics have been written to {metrics.dump()}")
+            except OSError as e:
+                print(Fore.RED + f"Error while writing the metrics: {e}")
+        return go(main_menu)
+
+
+def _dump_metrics() -> None:
+    """The last snapshot of the session for a Prometheus textfile collector, if METRICS_FILE is set."""
+    from Metrics import metrics
+    if config.METRICS_FILE:
+        try:
+            metrics.dump()
+        except OSError as e:
+            print(Fore.RED + f"Error while writing the metrics: {e}")
 
 
 def exit_program() -> None:
@@ -502,6 +658,8 @@ def exit_program() -> None:
     Then exit the program.
     """
     from User_LOG_IN import userStorage
+    from ConnectionPool import read_pool
+    from SlowQueryLog import slow_query_log
     session_duration = time.perf_counter() - begin
     minutes = int(session_duration // 60)
     seconds = session_duration % 60
@@ -516,7 +674,12 @@ def exit_program() -> None:
     print(Fore.WHITE + "=" * 120, end='')
     print_slowly(text, Fore.CYAN, delay=0.009)
 
+    startup.wait("query_log") #exit right from the welcome screen: let the logger finish its setup first
+    slow_query_log.flush() #the slow queries still being explained need the read pool
     userStorage.close_connection()
+    read_pool.close_all()
+    myLogger.stop_log_writer() #writes the searches still waiting in the queue
+    _dump_metrics()
     myLogger.clean_state_collection_before_exit()
 
     print_slowly("\t(￢‿￢)", Fore.LIGHTYELLOW_EX, delay=0.015)
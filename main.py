@@ -8,13 +8,14 @@
 # - you got connection to mongo, needed for logging queries                                                                  #
 # - you can reach sakila db (sql for reading movies etc)                                                                     #
 # - in file QueryLogger.py line 19, dont forget to change path to last_query.txt (or it wont save last query)                #
+# - the film summary is built at the first start if it is missing (python FilmSummary.py refresh after catalog changes)      #
 #                                                                                                                            #
 # ⚠️ WARNINGs:                                                                                                               #
 # - if mongo or last_query.txt not setup – program still gonna work                                                          #
 # - if sakila not availble – u can still run the program, but film search won't work                                         #
 #                                                                                                                            #
 # BUT❗                                                                                                                      #
-# - if SQL ich-edit is not reachable – program will crash instantly                                                          #
+# - if SQL ich-edit is not reachable – program will stop at the first login                                                  #
 #   since login depends on username & pass from that DB                                                                      #
 #                                                                                                                            #
 #   P.S. all those settings (DB logins, hosts, etc) are controlled in the .env file – so just check there if smth broken     #
@@ -23,10 +24,12 @@
 #============================================================================================================================#
 
 
+import Startup #the first import: the clock of the time to the first prompt starts here
 from functions import main
+from Navigator import run
 
 if __name__ == "__main__":
-    main()
+    run(main) #every menu returns the next one, run() shows them one after another
 
 
 
@@ -0,0 +1,150 @@
+#============================================================================================================================#
+#                         Bulk provisioning: many accounts from a file or stdin, no create_account prompts                   #
+#                                                                                                                            #
+#   python provision.py team.csv                                     - skips the usernames which already exist               #
+#   cat team.jsonl | python provision.py --on-duplicate update       - resets the passwords of the existing ones             #
+#                                                                                                                            #
+#   One account per row (CSV with a username,password header) or per line (JSONL):                                           #
+#       {"username": "analyst_0001", "password": "..."}                                                                      #
+#                                                                                                                            #
+#   The same rules as create_account (5+ characters each), the rejected rows can be written to --rejects (JSONL).            #
+#   Passwords are hashed in parallel threads and stored like LoginService does it.                                           #
+#   Hashing is the slow part: PASSWORD_HASH_ITERATIONS (600 000 PBKDF2 rounds by default) costs about 0.3-0.5 s              #
+#   per account on one core. For a big import, --iterations 100000 is several times faster and still safe to use:            #
+#   LoginService re-hashes every account with fewer rounds on its first successful login.                                    #
+#============================================================================================================================#
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, TextIO
+
+from colorama import Fore, init
+
+import CONFIG_AND_MODULES as config
+from UserStorage import PASSWORD_LENGTH, USERNAME_LENGTH, UserStorage
+from LoginService import hash_length, hash_password
+
+init(autoreset=True, strip=config.STRIP_COLORS)
+
+
+def read_accounts(source: TextIO, input_format: str) -> Iterator[dict]:
+    if input_format == "csv":
+        yield from csv.DictReader(source)
+        return
+    for number, line in enumerate(source, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {"error": f"line {number}: {e}"}
+
+
+def rejection(account: dict) -> str | None:
+    """Why the account can't be created, or None."""
+    if "error" in account:
+        return account["error"]
+    username = str(account.get("username") or "").strip()
+    password = str(account.get("password") or "").strip()
+    if len(username) < 5:
+        return "the username is too short (5 characters minimum)"
+    if len(username) > USERNAME_LENGTH:
+        return f"the username is too long ({USERNAME_LENGTH} characters maximum)"
+    if len(password) < 5:
+        return "the password is too short (5 characters minimum)"
+    return None
+
+
+def chunks(accounts: Iterator[dict], size: int, rejected: list[dict],
+           iterations: int = config.PASSWORD_HASH_ITERATIONS) -> Iterator[list[tuple[str, str]]]:
+    """
+    Valid (username, password) pairs in chunks of `size`, the invalid accounts go to `rejected`.
+    Everything is checked against the columns here, the inserts never have to truncate a value.
+    """
+    if hash_length(iterations) > PASSWORD_LENGTH: #the same length for every password, so no account fits
+        raise ValueError(f"the hashes of {iterations} rounds don't fit the password column ({PASSWORD_LENGTH} characters)")
+    chunk = []
+    for account in accounts:
+        reason = rejection(account)
+        if reason:
+            rejected.append({"username": account.get("username"), "reason": reason})
+            continue
+        chunk.append((str(account["username"]).strip(), str(account["password"]).strip()))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create many user accounts at once.")
+    parser.add_argument("input", nargs="?", help="CSV or JSONL file with username and password (default: stdin)")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"), help="default: by the file extension, jsonl for stdin")
+    parser.add_argument("--on-duplicate", choices=("ignore", "update"), default="ignore",
+                        help="existing usernames: keep them (ignore) or set the new password (update)")
+    parser.add_argument("--chunk", type=int, default=1000, help="accounts per executemany / transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="threads hashing the passwords")
+    parser.add_argument("--iterations", type=int, default=config.PASSWORD_HASH_ITERATIONS,
+                        help=f"PBKDF2 rounds (default {config.PASSWORD_HASH_ITERATIONS}: slow, see the header of this file)")
+    parser.add_argument("--rejects", help="write the rejected rows (JSONL) to this file")
+    args = parser.parse_args()
+    if args.iterations < 1 or hash_length(args.iterations) > PASSWORD_LENGTH:
+        parser.error(f"--iterations must be a positive number whose hashes fit {PASSWORD_LENGTH} characters")
+
+    input_format = args.input_format or ("csv" if args.input and args.input.endswith(".csv") else "jsonl")
+    source = open(args.input, encoding="utf-8", newline="") if args.input else sys.stdin
+
+    storage = UserStorage()
+    storage.create_connection(spinner=False)
+    storage.create_database(os.getenv("DB_DATABASE_WRITE"))
+    storage.create_table(os.getenv("DB_TABLE_WRITE"))
+
+    print(Fore.CYAN + f"Hashing with {args.iterations} PBKDF2 rounds on {args.workers} threads", file=sys.stderr)
+    start = time.perf_counter()
+    inserted = duplicates = failed = 0
+    rejected = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as hashers:
+            for chunk in chunks(read_accounts(source, input_format), args.chunk, rejected, args.iterations):
+                hashes = hashers.map(lambda password: hash_password(password, args.iterations),
+                                     [password for _, password in chunk])
+                users = [(username, password_hash) for (username, _), password_hash in zip(chunk, hashes)]
+                try:
+                    added, existing = storage.add_users(users, on_duplicate=args.on_duplicate)
+                except Exception as e: #the whole chunk was rolled back, the next one is tried anyway
+                    failed += len(users)
+                    rejected.extend({"username": username, "reason": f"chunk failed: {e}"} for username, _ in users)
+                    continue
+                inserted += added
+                duplicates += existing
+                print(Fore.CYAN + f"{inserted + duplicates} accounts written...", file=sys.stderr)
+    finally:
+        storage.pool.close_all()
+        if args.input:
+            source.close()
+
+    if args.rejects and rejected:
+        with open(args.rejects, "w", encoding="utf-8") as file:
+            for row in rejected:
+                file.write(json.dumps(row, default=str) + "\n")
+
+    elapsed = time.perf_counter() - start
+    written = inserted + duplicates
+    duplicates_label = "updated" if args.on_duplicate == "update" else "already existed"
+    print(Fore.GREEN + f"{inserted} created, {duplicates} {duplicates_label}, {len(rejected)} rejected "
+                       f"({failed} in failed chunks) in {elapsed:.2f} s "
+                       f"({written / elapsed if elapsed else 0:.0f} accounts/s)", file=sys.stderr)
+    for row in rejected[:10]:
+        print(Fore.RED + f"  rejected {row['username']!r}: {row['reason']}", file=sys.stderr)
+    if len(rejected) > 10:
+        print(Fore.RED + f"  ... and {len(rejected) - 10} more" + (f", see {args.rejects}" if args.rejects else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
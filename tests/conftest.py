@@ -0,0 +1,68 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# the modules of the project are flat files in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self._rows = ()
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.pool.queries.append((query, params))
+        self._rows = tuple(self.pool.answer(query, params) or ())
+        self.rowcount = len(self._rows)
+        return self.rowcount
+
+    def executemany(self, query, rows):
+        for params in rows:
+            self.execute(query, params)
+        return len(rows)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.open = True
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self.pool)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakePool:
+    """Stands in for ConnectionPool: `answer(query, params)` returns the rows of every statement."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self)
+
+
+@pytest.fixture
+def fake_pool():
+    return FakePool
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from ActorIndex import ActorIndex
+
+T0 = datetime(2006, 2, 15, 4, 34)
+T1 = datetime(2006, 2, 16, 10, 0)
+
+
+class Sakila:
+    """The actor / film_actor tables the fake pool answers from."""
+
+    def __init__(self):
+        self.actors = {1: ("PENELOPE", "GUINESS", T0), 2: ("NICK", "WAHLBERG", T0), 3: ("PENELOPE", "CRONYN", T0)}
+        self.links = {(1, 1): T0, (1, 23): T0, (2, 3): T0, (3, 7): T0}
+
+    def __call__(self, query, params):
+        if query.startswith("SELECT actor_id, first_name, last_name, last_update FROM actor"):
+            since = (params or {}).get("since", datetime.min)
+            return [(actor_id, first, last, update) for actor_id, (first, last, update) in self.actors.items()
+                    if update >= since]
+        if query.startswith("SELECT actor_id, film_id, last_update FROM film_actor"):
+            return sorted((actor_id, film_id, update) for (actor_id, film_id), update in self.links.items())
+        if query.startswith("SELECT DISTINCT actor_id, last_update FROM film_actor"):
+            return sorted({(actor_id, update) for (actor_id, _), update in self.links.items() if update >= params["since"]})
+        if query.startswith("SELECT actor_id FROM actor"):
+            return [(actor_id,) for actor_id in self.actors]
+        if query.startswith("SELECT actor_id, film_id FROM film_actor WHERE actor_id IN"):
+            return sorted(key for key in self.links if key[0] in params["ids"])
+        raise AssertionError(query)
+
+
+def test_prefix_lookup_ignores_the_case(fake_pool):
+    index = ActorIndex(fake_pool(Sakila()))
+    assert sorted(index.actors_with_prefix("penelope")) == [1, 3]
+    assert index.actors_with_prefix("PENELOPE G") == [1]
+    assert index.actors_with_prefix("Zero") == []
+
+
+def test_films_for_prefix_merges_the_films_of_all_matched_actors(fake_pool):
+    index = ActorIndex(fake_pool(Sakila()))
+    actor_ids, film_ids = index.films_for_prefix("Penelope")
+    assert sorted(actor_ids) == [1, 3]
+    assert film_ids == [1, 7, 23]
+
+
+def test_refresh_applies_only_the_changes(fake_pool):
+    sakila = Sakila()
+    index = ActorIndex(fake_pool(sakila))
+    index.build()
+
+    sakila.actors[2] = ("NICOLAS", "WAHLBERG", T1) # renamed
+    del sakila.actors[3]                              # deleted
+    sakila.links[(1, 99)] = T1                        # new film
+    assert index.refresh() == 2
+
+    assert index.actors_with_prefix("nick") == []
+    assert index.actors_with_prefix("nicolas") == [2]
+    assert index.actors_with_prefix("penelope") == [1]
+    assert index.films_for_prefix("penelope guiness")[1] == [1, 23, 99]
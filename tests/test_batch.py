@@ -0,0 +1,30 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import functions # first, like main.py does: functions and QueryLogger import each other
+import batch
+
+
+def test_bad_lines_become_error_records():
+    source = io.StringIO('{"search": "year", "value": 2006}\n\n{"search": "genre", \n{"search": "actor", "value": "ED"}\n')
+    specs = list(batch.read_specs(source, "jsonl"))
+    assert specs[0] == {"search": "year", "value": 2006}
+    assert specs[1]["error"].startswith("line 3:")
+    assert specs[2] == {"search": "actor", "value": "ED"}
+
+
+def test_error_records_are_written_and_the_batch_goes_on(monkeypatch):
+    monkeypatch.setattr(batch, "run_spec", lambda spec: [])
+    specs = [{"search": "year", "value": 2006}, {"error": "line 2: Expecting value"}]
+    with ThreadPoolExecutor(max_workers=2) as workers:
+        results = list(batch.run_in_order(workers, specs, window=2))
+    assert results[0] == []
+    assert results[1] == [{"spec": 2, "search": None, "value": None, "year_from": None, "year_to": None,
+                           "error": "line 2: Expecting value"}]
+
+
+def test_results_keep_the_order_of_the_specs(monkeypatch):
+    monkeypatch.setattr(batch, "_records", lambda number, spec: [{"spec": number}])
+    with ThreadPoolExecutor(max_workers=3) as workers:
+        numbers = [records[0]["spec"] for records in batch.run_in_order(workers, ({} for _ in range(20)), window=4)]
+    assert numbers == list(range(1, 21))
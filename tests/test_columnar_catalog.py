@@ -0,0 +1,51 @@
+import CONFIG_AND_MODULES as config
+from ColumnarCatalog import ColumnarCatalog
+from SearchEngine import SearchEngine
+
+FILMS = [ # title, release_year, genre, actors - ordered by title, film_id like the build query
+    ("ACADEMY DINOSAUR", 2006, "Documentary", "PENELOPE GUINESS"),
+    ("ACE GOLDFINGER", 2005, "Horror", "BOB FAWCETT"),
+    ("ADAPTATION HOLES", 2006, "Documentary", None),
+    ("AFFAIR PREJUDICE", 2007, None, "JODIE DEGENERES"),
+    ("AGENT TRUMAN", 2005, "Foreign", "KIRSTEN PALTROW"),
+]
+
+
+def _catalog(fake_pool):
+    return ColumnarCatalog(pool=fake_pool(lambda query, params: FILMS), table="film_summary", max_age=300)
+
+
+def test_year_keeps_the_title_order(fake_pool):
+    rows = _catalog(fake_pool).year(2006)
+    assert [row[0] for row in rows] == ["ACADEMY DINOSAUR", "ADAPTATION HOLES"]
+    assert rows[1] == ("ADAPTATION HOLES", 2006, "Documentary", None)
+
+
+def test_year_range_orders_by_year_then_title(fake_pool):
+    rows = _catalog(fake_pool).year_range(2005, 2006)
+    assert [(row[1], row[0]) for row in rows] == [(2005, "ACE GOLDFINGER"), (2005, "AGENT TRUMAN"),
+                                                   (2006, "ACADEMY DINOSAUR"), (2006, "ADAPTATION HOLES")]
+
+
+def test_genre_ignores_the_case_and_unknown_genres_are_empty(fake_pool):
+    catalog = _catalog(fake_pool)
+    assert [row[0] for row in catalog.genre("documentary")] == ["ACADEMY DINOSAUR", "ADAPTATION HOLES"]
+    assert len(catalog.genre("Western")) == 0
+    assert catalog.genre_year("Foreign", 2005)[:] == (("AGENT TRUMAN", 2005, "Foreign", "KIRSTEN PALTROW"),)
+
+
+def test_the_snapshot_is_built_once(fake_pool):
+    catalog = _catalog(fake_pool)
+    catalog.year(2006)
+    catalog.genre("Horror")
+    assert len(catalog.pool.queries) == 1
+
+
+def test_interactive_engine_leaves_the_catalog_off_by_default(fake_pool):
+    catalog = _catalog(fake_pool)
+    engine = SearchEngine(columns=catalog, indexes=True, columnar=config.COLUMNAR_CATALOG == "1")
+    if config.COLUMNAR_CATALOG == "service":
+        assert engine.columnar("year", 2006) is None
+        assert catalog.pool.queries == [] # nothing loaded into memory
+    engine.use_columnar = True
+    assert len(engine.columnar("year", 2006)) == 2
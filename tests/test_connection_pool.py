@@ -0,0 +1,112 @@
+import threading
+
+import pymysql
+import pytest
+
+import ConnectionPool as connection_pool
+from ConnectionPool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.open = True
+        self.alive = True
+        self.on_ping = None
+
+    def ping(self, reconnect=False):
+        if self.on_ping:
+            self.on_ping()
+        if not self.alive:
+            raise pymysql.err.OperationalError("gone away")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    connections = []
+
+    def connect(**db_config):
+        connections.append(FakeConnection(len(connections)))
+        return connections[-1]
+
+    monkeypatch.setattr(connection_pool.pymysql, "connect", connect)
+    return connections
+
+
+def test_a_released_connection_is_reused(opened):
+    pool = ConnectionPool({}, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert (stats["created"], stats["reused"], stats["checkouts"], stats["in_use"], stats["idle"]) == (1, 1, 2, 0, 1)
+
+
+def test_a_dead_idle_connection_is_replaced(opened):
+    pool = ConnectionPool({}, max_size=1)
+    with pool.connection() as first:
+        pass
+    first.alive = False
+    with pool.connection() as second:
+        assert second is not first
+    assert not first.open
+    assert pool.stats()["failed_pings"] == 1
+    assert pool.stats()["created"] == 2
+
+
+def test_an_exception_closes_the_connection(opened):
+    pool = ConnectionPool({}, max_size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            raise RuntimeError("half-read result set")
+    assert not conn.open
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["in_use"] == 0
+
+
+def test_an_exhausted_pool_raises_after_the_timeout(opened):
+    pool = ConnectionPool({}, max_size=1, checkout_timeout=0.05)
+    conn = pool.acquire()
+    with pytest.raises(pymysql.err.OperationalError):
+        pool.acquire()
+    assert pool.stats()["waits"] >= 1
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_idle_connections_are_evicted(opened):
+    pool = ConnectionPool({}, max_size=1, idle_timeout=-1)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is not first
+    assert not first.open
+    assert pool.stats()["evicted_idle"] == 1
+
+
+def test_the_ping_runs_outside_the_lock(opened):
+    pool = ConnectionPool({}, max_size=2)
+    with pool.connection() as conn:
+        pass
+    lock_was_free = []
+
+    def try_the_lock_from_another_thread():
+        def probe():
+            if pool._lock.acquire(blocking=False):
+                lock_was_free.append(True)
+                pool._lock.release()
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+
+    conn.on_ping = try_the_lock_from_another_thread
+    with pool.connection():
+        pass
+    assert lock_was_free == [True]
@@ -0,0 +1,66 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+
+import CONFIG_AND_MODULES as config
+import Exporter
+from Exporter import FILM_COLUMNS, export, write_rows
+from LocalReplica import local_replica
+
+FILMS = [
+    ("ACADEMY DINOSAUR", 2006, "Documentary", "PENELOPE GUINESS"),
+    ("ACE GOLDFINGER", 2005, "Horror", None),
+]
+
+
+def test_csv_has_the_header_and_the_rows(tmp_path):
+    path = tmp_path / "films.csv"
+    assert write_rows(FILM_COLUMNS, iter(FILMS), str(path)) == 2
+    with open(path, encoding="utf-8", newline="") as file:
+        assert list(csv.reader(file)) == [FILM_COLUMNS,
+                                          ["ACADEMY DINOSAUR", "2006", "Documentary", "PENELOPE GUINESS"],
+                                          ["ACE GOLDFINGER", "2005", "Horror", ""]]
+    assert not (tmp_path / "films.csv.part").exists()
+
+
+def test_jsonl_has_one_object_per_row(tmp_path):
+    path = tmp_path / "out" / "films.jsonl" # the directory is created
+    write_rows(FILM_COLUMNS, iter(FILMS), str(path), "jsonl")
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[1]) == {"title": "ACE GOLDFINGER", "release_year": 2005, "genre": "Horror", "actors": None}
+
+
+def test_a_failed_export_keeps_the_old_file(tmp_path):
+    path = tmp_path / "films.csv"
+    path.write_text("old export\n", encoding="utf-8")
+
+    def rows():
+        yield FILMS[0]
+        raise ConnectionError("lost the server")
+
+    with pytest.raises(ConnectionError):
+        write_rows(FILM_COLUMNS, rows(), str(path))
+    assert path.read_text(encoding="utf-8") == "old export\n"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_unknown_format_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        write_rows(FILM_COLUMNS, iter(FILMS), str(tmp_path / "films.xml"), "xml")
+
+
+def test_export_reads_the_replica_when_the_searches_do(tmp_path, monkeypatch):
+    replica = sqlite3.connect(":memory:")
+    replica.execute("CREATE TABLE film (title TEXT, release_year INTEGER)")
+    replica.executemany("INSERT INTO film VALUES (?, ?)", [(title, year) for title, year, *_ in FILMS])
+    monkeypatch.setattr(config, "READ_FROM_REPLICA", "replica")
+    monkeypatch.setattr(local_replica, "available", lambda: True)
+    monkeypatch.setattr(local_replica, "_reader", lambda: replica)
+    monkeypatch.setattr(Exporter, "RowStream", None) # MySQL must not be touched
+
+    path = tmp_path / "films.csv"
+    count = export("SELECT title, release_year FROM film WHERE release_year = %(year)s", {"year": 2005}, str(path))
+    assert count == 1
+    assert path.read_text(encoding="utf-8").splitlines() == ["title,release_year", "ACE GOLDFINGER,2005"]
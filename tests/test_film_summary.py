@@ -0,0 +1,31 @@
+import pymysql
+
+import FilmSummary
+from FilmSummary import ensure_film_summary, fallback_source
+
+
+def _pool(fake_pool, exists):
+    return fake_pool(lambda query, params: [(1,)] if exists and "information_schema" in query else [])
+
+
+def test_existing_summary_is_used(fake_pool, monkeypatch):
+    monkeypatch.setattr(FilmSummary, "build_film_summary", lambda *args: 1 / 0) # must not be called
+    assert ensure_film_summary(_pool(fake_pool, True), None, "film_summary") == "film_summary"
+
+
+def test_missing_summary_is_built_with_the_ddl_pool(fake_pool, monkeypatch):
+    ddl_pool = object()
+    built = []
+    monkeypatch.setattr(FilmSummary, "build_film_summary", lambda pool, table: built.append((pool, table)) or 1000)
+    assert ensure_film_summary(_pool(fake_pool, False), ddl_pool, "film_summary") == "film_summary"
+    assert built == [(ddl_pool, "film_summary")]
+
+
+def test_summary_which_cant_be_built_falls_back_to_the_base_tables(fake_pool, monkeypatch):
+    def denied(pool, table):
+        raise pymysql.err.OperationalError(1142, "CREATE command denied to user 'reader'")
+
+    monkeypatch.setattr(FilmSummary, "build_film_summary", denied)
+    source = ensure_film_summary(_pool(fake_pool, False), None, "film_summary")
+    assert source == fallback_source("film_summary")
+    assert source.startswith("(") and source.endswith(") AS film_summary")
@@ -0,0 +1,59 @@
+import pytest
+
+from LazyResults import LazyResultSet
+
+ROWS = tuple((f"FILM {number:02}", 2006) for number in range(25))
+
+
+class Fetch:
+    """Answers the COUNT(*) and the LIMIT/OFFSET queries of a LazyResultSet from ROWS."""
+
+    def __init__(self):
+        self.queries = []
+        self.offsets = []
+
+    def __call__(self, query, params):
+        self.queries.append(query)
+        if query.startswith("SELECT COUNT(*)"):
+            return ((len(ROWS),),)
+        offset, limit = params["page_offset"], params["page_limit"]
+        self.offsets.append(offset)
+        return ROWS[offset:offset + limit]
+
+
+def test_len_runs_one_count():
+    fetch = Fetch()
+    results = LazyResultSet("SELECT title, release_year FROM film ORDER BY title;", {}, fetch, prefetch=0)
+    assert len(results) == 25
+    assert len(results) == 25
+    assert fetch.queries == ["SELECT COUNT(*) FROM (SELECT title, release_year FROM film ORDER BY title) AS counted_results"]
+
+
+def test_slices_fetch_exactly_the_page():
+    results = LazyResultSet("SELECT title, release_year FROM film ORDER BY title", {}, Fetch(), prefetch=0)
+    assert results[0:10] == ROWS[0:10]
+    assert results[20:30] == ROWS[20:25] # the short last page
+    assert results[30:40] == ()
+
+
+def test_the_next_page_is_prefetched():
+    fetch = Fetch()
+    results = LazyResultSet("SELECT title, release_year FROM film ORDER BY title", {}, fetch, prefetch=1)
+    results[0:10]
+    results._pages[(10, 20)].result()
+    assert results[10:20] == ROWS[10:20]
+    results._pages[(20, 25)].result()
+    assert sorted(fetch.offsets) == [0, 10, 20] # the second page was not fetched again
+    results.close()
+
+
+def test_rows_reads_everything_page_by_page():
+    results = LazyResultSet("SELECT title, release_year FROM film ORDER BY title", {}, Fetch(), prefetch=0)
+    assert tuple(results.rows(batch_size=10)) == ROWS
+    assert results._pages == {}
+
+
+def test_only_slices_are_supported():
+    results = LazyResultSet("SELECT title FROM film ORDER BY title", {}, Fetch(), prefetch=0)
+    with pytest.raises(TypeError):
+        results[0]
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+import LocalReplica
+from LocalReplica import _concat, translate
+
+
+@pytest.fixture
+def replica():
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("CONCAT", -1, _concat, deterministic=True)
+    conn.executescript("""
+        CREATE TABLE film (film_id INTEGER, title TEXT);
+        CREATE TABLE actor (actor_id INTEGER, first_name TEXT, last_name TEXT);
+        CREATE TABLE film_actor (film_id INTEGER, actor_id INTEGER);
+        INSERT INTO film VALUES (1, 'ACADEMY DINOSAUR'), (2, 'ACE GOLDFINGER'), (3, 'ADAPTATION HOLES');
+        INSERT INTO actor VALUES (10, 'PENELOPE', 'GUINESS'), (11, 'NICK', 'WAHLBERG'), (12, 'ED', 'CHASE');
+        INSERT INTO film_actor VALUES (1, 11), (1, 10), (1, 12), (2, 10);
+    """)
+    yield conn
+    conn.close()
+
+
+def test_scalar_params_become_named():
+    query, named = translate("SELECT * FROM film WHERE title = %(title)s AND film_id > %(id)s", {"title": "ACE", "id": 1})
+    assert query == "SELECT * FROM film WHERE title = :title AND film_id > :id"
+    assert named == {"title": "ACE", "id": 1}
+
+
+def test_tuple_params_expand_to_one_name_per_item(replica):
+    query, named = translate("SELECT film_id FROM film WHERE film_id IN %(ids)s ORDER BY film_id", {"ids": (1, 3)})
+    assert query == "SELECT film_id FROM film WHERE film_id IN (:ids_0, :ids_1) ORDER BY film_id"
+    assert named == {"ids_0": 1, "ids_1": 3}
+    assert replica.execute(query, named).fetchall() == [(1,), (3,)]
+
+
+def test_empty_in_list_matches_nothing(replica):
+    # SearchEngine sends (None,) for an empty id list: IN (NULL) is never true
+    query, named = translate("SELECT film_id FROM film WHERE film_id IN %(ids)s", {"ids": (None,)})
+    assert named == {"ids_0": None}
+    assert replica.execute(query, named).fetchall() == []
+
+
+ACTORS = """
+    SELECT
+        f.title, GROUP_CONCAT(CONCAT(a.first_name, ' ', a.last_name){order} SEPARATOR ', ') AS actors
+    FROM film f
+    JOIN film_actor fa ON fa.film_id = f.film_id
+    JOIN actor a ON a.actor_id = fa.actor_id
+    WHERE f.film_id = %(film_id)s
+    GROUP BY f.film_id, f.title
+"""
+
+
+def test_group_concat_without_order(replica):
+    query, named = translate(ACTORS.format(order=""), {"film_id": 1})
+    assert "group_concat(CONCAT(a.first_name, ' ', a.last_name), ', ')" in query
+    title, actors = replica.execute(query, named).fetchone()
+    assert title == "ACADEMY DINOSAUR"
+    assert sorted(actors.split(", ")) == ["ED CHASE", "NICK WAHLBERG", "PENELOPE GUINESS"]
+
+
+def test_group_concat_with_order(replica, monkeypatch):
+    monkeypatch.setattr(LocalReplica.sqlite3, "sqlite_version_info", (3, 44, 0))
+    query, _ = translate(ACTORS.format(order=" ORDER BY a.first_name, a.last_name"), {"film_id": 1})
+    assert "group_concat(CONCAT(a.first_name, ' ', a.last_name), ', ' ORDER BY a.first_name, a.last_name)" in query
+
+
+def test_group_concat_with_order_on_old_sqlite(replica, monkeypatch):
+    monkeypatch.setattr(LocalReplica.sqlite3, "sqlite_version_info", (3, 40, 0))
+    query, named = translate(ACTORS.format(order=" ORDER BY a.first_name, a.last_name"), {"film_id": 2})
+    assert "ORDER BY a.first_name" not in query # the order inside a group is dropped, the query still runs
+    assert replica.execute(query, named).fetchone() == ("ACE GOLDFINGER", "PENELOPE GUINESS")
@@ -0,0 +1,55 @@
+import functions # first, like main.py does: functions and QueryLogger import each other
+from LoginService import LoginService, hash_length, hash_password, verify_password
+from UserStorage import UserStorage
+
+ITERATIONS = 1000
+
+
+def _service(fake_pool, stored):
+    """A LoginService over one account (id 7, 'alice') whose password column holds `stored`."""
+    def answer(query, params):
+        if query.startswith("SELECT id, password") and params == ("alice", "alice"):
+            return [(7, stored)]
+        return []
+
+    storage = UserStorage()
+    storage.pool = fake_pool(answer)
+    storage.table = "users"
+    return LoginService(storage, ITERATIONS), storage.pool
+
+
+def test_hashes_are_salted_and_verified():
+    first, second = hash_password("secret", ITERATIONS), hash_password("secret", ITERATIONS)
+    assert first != second
+    assert len(first) == hash_length(ITERATIONS)
+    assert verify_password("secret", first, ITERATIONS) == (True, False)
+    assert verify_password("wrong", first, ITERATIONS) == (False, False)
+
+
+def test_damaged_hashes_match_no_password():
+    assert verify_password("secret", "pbkdf2_sha256$1000$not base64$???", ITERATIONS) == (False, False)
+    assert verify_password("secret", "pbkdf2_sha256$0$AAAA$AAAA", ITERATIONS) == (False, False)
+
+
+def test_login_with_a_hashed_password_runs_one_query(fake_pool):
+    service, pool = _service(fake_pool, hash_password("secret", ITERATIONS))
+    assert service.authenticate("alice", "secret")
+    assert not service.authenticate("alice", "wrong")
+    assert len(pool.queries) == 2
+    assert all(query.startswith("SELECT") for query, _ in pool.queries)
+
+
+def test_a_plaintext_password_is_upgraded_on_login(fake_pool):
+    service, pool = _service(fake_pool, "secret")
+    assert service.authenticate("alice", "secret")
+    update, (new_hash, user_id) = pool.queries[-1]
+    assert update.startswith("UPDATE users SET password")
+    assert user_id == 7
+    assert verify_password("secret", new_hash, ITERATIONS) == (True, False)
+
+
+def test_unknown_users_and_other_cases_are_refused(fake_pool):
+    service, pool = _service(fake_pool, hash_password("secret", ITERATIONS))
+    assert not service.authenticate("bob", "secret")
+    assert not service.authenticate("ALICE", "secret")
+    assert not any(query.startswith("UPDATE") for query, _ in pool.queries)
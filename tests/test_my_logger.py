@@ -0,0 +1,29 @@
+import time
+from datetime import datetime
+
+import functions # first, like main.py does: functions and QueryLogger import each other
+from class_MyLogger import MyLogger
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    def insert_one(self, document):
+        self.documents.append(document)
+
+
+def test_synchronous_log_is_stamped_at_write_time():
+    logger = MyLogger()
+    logger.collection = FakeCollection()
+    logger.retention = "ttl" # MongoDB trims it, nothing to do here
+    logger.state_cleaned = 0 # already "not cleaned", no state write
+    logger.last_query, logger.key_of_search, logger.value_of_search, logger.result_status = \
+        "SELECT 1", "Year", "2006", "Success"
+
+    time.sleep(1.1) # a stamp taken at import time would be at least a second old now
+    before = datetime.now().replace(microsecond=0)
+    logger.log_in_mongo()
+
+    stamp = logger.collection.documents[0]["time"]
+    assert before <= stamp <= datetime.now()
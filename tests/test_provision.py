@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+import functions # first, like main.py does: functions and QueryLogger import each other
+from provision import chunks, read_accounts, rejection
+from UserStorage import USERNAME_LENGTH
+
+
+def test_csv_and_jsonl_give_the_same_accounts():
+    from_csv = list(read_accounts(io.StringIO("username,password\nanalyst_0001,hunter22\n"), "csv"))
+    from_jsonl = list(read_accounts(io.StringIO('{"username": "analyst_0001", "password": "hunter22"}\n\n'), "jsonl"))
+    assert from_csv == from_jsonl == [{"username": "analyst_0001", "password": "hunter22"}]
+
+
+def test_a_broken_jsonl_line_becomes_a_rejection():
+    accounts = list(read_accounts(io.StringIO('{"username": "analyst_0001", "password": "hunter22"}\n{oops\n'), "jsonl"))
+    assert rejection(accounts[0]) is None
+    assert rejection(accounts[1]).startswith("line 2:")
+
+
+@pytest.mark.parametrize("account, reason", [
+    ({"username": "bob", "password": "hunter22"}, "the username is too short"),
+    ({"username": "x" * (USERNAME_LENGTH + 1), "password": "hunter22"}, "the username is too long"),
+    ({"username": "analyst_0001", "password": "  abc "}, "the password is too short"),
+    ({"username": "analyst_0001"}, "the password is too short"),
+])
+def test_the_create_account_rules_apply(account, reason):
+    assert rejection(account).startswith(reason)
+
+
+def test_chunks_split_the_valid_accounts_and_collect_the_rejected():
+    accounts = [{"username": f" analyst_{number:04} ", "password": "hunter22"} for number in range(5)]
+    accounts.insert(2, {"username": "bob", "password": "hunter22"})
+    rejected = []
+    result = list(chunks(iter(accounts), 2, rejected, iterations=1000))
+    assert [len(chunk) for chunk in result] == [2, 2, 1]
+    assert result[0][0] == ("analyst_0000", "hunter22") # stripped
+    assert rejected == [{"username": "bob", "reason": "the username is too short (5 characters minimum)"}]
+
+
+def test_hashes_longer_than_the_column_are_refused_up_front():
+    with pytest.raises(ValueError):
+        list(chunks(iter([]), 10, [], iterations=10 ** 200))
@@ -0,0 +1,21 @@
+import functions # first, like main.py does: functions and QueryLogger import each other
+from QueryLogger import pure_query
+
+QUERY = "SELECT title FROM film_summary WHERE film_id IN %(ids)s ORDER BY title"
+
+
+def test_one_id_is_a_valid_list():
+    query = pure_query(QUERY, {"ids": (5,)})
+    assert "IN (5)" in query
+    assert "(5,)" not in query
+
+
+def test_no_ids_is_in_null():
+    query = pure_query(QUERY, {"ids": (None,)})
+    assert "IN (NULL)" in query
+    assert "None" not in query
+
+
+def test_strings_are_escaped():
+    query = pure_query("SELECT title FROM film_summary WHERE title = %(title)s", {"title": "O'NEIL"})
+    assert "'O\\'NEIL'" in query
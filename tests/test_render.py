@@ -0,0 +1,42 @@
+from colorama import Fore
+
+from Render import AnimatedRenderer, InstantRenderer, PlainRenderer, get_renderer
+
+
+def test_instant_writes_the_page_at_the_end(capsys):
+    renderer = InstantRenderer()
+    with renderer.page():
+        renderer.write("Title ---> ", Fore.CYAN, end="")
+        renderer.write("ACADEMY DINOSAUR", Fore.CYAN)
+        assert capsys.readouterr().out == "" # collected, nothing written yet
+    assert capsys.readouterr().out == Fore.CYAN + "Title ---> " + Fore.CYAN + "ACADEMY DINOSAUR\n"
+
+
+def test_instant_outside_a_page_writes_right_away(capsys):
+    InstantRenderer().write("Hello", Fore.GREEN)
+    assert capsys.readouterr().out == Fore.GREEN + "Hello\n"
+
+
+def test_plain_drops_the_colors(capsys):
+    renderer = PlainRenderer()
+    with renderer.page():
+        renderer.write(Fore.RED + "Genre" + Fore.RESET, Fore.BLUE)
+    assert capsys.readouterr().out == "Genre\n"
+
+
+def test_the_page_is_written_even_after_an_error(capsys):
+    renderer = InstantRenderer()
+    try:
+        with renderer.page():
+            renderer.write("half a page", "")
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+    assert capsys.readouterr().out == "half a page\n"
+    assert renderer._buffer is None
+
+
+def test_unknown_modes_fall_back_to_the_animation():
+    assert isinstance(get_renderer("plain"), PlainRenderer)
+    assert isinstance(get_renderer("instant"), InstantRenderer)
+    assert isinstance(get_renderer("sparkles"), AnimatedRenderer)
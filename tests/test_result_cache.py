@@ -0,0 +1,51 @@
+import ResultCache as result_cache_module
+from ResultCache import ResultCache
+
+QUERY = "SELECT title FROM film WHERE release_year = %(year)s"
+
+
+def test_key_ignores_whitespace_and_param_order():
+    assert ResultCache.key(QUERY, {"year": 2006, "genre": "Drama"}) == \
+           ResultCache.key("SELECT title\n   FROM film WHERE release_year = %(year)s", {"genre": "Drama", "year": 2006})
+
+
+def test_least_recently_used_is_evicted_first():
+    cache = ResultCache(max_entries=2, max_bytes=10 ** 6, ttl=60)
+    cache.put(QUERY, {"year": 1}, (("A",),))
+    cache.put(QUERY, {"year": 2}, (("B",),))
+    assert cache.get(QUERY, {"year": 1}) == (True, (("A",),)) # year 1 is now the most recently used
+    cache.put(QUERY, {"year": 3}, (("C",),))
+
+    assert cache.get(QUERY, {"year": 2}) == (False, None)
+    assert cache.get(QUERY, {"year": 1})[0] and cache.get(QUERY, {"year": 3})[0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicts_until_the_bytes_fit():
+    rows = tuple((f"title {i}",) for i in range(50))
+    size = result_cache_module._size_of(rows)
+    cache = ResultCache(max_entries=100, max_bytes=size * 2, ttl=60)
+    for year in range(3):
+        cache.put(QUERY, {"year": year}, rows)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == size * 2 and stats["evictions"] == 1
+    assert cache.get(QUERY, {"year": 0}) == (False, None)
+
+
+def test_result_larger_than_the_cache_is_not_stored():
+    cache = ResultCache(max_entries=10, max_bytes=100, ttl=60)
+    cache.put(QUERY, {"year": 2}, tuple((f"title {i}",) for i in range(100)))
+    assert cache.get(QUERY, {"year": 2}) == (False, None)
+    assert cache.stats()["evictions"] == 0
+
+
+def test_expired_entries_are_misses(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_entries=10, max_bytes=10 ** 6, ttl=5)
+    cache.put(QUERY, {"year": 1}, ())
+    now[0] += 4.9
+    assert cache.get(QUERY, {"year": 1}) == (True, ())
+    now[0] += 0.1
+    assert cache.get(QUERY, {"year": 1}) == (False, None)
+    assert cache.stats()["expirations"] == 1 and cache.stats()["entries"] == 0
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from SearchService import SearchService, history_label
+
+
+def test_spec_normalizes_the_values():
+    assert SearchService._spec({"search": "year", "value": "2006"}) == ("year", 2006, None, None)
+    assert SearchService._spec({"search": "genre_year", "value": "Drama", "year_from": "2005", "year_to": ""}) == \
+           ("genre_year", "Drama", 2005, None)
+    assert SearchService._spec({"search": "range", "year_from": 2005, "year_to": 2007}) == ("range", None, 2005, 2007)
+
+
+def test_spec_of_composite_is_hashable_and_ignores_the_filter_order():
+    spec = SearchService._spec({"search": "composite", "value": {"title": "ACE", "genre": "Drama", "actor": None},
+                                "year_from": 2006})
+    same = SearchService._spec({"search": "composite", "value": {"genre": "Drama", "title": "ACE"}, "year_from": 2006})
+    assert spec == same == ("composite", (("genre", "Drama"), ("title", "ACE")), 2006, None)
+    assert hash(spec) == hash(same)
+    assert history_label(*spec) == ("several filters", "title like %ACE%, Drama, 2006")
+
+
+def test_spec_rejects_unknown_searches():
+    with pytest.raises(ValueError):
+        SearchService._spec({"search": "director", "value": "X"})
+    with pytest.raises(ValueError):
+        SearchService._spec({"search": "year", "value": "two thousand"})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    import functions # first, like main.py does: functions and QueryLogger import each other
+    import SQL_functions
+    from SearchEngine import engine
+
+    queries = []
+    lock = threading.Lock()
+
+    def fetch_rows(query, params):
+        """A film_summary of 5 rows per value, COUNT(*) and LIMIT/OFFSET like MySQL answers them."""
+        with lock:
+            queries.append((query, params))
+        time.sleep(0.2) # long enough for the other requests to arrive while it runs
+        rows = tuple((f"{params['value']} {i}", 2006, "Drama", "A") for i in range(5))
+        if query.startswith("SELECT COUNT(*)"):
+            return ((len(rows),),)
+        if "page_limit" in params:
+            return rows[params["page_offset"]:params["page_offset"] + params["page_limit"]]
+        return rows
+
+    monkeypatch.setattr(engine, "columnar", lambda *spec: None)
+    monkeypatch.setattr(engine, "spec_query", lambda search, value, year_from, year_to:
+                        ("SELECT title FROM film_summary WHERE genre = %(value)s ORDER BY title", {"value": value}))
+    monkeypatch.setattr(SQL_functions, "fetch_rows", fetch_rows)
+    service = SearchService(workers=4)
+    service.queries = queries
+    yield service
+    service._executor.shutdown(wait=True)
+
+
+def test_identical_searches_are_coalesced(service):
+    async def run():
+        request = {"search": "genre", "value": "Drama", "log": False}
+        return await asyncio.gather(*(service.search(dict(request)) for _ in range(5)))
+
+    responses = asyncio.run(run())
+    assert len(service.queries) == 1
+    assert [response["coalesced"] for response in responses].count(False) == 1
+    assert all(response["total"] == 5 and len(response["rows"]) == 5 for response in responses)
+    assert service._in_flight == {}
+
+
+def test_pages_read_only_the_page(service):
+    async def run():
+        return await asyncio.gather(service.search({"search": "genre", "value": "Drama", "log": False,
+                                                    "offset": 1, "limit": 2}),
+                                    service.search({"search": "genre", "value": "Comedy", "log": False,
+                                                    "limit": 0}))
+
+    drama, comedy = asyncio.run(run())
+    assert drama["total"] == 5
+    assert drama["rows"] == [["Drama 1", 2006, "Drama", "A"], ["Drama 2", 2006, "Drama", "A"]]
+    assert comedy["total"] == 5 and comedy["rows"] == []
+    # a COUNT(*) for each, a LIMIT/OFFSET query for the page of Drama - the whole result is never read
+    assert sorted(query.split()[1] for query, _ in service.queries) == ["COUNT(*)", "COUNT(*)", "title"]
+    assert [params for query, params in service.queries if "page_limit" in params] == \
+           [{"value": "Drama", "page_limit": 2, "page_offset": 1}]
+
+
+def test_answer_reports_errors():
+    service = SearchService(workers=1)
+    try:
+        response = asyncio.run(service.answer(b'{"id": 7, "op": "search", "search": "director"}'))
+        assert response["id"] == 7 and response["ok"] is False and "director" in response["error"]
+        assert asyncio.run(service.answer(b'{"id": 8, "op": "ping"}')) == {"id": 8, "ok": True}
+    finally:
+        service._executor.shutdown(wait=True)
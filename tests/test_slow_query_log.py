@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from SlowQueryLog import _safe_params, fingerprint, plan_summary, report
+
+
+def test_fingerprint_ignores_whitespace():
+    assert fingerprint("SELECT *\n  FROM film\tWHERE title = %(title)s;") == \
+           fingerprint("SELECT * FROM film WHERE title = %(title)s")
+
+
+def test_safe_params_cut_long_lists():
+    params = _safe_params({"ids": tuple(range(25)), "title": "ACE"})
+    assert params["ids"][:20] == list(range(20))
+    assert params["ids"][-1] == "... +5"
+    assert params["title"] == "ACE"
+
+
+def test_plan_summary_single_table():
+    plan = {"query_block": {"cost_info": {"query_cost": "104.50"},
+                            "ordering_operation": {"using_filesort": True,
+                                                   "table": {"table_name": "film_summary", "access_type": "ALL",
+                                                             "rows_examined_per_scan": 1000,
+                                                             "rows_produced_per_join": 100}}}}
+    summary = plan_summary(plan)
+    assert summary == {"rows_examined": 1000, "full_scans": ["film_summary"], "filesort": True,
+                       "temporary": False, "cost": 104.5}
+
+
+def test_plan_summary_multiplies_along_the_join():
+    plan = {"query_block": {"grouping_operation": {"using_temporary_table": True, "nested_loop": [
+        {"table": {"table_name": "f", "access_type": "ALL", "rows_examined_per_scan": 1000, "rows_produced_per_join": 100}},
+        {"table": {"table_name": "fa", "access_type": "ref", "rows_examined_per_scan": 5, "rows_produced_per_join": 500}},
+        {"table": {"table_name": "a", "access_type": "eq_ref", "rows_examined_per_scan": 1, "rows_produced_per_join": 500}},
+    ]}}}
+    summary = plan_summary(plan)
+    # f once, fa once per row of f, a once per row of f x fa
+    assert summary["rows_examined"] == 1000 + 100 * 5 + 500 * 1
+    assert summary["full_scans"] == ["f"]
+    assert summary["temporary"] is True
+
+
+def test_plan_summary_counts_subqueries_of_a_joined_table():
+    subquery = {"query_block": {"table": {"table_name": "actor", "access_type": "ALL", "rows_examined_per_scan": 200}}}
+    plan = {"query_block": {"nested_loop": [
+        {"table": {"table_name": "f", "access_type": "range", "rows_examined_per_scan": 10, "rows_produced_per_join": 10,
+                   "attached_subqueries": [subquery]}},
+    ]}}
+    assert plan_summary(plan)["rows_examined"] == 10 + 200
+
+
+def _doc(fingerprint_, seconds, rows_examined=None, day=1, **flags):
+    return {"fingerprint": fingerprint_, "template": f"SELECT {fingerprint_}", "seconds": seconds,
+            "rows_examined": rows_examined, "rows": 3, "time": datetime(2026, 1, day), **flags}
+
+
+def test_report_groups_by_fingerprint_and_sorts_by_p95():
+    documents = [_doc("a", 0.5), _doc("a", 0.7, day=2), _doc("b", 2.0, full_scans=["film"]), _doc("c", 1.0)]
+    templates = report(documents)
+    assert [item["fingerprint"] for item in templates] == ["b", "c", "a"]
+    a = templates[2]
+    assert a["count"] == 2 and a["max"] == 0.7 and a["last"] == datetime(2026, 1, 2)
+    assert templates[0]["full_scans"] == ["film"]
+
+
+def test_report_by_rows_and_limit():
+    documents = [_doc("a", 3.0, rows_examined=10), _doc("b", 1.0, rows_examined=5000), _doc("c", 2.0)]
+    templates = report(documents, by="rows", limit=2)
+    assert [item["fingerprint"] for item in templates] == ["b", "a"]
+    assert report(documents)[0]["rows_examined"] == 10
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from Startup import Startup
+
+
+def test_a_task_is_started_once():
+    startup = Startup()
+    calls = []
+    first = startup.start("query_log", lambda: calls.append(1))
+    second = startup.start("query_log", lambda: calls.append(2))
+    startup.wait("query_log")
+    assert first is second
+    assert calls == [1]
+
+
+def test_tasks_run_at_the_same_time():
+    startup = Startup()
+    both_running = threading.Barrier(2, timeout=5)
+    startup.start("query_log", both_running.wait)
+    startup.start("user_storage", both_running.wait)
+    startup.wait("query_log") # a BrokenBarrierError here would mean they ran one after the other
+    startup.wait("user_storage")
+
+
+def test_wait_re_raises_in_the_waiting_thread():
+    startup = Startup()
+
+    def no_database():
+        raise SystemExit("MySQL is not reachable")
+
+    startup.start("user_storage", no_database)
+    with pytest.raises(SystemExit):
+        startup.wait("user_storage")
+
+
+def test_waiting_for_a_task_never_started_returns():
+    Startup().wait("film_summary")
+
+
+def test_the_first_prompt_is_recorded_once():
+    startup = Startup()
+    startup.first_prompt()
+    first = startup.first_prompt_seconds
+    startup.first_prompt()
+    assert startup.first_prompt_seconds == first > 0
@@ -0,0 +1,44 @@
+import time
+
+from TitleIndex import TitleIndex
+
+
+def _index(fake_pool, films, max_age=300):
+    pool = fake_pool(lambda query, params: list(films))
+    return TitleIndex(pool=pool, max_age=max_age), pool
+
+
+def test_substring_and_exact_matches(fake_pool):
+    index, _ = _index(fake_pool, [(1, "ACADEMY DINOSAUR"), (2, "ACE GOLDFINGER"), (3, "DINOSAUR SECRETARY")])
+    assert index.search("dinosaur") == [1, 3]
+    assert index.search("ac") == [1, 2] # shorter than a trigram: scanned
+    assert index.search("zzz") == []
+    assert index.exact("ace goldfinger") == [2]
+
+
+def test_stale_index_is_rebuilt_in_the_background(fake_pool):
+    films = [(1, "ACADEMY DINOSAUR")]
+    index, pool = _index(fake_pool, films, max_age=0)
+    pool.answer = lambda query, params: list(films)
+    assert index.search("dinosaur") == [1]
+
+    films.append((2, "DINOSAUR SECRETARY")) # added after the first build
+    index.search("dinosaur") # starts the rebuild, answered from the old index
+    deadline = time.monotonic() + 2
+    while index.search("dinosaur") != [1, 2] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert index.search("dinosaur") == [1, 2]
+
+
+def test_fresh_index_is_not_rebuilt_until_invalidated(fake_pool):
+    index, pool = _index(fake_pool, [(1, "ACADEMY DINOSAUR")])
+    index.search("academy")
+    index.search("academy")
+    assert len(pool.queries) == 1
+
+    index.invalidate()
+    index.search("academy")
+    deadline = time.monotonic() + 2
+    while len(pool.queries) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(pool.queries) == 2